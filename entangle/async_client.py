@@ -0,0 +1,227 @@
+import asyncio
+import time
+from .async_connection import open_connection
+from .circuit import circuit_breakers
+from .client import backoff_delay
+from .constants import MAX_UINT32
+from .exceptions import CircuitOpenError, DeadlineExceededError
+
+
+class AsyncClient(object):
+    """asyncio client.
+
+    Base class for asyncio client implementations. Calls are pipelined on a
+    single connection, so any number of calls may be awaited concurrently.
+
+    Like :class:`Client`, failed connects are retried with exponential
+    backoff and jitter, and fail fast with :class:`CircuitOpenError` while
+    the circuit breaker of the address is open.
+    """
+
+    def __init__(self,
+                 address,
+                 connect_timeout=10,
+                 reconnect_limit=3,
+                 call_timeout=None,
+                 backoff=0.05,
+                 max_backoff=5.0,
+                 circuit_breaker=None,
+                 **kwargs):
+        """Initialize a client.
+
+        :param address: Address.
+        :param connect_timeout: Connect timeout. Default ``10``.
+        :param reconnect_limit: Reconnect limit. Default ``3``.
+        :param call_timeout:
+            Default timeout of calls in seconds, or ``None`` to wait for
+            responses indefinitely. Default ``None``.
+        :param backoff:
+            Base delay in seconds before retrying a failed connect, doubling
+            with every retry. Default ``0.05``.
+        :param max_backoff:
+            Maximum delay in seconds before retrying a failed connect.
+            Default ``5.0``.
+        :param circuit_breaker:
+            :class:`CircuitBreaker` of the address. Defaults to the breaker of
+            the address shared by all clients.
+        :param kwargs: Connection options, e.g. ``compression_threshold``.
+        """
+
+        self._address = address
+        self._message_id = 0
+        self._connect_timeout = connect_timeout
+        self._reconnect_limit = reconnect_limit
+        self._connection_options = kwargs
+        self._call_timeout = call_timeout
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._circuit_breaker = circuit_breaker or \
+            circuit_breakers.get(address)
+        self._conn = None
+        self._connect_lock = asyncio.Lock()
+
+    def _next_message_id(self):
+        """Next message ID.
+
+        Message IDs of requests still in flight are skipped, should the
+        message ID counter wrap around.
+        """
+
+        while True:
+            self._message_id += 1
+            if self._message_id > MAX_UINT32:
+                self._message_id = 0
+            if self._conn is None or \
+                    not self._conn.in_flight(self._message_id):
+                return self._message_id
+
+    async def _get_conn(self):
+        """Get connection.
+        """
+
+        if self._conn is not None:
+            return self._conn
+
+        # Only let one caller connect while the others wait for it.
+        async with self._connect_lock:
+            if self._conn is not None:
+                return self._conn
+
+            breaker = self._circuit_breaker
+
+            if not breaker.allow():
+                raise CircuitOpenError('circuit breaker of %r open' %
+                                       (self._address, ))
+
+            retry = 0
+
+            try:
+                while True:
+                    try:
+                        conn = await open_connection(
+                            self._address,
+                            timeout=self._connect_timeout,
+                            **self._connection_options
+                        )
+                    except Exception:
+                        if retry == self._reconnect_limit:
+                            raise
+                    else:
+                        break
+
+                    await asyncio.sleep(self._backoff_delay(retry))
+                    retry += 1
+            except:
+                # Record the failure, ending a trial connect, and re-raise.
+                breaker.failed()
+                raise
+
+            breaker.succeeded()
+            self._conn = conn
+            return conn
+
+    def _backoff_delay(self, retry):
+        """Delay before retrying a failed connect.
+
+        :param retry: Number of the retry, from ``0``.
+        :returns: a random delay in seconds up to the backoff of the retry.
+        """
+
+        return backoff_delay(retry, self._backoff, self._max_backoff)
+
+    @property
+    def circuit_breaker(self):
+        """:class:`CircuitBreaker` of the address.
+        """
+
+        return self._circuit_breaker
+
+    def _reset_conn(self, conn):
+        """Reset a connection.
+
+        :param conn: Connection to reset if still in use.
+        """
+
+        conn.close()
+
+        if self._conn is conn:
+            self._conn = None
+
+    async def _call(self,
+                    name,
+                    packed_arguments,
+                    trace=False,
+                    notify=False,
+                    timeout=None):
+        """Call a method.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace. Ignored if :param:`notify` is ``True``.
+        :param notify: Notify instead of request.
+        :param timeout:
+            Timeout in seconds, from when the request is sent. Defaults to the
+            client's call timeout. Ignored if :param:`notify` is ``True``.
+        :returns:
+            the response message if :param:`notify` is ``False``, otherwise
+           ``None`` indicating that the notification has been sent.
+        :raises entangle.DeadlineExceededError:
+            if the timeout expires before the response is received.
+        """
+
+        if timeout is None:
+            timeout = self._call_timeout
+
+        # Get a connection.
+        conn = await self._get_conn()
+
+        # Get a new message ID.
+        message_id = self._next_message_id()
+
+        try:
+            # Send the request.
+            if notify:
+                conn.send_notification(message_id, name, packed_arguments)
+                await conn.drain()
+                return
+
+            conn.send_request(message_id,
+                              name,
+                              packed_arguments,
+                              trace,
+                              timeout)
+
+            try:
+                if timeout is None:
+                    await conn.drain()
+
+                    # Wait for a response.
+                    return await conn.receive_response(message_id)
+
+                deadline = time.time() + timeout
+
+                try:
+                    await asyncio.wait_for(conn.drain(), timeout)
+                    return await asyncio.wait_for(
+                        conn.receive_response(message_id),
+                        deadline - time.time()
+                    )
+                except asyncio.TimeoutError:
+                    raise DeadlineExceededError('deadline exceeded')
+            finally:
+                # Stop waiting for the response unless it was received, e.g.
+                # if the call was cancelled while draining.
+                conn.abandon(message_id)
+        except (asyncio.CancelledError, DeadlineExceededError, ):
+            raise
+        except:
+            # Reset the connection and re-raise.
+            self._reset_conn(conn)
+            raise
+
+    def close(self):
+        """Close the client.
+        """
+
+        if self._conn is not None:
+            self._reset_conn(self._conn)
@@ -0,0 +1,325 @@
+import asyncio
+import msgpack
+from collections import deque
+from .connection import BaseConnection, OVERSIZE_MESSAGE_SIZE
+from .exceptions import (
+    BadMessageError,
+    ConnectionLostError,
+    UnexpectedMessageError,
+)
+from .message import ExceptionMessage, ResponseMessage
+
+
+class AsyncConnection(BaseConnection, asyncio.Protocol):
+    """asyncio Entangle connection.
+
+    Responses are matched to their requests by message ID as they are
+    received, so any number of requests may be in flight on the connection at
+    once. All other messages are queued for :meth:`receive`.
+
+    Messages sent during the same event loop iteration are coalesced into a
+    single write to the transport.
+    """
+
+    def __init__(self, **kwargs):
+        """Initialize an asyncio Entangle connection.
+
+        :param kwargs: Options passed to :class:`BaseConnection`.
+        """
+
+        super(AsyncConnection, self).__init__(**kwargs)
+
+        self._transport = None
+        self._unpacker = self._create_unpacker()
+        self._unpacked_offset = 0
+        self._waiters = {}
+        self._messages = asyncio.Queue()
+        self._exception = None
+        self._drain_waiters = deque()
+        self._paused = False
+        self._pending = []
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        # Keep the error which made the connection close, if any.
+        if self._exception is None:
+            self._exception = ConnectionLostError('connection lost')
+
+        # Fail everyone waiting on the connection.
+        for waiter in self._waiters.values():
+            if not waiter.done():
+                waiter.set_exception(self._exception)
+        self._waiters.clear()
+
+        self._messages.put_nowait(None)
+
+        self._wake_drain_waiters(self._exception)
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+
+        self._wake_drain_waiters()
+
+    def _wake_drain_waiters(self, exc=None):
+        """Wake everyone waiting in :meth:`drain`.
+
+        :param exc: Exception to fail the waiters with, if any.
+        """
+
+        waiters = self._drain_waiters
+        self._drain_waiters = deque()
+
+        for waiter in waiters:
+            if waiter.done():
+                continue
+            if exc is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(exc)
+
+    def data_received(self, data):
+        try:
+            self._feed(data)
+        except BadMessageError as e:
+            self._exception = e
+            self._transport.close()
+            return
+
+        oversize = False
+
+        while True:
+            try:
+                ser = self._unpack()
+                offset = self._unpacker.tell()
+                if offset - self._unpacked_offset >= OVERSIZE_MESSAGE_SIZE:
+                    oversize = True
+                self._unpacked_offset = offset
+
+                message = self._deserialize(ser)
+            except msgpack.OutOfData:
+                break
+            except Exception as e:
+                self._exception = e
+                self._transport.close()
+                return
+
+            self._message_received(message)
+
+        # Release the memory held by the unpacker after an oversize message.
+        if oversize:
+            self._replace_unpacker()
+            self._unpacked_offset = 0
+
+    def _message_received(self, message):
+        """Handle a received message.
+
+        :param message: Message.
+        """
+
+        if not isinstance(message, (ExceptionMessage, ResponseMessage, )):
+            self._messages.put_nowait(message)
+            return
+
+        # Responses nobody waits for any more are discarded.
+        waiter = self._waiters.get(message.message_id)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(message)
+
+    def _write(self, buffers):
+        """Write data to the transport.
+
+        The data is written once the current event loop iteration is done,
+        together with everything else written during it.
+
+        :param buffers: List of buffers to write.
+        """
+
+        if self._exception is not None:
+            raise self._exception
+
+        if not self._pending:
+            asyncio.get_event_loop().call_soon(self._flush)
+
+        self._pending.extend(buffers)
+
+    def _flush(self):
+        """Write all pending data to the transport.
+        """
+
+        pending = self._pending
+        self._pending = []
+
+        if self._exception is None and not self._transport.is_closing():
+            self._transport.writelines(pending)
+
+    async def drain(self):
+        """Wait until the transport's write buffer has drained.
+        """
+
+        if self._exception is not None:
+            raise self._exception
+
+        # Data written during this event loop iteration only reaches the
+        # transport once flushed.
+        if self._pending:
+            await asyncio.sleep(0)
+
+            if self._exception is not None:
+                raise self._exception
+
+        if not self._paused:
+            return
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._drain_waiters.append(waiter)
+        await waiter
+
+    def in_flight(self, message_id):
+        """Whether a request is in flight on the connection.
+
+        :param message_id: Message ID of the request.
+        """
+
+        return message_id in self._waiters
+
+    def abandon(self, message_id):
+        """Abandon a request in flight, discarding its response once
+        received.
+
+        :param message_id: Message ID of the request.
+        """
+
+        waiter = self._waiters.pop(message_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.cancel()
+
+    def send_request(self,
+                     message_id,
+                     method,
+                     packed_arguments,
+                     trace=False,
+                     timeout=None):
+        """Send request.
+
+        :param message_id: Message ID.
+        :param method: Method name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace. Default ``False``.
+        :param timeout:
+            Time in seconds the caller waits for the response. Default
+            ``None``.
+        """
+
+        self._write(self._build_request(message_id,
+                                        method,
+                                        packed_arguments,
+                                        trace,
+                                        timeout))
+        self._waiters[message_id] = asyncio.get_event_loop().create_future()
+
+    def send_notification(self, message_id, method, packed_arguments):
+        """Send notification.
+
+        :param message_id: Message ID.
+        :param method: Method name.
+        :param packed_arguments: Package arguments.
+        """
+
+        self._write(self._build_notification(message_id,
+                                             method,
+                                             packed_arguments))
+
+    def send_response(self, message_id, packed_result, trace=None):
+        """Send response.
+
+        :param message_id: Message ID of the request.
+        :param packed_result: Packed result.
+        :param trace: Request trace. Default ``None``.
+        """
+
+        self._write(self._build_response(message_id, packed_result, trace))
+
+    def send_exception(self,
+                       message_id,
+                       definition,
+                       name,
+                       description,
+                       trace=None):
+        """Send exception.
+
+        :param message_id: Message ID of the request.
+        :param definition: Exception definition.
+        :param name: Exception name.
+        :param description: Exception description.
+        :param trace: Request trace. Default ``None``.
+        """
+
+        self._write(self._build_exception(message_id,
+                                          definition,
+                                          name,
+                                          description,
+                                          trace))
+
+    async def receive_response(self, message_id):
+        """Receive the response to a request.
+
+        :param message_id: Message ID of the request.
+        :returns:
+            the :class:`ResponseMessage` or :class:`ExceptionMessage` for the
+            request.
+        """
+
+        try:
+            waiter = self._waiters[message_id]
+        except KeyError:
+            raise UnexpectedMessageError('no request with message ID %d in '
+                                         'flight' % (message_id))
+
+        try:
+            return await waiter
+        finally:
+            if self._waiters.get(message_id) is waiter:
+                del self._waiters[message_id]
+
+    async def receive(self):
+        """Receive a message that is not a response to a request.
+        """
+
+        if self._exception is not None and self._messages.empty():
+            raise self._exception
+
+        message = await self._messages.get()
+
+        if message is None:
+            raise self._exception
+
+        return message
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+
+async def open_connection(address, timeout=None, **kwargs):
+    """Open an asyncio Entangle connection.
+
+    :param address: Address as a ``(host, port)`` tuple.
+    :param timeout: Connect timeout. Default ``None``.
+    :param kwargs: Options passed to :class:`AsyncConnection`.
+    :returns: the :class:`AsyncConnection`.
+    """
+
+    loop = asyncio.get_event_loop()
+    host, port = address
+
+    _, conn = await asyncio.wait_for(
+        loop.create_connection(lambda: AsyncConnection(**kwargs), host, port),
+        timeout
+    )
+
+    return conn
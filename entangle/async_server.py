@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import time
+from .async_connection import AsyncConnection
+from .exceptions import (
+    DeadlineExceededError,
+    EntangleException,
+    InternalServerError,
+    UnknownMethodError,
+)
+from .message import NotificationMessage, RequestMessage
+from .packing import packer
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncServerConnection(AsyncConnection):
+    """Server side of an asyncio client connection.
+
+    Each request is handled in its own task. Reading from the connection is
+    paused while the maximum number of requests are being handled.
+    """
+
+    def __init__(self, server, max_concurrency, **kwargs):
+        """Initialize a server connection.
+
+        :param server: :class:`AsyncServer`.
+        :param max_concurrency:
+            Maximum number of requests handled concurrently.
+        :param kwargs: Options passed to :class:`AsyncConnection`.
+        """
+
+        super(AsyncServerConnection, self).__init__(**kwargs)
+
+        self._server = server
+        self._max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+        self._reading_paused = False
+
+    def connection_lost(self, exc):
+        super(AsyncServerConnection, self).connection_lost(exc)
+
+        for task in self._tasks:
+            task.cancel()
+
+    def _message_received(self, message):
+        if not isinstance(message, (RequestMessage, NotificationMessage, )):
+            logger.warning('unexpected message: %r', message)
+            self.close()
+            return
+
+        task = asyncio.get_event_loop().create_task(
+            self._server._handle(self, message)
+        )
+        task.add_done_callback(self._task_done)
+        self._tasks.add(task)
+
+        if len(self._tasks) >= self._max_concurrency and \
+                not self._reading_paused:
+            self._reading_paused = True
+            self._transport.pause_reading()
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+
+        if self._reading_paused and \
+                len(self._tasks) < self._max_concurrency and \
+                not self._transport.is_closing():
+            self._reading_paused = False
+            self._transport.resume_reading()
+
+
+class AsyncServer(object):
+    """asyncio server.
+
+    Method handlers may be coroutine functions or plain callables.
+    """
+
+    def __init__(self, max_concurrency=128, **kwargs):
+        """Initialize a server.
+
+        :param max_concurrency:
+            Maximum number of requests handled concurrently per connection.
+            Default ``128``.
+        :param kwargs: Connection options, e.g. ``compression_threshold``.
+        """
+
+        self._max_concurrency = max_concurrency
+        self._connection_options = kwargs
+        self._methods = {}
+        self._server = None
+
+    @property
+    def sockets(self):
+        """Listening sockets.
+        """
+
+        return self._server.sockets
+
+    def register(self, name, handler):
+        """Register a method.
+
+        :param name: Method name.
+        :param handler:
+            Coroutine function or callable taking the method arguments and
+            returning the result.
+        """
+
+        self._methods[name] = handler
+
+    def method(self, name):
+        """Decorator registering a method.
+
+        :param name: Method name.
+        """
+
+        def decorator(handler):
+            self.register(name, handler)
+            return handler
+
+        return decorator
+
+    async def _handle(self, conn, message):
+        """Handle a request or notification.
+
+        At most the maximum concurrency of messages are handled at once per
+        connection. A request holds on to its slot until its response has
+        drained from the transport's write buffer, so responses to a client
+        slow to read them do not pile up in memory.
+
+        :param conn: :class:`AsyncServerConnection`.
+        :param message:
+            :class:`RequestMessage` or :class:`NotificationMessage`.
+        """
+
+        async with conn._slots:
+            await self._dispatch(conn, message)
+
+            if isinstance(message, RequestMessage):
+                try:
+                    await conn.drain()
+                except EntangleException:
+                    pass
+
+    async def _dispatch(self, conn, message):
+        """Call the handler of a request or notification and send the
+        response.
+
+        :param conn: :class:`AsyncServerConnection`.
+        :param message:
+            :class:`RequestMessage` or :class:`NotificationMessage`.
+        """
+
+        notify = isinstance(message, NotificationMessage)
+
+        try:
+            # Skip requests the caller has already given up on.
+            deadline = getattr(message, 'deadline', None)
+            if deadline is not None and time.time() > deadline:
+                raise DeadlineExceededError('deadline exceeded')
+
+            try:
+                handler = self._methods[message.method]
+            except KeyError:
+                raise UnknownMethodError('unknown method: %s' %
+                                         (message.method))
+
+            result = handler(*message.arguments)
+            if asyncio.iscoroutine(result):
+                result = await result
+
+            if not notify:
+                conn.send_response(message.message_id, packer.pack(result))
+        except asyncio.CancelledError:
+            raise
+        except EntangleException as e:
+            if not notify:
+                self._send_exception(conn, message.message_id, e)
+        except Exception:
+            logger.exception('error handling %s', message.method)
+            if not notify:
+                self._send_exception(
+                    conn,
+                    message.message_id,
+                    InternalServerError('internal server error')
+                )
+
+    def _send_exception(self, conn, message_id, exc):
+        """Send an exception, ignoring a lost connection.
+        """
+
+        try:
+            conn.send_exception(message_id, exc.definition, exc.name, str(exc))
+        except EntangleException:
+            pass
+
+    def _connection_factory(self):
+        return AsyncServerConnection(self,
+                                     self._max_concurrency,
+                                     **self._connection_options)
+
+    async def start(self, address=None, sock=None, backlog=128):
+        """Start listening.
+
+        :param address:
+            Address as a ``(host, port)`` tuple. Ignored if :param:`sock` is
+            given.
+        :param sock: Listening socket. Default ``None``.
+        :param backlog: Listen backlog. Default ``128``.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        if sock is not None:
+            self._server = await loop.create_server(self._connection_factory,
+                                                    sock=sock,
+                                                    backlog=backlog)
+        else:
+            host, port = address
+            self._server = await loop.create_server(self._connection_factory,
+                                                    host,
+                                                    port,
+                                                    backlog=backlog)
+
+    async def serve_forever(self):
+        """Serve until closed.
+        """
+
+        await self._server.serve_forever()
+
+    def close(self):
+        """Stop listening.
+        """
+
+        self._server.close()
+
+    async def wait_closed(self):
+        """Wait until the server has closed.
+        """
+
+        await self._server.wait_closed()
@@ -0,0 +1,401 @@
+import random
+import time
+from collections import deque
+from .cache import cached_call
+from .client import Client
+
+
+class _Backend(object):
+    """Backend of a balanced client.
+    """
+
+    __slots__ = (
+        'address',
+        'client',
+        'outstanding',
+        'latency',
+        'failures',
+        'ejections',
+        'ejected_until',
+        'recovering_since',
+    )
+
+    def __init__(self, address, client):
+        self.address = address
+        self.client = client
+        self.outstanding = 0
+        self.latency = None
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = None
+        self.recovering_since = None
+
+
+class _BalancedCall(object):
+    """Call begun with :meth:`BalancedClient._begin_call`.
+    """
+
+    __slots__ = ('backend', 'message_id', 'start')
+
+    def __init__(self, backend, message_id, start):
+        self.backend = backend
+        self.message_id = message_id
+        self.start = start
+
+
+class BalancedClient(object):
+    """Load balancing client.
+
+    Base class for client implementations spreading calls over a number of
+    backends, each with its own connection. Each call picks the better of
+    two randomly chosen backends, either by the number of outstanding
+    requests or by a moving average of latency weighted by the outstanding
+    requests.
+
+    Backends failing a number of calls in a row are ejected for a while, for
+    longer every time they are ejected again. Once back, a backend takes a
+    growing share of calls over a slow start period.
+
+    Failed calls are not retried on another backend, as they may not be
+    idempotent. Like :class:`Client`, operates in a non thread safe blocking
+    manner.
+    """
+
+    def __init__(self,
+                 addresses,
+                 balance='outstanding',
+                 decay=0.2,
+                 max_failures=3,
+                 ejection_time=10.0,
+                 max_ejection_time=300.0,
+                 slow_start=30.0,
+                 connect_timeout=10,
+                 reconnect_limit=0,
+                 call_timeout=None,
+                 response_cache=None,
+                 **kwargs):
+        """Initialize a balanced client.
+
+        :param addresses: Backend addresses.
+        :param balance:
+            ``'outstanding'`` to balance by the number of outstanding
+            requests, or ``'latency'`` to balance by latency. Default
+            ``'outstanding'``.
+        :param decay: Weight of new latency samples. Default ``0.2``.
+        :param max_failures:
+            Number of failed calls in a row after which a backend is ejected.
+            Default ``3``.
+        :param ejection_time:
+            Time in seconds a backend is first ejected for, doubling with
+            every further ejection. Default ``10.0``.
+        :param max_ejection_time:
+            Maximum time in seconds a backend is ejected for. Default
+            ``300.0``.
+        :param slow_start:
+            Time in seconds over which a backend back from ejection ramps up
+            to its full share of calls. Default ``30.0``.
+        :param connect_timeout: Connect timeout. Default ``10``.
+        :param reconnect_limit: Reconnect limit per backend. Default ``0``.
+        :param call_timeout:
+            Default timeout of calls in seconds. Default ``None``.
+        :param response_cache:
+            :class:`ResponseCache` answering calls to cached methods. Default
+            ``None``.
+        :param kwargs: Connection options, e.g. ``compression_threshold``.
+        """
+
+        if balance not in ('outstanding', 'latency', ):
+            raise ValueError('invalid balance: %r' % (balance, ))
+
+        addresses = list(addresses)
+        if not addresses:
+            raise ValueError('no addresses given')
+
+        self._backends = [
+            _Backend(address, Client(address,
+                                     connect_timeout,
+                                     reconnect_limit,
+                                     call_timeout,
+                                     **kwargs))
+            for address in addresses
+        ]
+        self._balance = balance
+        self._decay = decay
+        self._max_failures = max_failures
+        self._ejection_time = ejection_time
+        self._max_ejection_time = max_ejection_time
+        self._slow_start = slow_start
+        self._response_cache = response_cache
+
+    @property
+    def ejected(self):
+        """Addresses of the currently ejected backends.
+        """
+
+        now = time.time()
+        return [backend.address for backend in self._backends
+                if backend.ejected_until is not None and
+                backend.ejected_until > now]
+
+    def _available(self, now):
+        """Backends available for calls.
+
+        Ejected backends are only used should all backends be ejected.
+
+        :param now: Current time.
+        """
+
+        available = []
+
+        for backend in self._backends:
+            if backend.ejected_until is not None:
+                if backend.ejected_until > now:
+                    continue
+
+                backend.ejected_until = None
+                backend.recovering_since = now
+
+            available.append(backend)
+
+        return available or self._backends
+
+    def _weight(self, backend, now):
+        """Share of calls of a backend during its slow start.
+
+        :param backend: Backend.
+        :param now: Current time.
+        :returns: the weight from ``0.1`` to ``1.0``.
+        """
+
+        if backend.recovering_since is None:
+            return 1.0
+
+        elapsed = now - backend.recovering_since
+        if elapsed >= self._slow_start:
+            backend.recovering_since = None
+            return 1.0
+
+        return max(elapsed / self._slow_start, 0.1)
+
+    def _cost(self, backend, now):
+        """Cost of making a call to a backend.
+
+        :param backend: Backend.
+        :param now: Current time.
+        """
+
+        cost = backend.outstanding + 1.0
+
+        # Backends without latency samples yet are tried first.
+        if self._balance == 'latency':
+            cost *= backend.latency or 0.0
+
+        return cost / self._weight(backend, now)
+
+    def _pick(self):
+        """Pick the backend for a call.
+
+        :returns: the backend.
+        """
+
+        now = time.time()
+        available = self._available(now)
+
+        if len(available) == 1:
+            return available[0]
+
+        first, second = random.sample(available, 2)
+        if self._cost(second, now) < self._cost(first, now):
+            return second
+        return first
+
+    def _succeeded(self, backend, latency=None):
+        """Record a successful call.
+
+        :param backend: Backend.
+        :param latency: Latency of the call in seconds, if a request.
+        """
+
+        backend.failures = 0
+        if backend.recovering_since is None:
+            backend.ejections = 0
+
+        if latency is None:
+            return
+
+        if backend.latency is None:
+            backend.latency = latency
+        else:
+            backend.latency += self._decay * (latency - backend.latency)
+
+    def _failed(self, backend):
+        """Record a failed call, ejecting the backend after too many.
+
+        :param backend: Backend.
+        """
+
+        backend.failures += 1
+        if backend.failures < self._max_failures:
+            return
+
+        ejection_time = min(
+            self._ejection_time * 2 ** backend.ejections,
+            self._max_ejection_time
+        )
+
+        backend.failures = 0
+        backend.ejections += 1
+        backend.ejected_until = time.time() + ejection_time
+        backend.recovering_since = None
+        backend.client._reset_conn()
+
+    def _begin_call(self, name, packed_arguments, trace=False, timeout=None):
+        """Begin a call to a method without waiting for the response.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace.
+        :param timeout:
+            Timeout in seconds. Defaults to the client's call timeout.
+        :returns: the call, to be passed to :meth:`_end_call`.
+        """
+
+        backend = self._pick()
+        start = time.time()
+
+        try:
+            message_id = backend.client._begin_call(name,
+                                                    packed_arguments,
+                                                    trace,
+                                                    timeout)
+        except Exception:
+            self._failed(backend)
+            raise
+
+        backend.outstanding += 1
+        return _BalancedCall(backend, message_id, start)
+
+    def _end_call(self, call):
+        """End a call begun with :meth:`_begin_call`.
+
+        :param call: Call.
+        :returns: the response message.
+        """
+
+        backend = call.backend
+
+        try:
+            response = backend.client._end_call(call.message_id)
+        except Exception:
+            self._failed(backend)
+            raise
+        finally:
+            backend.outstanding -= 1
+
+        self._succeeded(backend, time.time() - call.start)
+        return response
+
+    def _call_many(self, calls, trace=False, timeout=None):
+        """Call a batch of methods.
+
+        The calls are spread over the backends, and all requests are sent
+        before any response is awaited.
+
+        :param calls: Iterable of ``(name, packed_arguments)`` tuples.
+        :param trace: Request trace.
+        :param timeout: Timeout in seconds of each call.
+        :returns: the response messages in the order of :param:`calls`.
+        """
+
+        pending = deque()
+        responses = []
+
+        try:
+            for name, packed_arguments in calls:
+                pending.append(self._begin_call(name,
+                                                packed_arguments,
+                                                trace,
+                                                timeout))
+
+            while pending:
+                responses.append(self._end_call(pending.popleft()))
+        except:
+            # Abandon the calls not yet ended and re-raise.
+            for call in pending:
+                self._abandon_call(call)
+            raise
+
+        return responses
+
+    def _abandon_call(self, call):
+        """Abandon a call begun with :meth:`_begin_call`.
+
+        :param call: Call.
+        """
+
+        backend = call.backend
+        backend.outstanding -= 1
+
+        client = backend.client
+        if client._conn is not None and call.message_id in client._in_flight:
+            client._abandon_call(call.message_id)
+
+    def _request(self, name, packed_arguments, trace, timeout):
+        """Make a request and wait for the response.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace.
+        :param timeout: Timeout in seconds, or ``None``.
+        :returns: the response message.
+        """
+
+        return self._end_call(self._begin_call(name,
+                                               packed_arguments,
+                                               trace,
+                                               timeout))
+
+    def _call(self,
+              name,
+              packed_arguments,
+              trace=False,
+              notify=False,
+              timeout=None):
+        """Call a method.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace. Ignored if :param:`notify` is ``True``.
+        :param notify: Notify instead of request.
+        :param timeout:
+            Timeout in seconds. Defaults to the client's call timeout. Ignored
+            if :param:`notify` is ``True``.
+        :returns:
+            the response message if :param:`notify` is ``False``, otherwise
+           ``None`` indicating that the notification has been sent.
+        """
+
+        if not notify:
+            return cached_call(self._response_cache,
+                               self._request,
+                               name,
+                               packed_arguments,
+                               trace,
+                               timeout)
+
+        backend = self._pick()
+
+        try:
+            backend.client._call(name, packed_arguments, notify=True)
+        except Exception:
+            self._failed(backend)
+            raise
+
+        self._succeeded(backend)
+
+    def close(self):
+        """Close the connections to all backends.
+        """
+
+        for backend in self._backends:
+            backend.client._reset_conn()
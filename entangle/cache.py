@@ -0,0 +1,226 @@
+import msgpack
+import threading
+import time
+from collections import OrderedDict
+from .lazy import LazyValue
+from .message import ExceptionMessage, ResponseMessage
+from .ndarray import NDARRAY_EXT_TYPE, pack_ndarray
+
+
+def _pack_default(x):
+    return msgpack.ExtType(NDARRAY_EXT_TYPE, pack_ndarray(x))
+
+
+def _packed_size(value):
+    """Packed size of a received value.
+
+    :param value: Value.
+    :returns: the size in bytes.
+    """
+
+    if isinstance(value, LazyValue):
+        return len(value.raw)
+    return len(msgpack.packb(value, default=_pack_default))
+
+
+def cached_call(cache, call, name, packed_arguments, *args):
+    """Make a call, answering it from a response cache if possible.
+
+    :param cache: :class:`ResponseCache`, or ``None``.
+    :param call:
+        Callable taking :param:`name`, :param:`packed_arguments` and
+        :param:`args`, and returning the response message.
+    :param name: Name.
+    :param packed_arguments: Packed arguments.
+    :param args: Further arguments to :param:`call`.
+    :returns: the cached or received response message.
+    """
+
+    if cache is None:
+        return call(name, packed_arguments, *args)
+
+    response = cache.get(name, packed_arguments)
+    if response is None:
+        response = call(name, packed_arguments, *args)
+        cache.put(name, packed_arguments, response)
+
+    return response
+
+
+class CachePolicy(object):
+    """Response cache policy of a method.
+    """
+
+    __slots__ = ('ttl', 'exceptions', 'negative_ttl')
+
+    def __init__(self, ttl, exceptions=(), negative_ttl=None):
+        """Initialize a cache policy.
+
+        :param ttl: Time in seconds responses are cached for.
+        :param exceptions:
+            Names of exceptions cached as well, e.g. ``'NotFound'``. Default
+            ``()``.
+        :param negative_ttl:
+            Time in seconds exceptions are cached for. Defaults to
+            :param:`ttl`.
+        """
+
+        self.ttl = ttl
+        self.exceptions = frozenset(exceptions)
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+
+
+class ResponseCache(object):
+    """Client-side response cache.
+
+    Caches the responses of idempotent methods by method name and packed
+    arguments, so repeated calls with identical arguments are answered
+    without a round trip. Only methods with a :class:`CachePolicy` are
+    cached. Entries expire after the time to live of their policy, and the
+    least recently used entries are evicted once the cache holds too many
+    entries or bytes.
+
+    Cached responses are shared between calls and must not be modified.
+    Thread safe.
+    """
+
+    def __init__(self, policies, max_entries=1024, max_bytes=16 << 20):
+        """Initialize a response cache.
+
+        :param policies: Mapping of method names to :class:`CachePolicy`.
+        :param max_entries:
+            Maximum number of cached responses. Default ``1024``.
+        :param max_bytes:
+            Maximum packed size in bytes of the cached arguments and
+            responses. Default 16 MiB.
+        """
+
+        self._policies = dict(policies)
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        """Number of calls answered from the cache.
+        """
+        self.misses = 0
+        """Number of calls to cached methods not answered from the cache.
+        """
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """Packed size in bytes of the cached arguments and responses.
+        """
+
+        return self._bytes
+
+    def _remove(self, key):
+        """Remove an entry.
+
+        Must be called with the lock held.
+
+        :param key: Key.
+        """
+
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, name, packed_arguments):
+        """Get the cached response to a call.
+
+        :param name: Name.
+        :param packed_arguments: Packed arguments.
+        :returns: the cached response message, or ``None``.
+        """
+
+        if name not in self._policies:
+            return None
+
+        key = (name, bytes(packed_arguments))
+
+        with self._lock:
+            try:
+                expires, _, response = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            if expires <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return response
+
+    def put(self, name, packed_arguments, response):
+        """Cache the response to a call, if its policy allows.
+
+        :param name: Name.
+        :param packed_arguments: Packed arguments.
+        :param response: :class:`ResponseMessage` or :class:`ExceptionMessage`.
+        """
+
+        policy = self._policies.get(name)
+        if policy is None:
+            return
+
+        if isinstance(response, ResponseMessage):
+            ttl = policy.ttl
+            size = _packed_size(response.result)
+        elif isinstance(response, ExceptionMessage) and \
+                response.name in policy.exceptions:
+            ttl = policy.negative_ttl
+            size = len(response.description or '')
+        else:
+            return
+
+        key = (name, bytes(packed_arguments))
+        size += len(name) + len(key[1])
+
+        if size > self._max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.time() + ttl, size, response)
+            self._bytes += size
+
+            while len(self._entries) > self._max_entries or \
+                    self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, name, packed_arguments=None):
+        """Remove cached responses.
+
+        :param name: Name.
+        :param packed_arguments:
+            Packed arguments, or ``None`` to remove the cached responses to all
+            calls to the method. Default ``None``.
+        """
+
+        with self._lock:
+            if packed_arguments is not None:
+                key = (name, bytes(packed_arguments))
+                if key in self._entries:
+                    self._remove(key)
+                return
+
+            for key in [key for key in self._entries if key[0] == name]:
+                self._remove(key)
+
+    def clear(self):
+        """Remove all cached responses.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,204 @@
+import threading
+import time
+from enum import Enum
+
+
+class CircuitState(Enum):
+    """Circuit breaker state.
+    """
+
+    closed = 'closed'
+    """Connecting is allowed.
+    """
+
+    open = 'open'
+    """Connecting fails fast.
+    """
+
+    half_open = 'half_open'
+    """A single trial connect is allowed.
+    """
+
+
+class CircuitBreaker(object):
+    """Circuit breaker.
+
+    Opens after a number of failures in a row, so callers fail fast rather
+    than waiting on a backend which is down. Once the reset timeout has
+    passed, the breaker is half-open and lets a single trial through, closing
+    again if the trial succeeds or opening again if it fails.
+
+    Listeners are called with the breaker, the old state and the new state
+    on every change of state, e.g. to shed load while the breaker is open.
+    Thread safe.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """Initialize a circuit breaker.
+
+        :param failure_threshold:
+            Number of failures in a row after which the breaker opens.
+            Default ``5``.
+        :param reset_timeout:
+            Time in seconds after which an open breaker lets a trial through.
+            Default ``30.0``.
+        """
+
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._state = CircuitState.closed
+        self._failures = 0
+        self._opened_at = None
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """:class:`CircuitState` of the breaker.
+        """
+
+        with self._lock:
+            return self._state
+
+    def add_listener(self, listener):
+        """Add a listener to changes of state.
+
+        :param listener:
+            Callable taking the breaker, the old :class:`CircuitState` and the
+            new :class:`CircuitState`.
+        """
+
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Remove a listener to changes of state.
+
+        :param listener: Listener.
+        """
+
+        self._listeners.remove(listener)
+
+    def _set_state(self, state):
+        """Change state.
+
+        Must be called with the lock held.
+
+        :param state: New :class:`CircuitState`.
+        :returns: the old state, or ``None`` if the state did not change.
+        """
+
+        old_state = self._state
+        if old_state is state:
+            return None
+
+        self._state = state
+        return old_state
+
+    def _notify(self, old_state, state):
+        """Notify listeners of a change of state.
+
+        :param old_state: Old :class:`CircuitState`, or ``None``.
+        :param state: New :class:`CircuitState`.
+        """
+
+        if old_state is None:
+            return
+
+        for listener in list(self._listeners):
+            listener(self, old_state, state)
+
+    def allow(self):
+        """Whether an attempt is allowed.
+
+        An attempt allowed while half-open is the trial, and must be followed
+        by a call to :meth:`succeeded` or :meth:`failed`.
+        """
+
+        with self._lock:
+            if self._state is CircuitState.closed:
+                return True
+
+            if self._state is CircuitState.half_open or \
+                    time.time() - self._opened_at < self._reset_timeout:
+                return False
+
+            old_state = self._set_state(CircuitState.half_open)
+
+        self._notify(old_state, CircuitState.half_open)
+        return True
+
+    def succeeded(self):
+        """Record a successful attempt, closing the breaker.
+        """
+
+        with self._lock:
+            self._failures = 0
+            old_state = self._set_state(CircuitState.closed)
+
+        self._notify(old_state, CircuitState.closed)
+
+    def failed(self):
+        """Record a failed attempt, opening the breaker after too many or if
+        the trial failed.
+        """
+
+        with self._lock:
+            self._failures += 1
+            if self._state is CircuitState.closed and \
+                    self._failures < self._failure_threshold:
+                return
+
+            self._opened_at = time.time()
+            old_state = self._set_state(CircuitState.open)
+
+        self._notify(old_state, CircuitState.open)
+
+
+class CircuitBreakerRegistry(object):
+    """Registry of circuit breakers by address.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """Initialize a circuit breaker registry.
+
+        :param failure_threshold:
+            Failure threshold of the breakers. Default ``5``.
+        :param reset_timeout: Reset timeout of the breakers. Default ``30.0``.
+        """
+
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, address):
+        """Get the circuit breaker of an address.
+
+        :param address: Address, e.g. a ``(host, port)`` tuple or list.
+        :returns: the :class:`CircuitBreaker`.
+        """
+
+        if isinstance(address, list):
+            address = tuple(address)
+
+        with self._lock:
+            try:
+                return self._breakers[address]
+            except KeyError:
+                breaker = self._breakers[address] = CircuitBreaker(
+                    self._failure_threshold,
+                    self._reset_timeout
+                )
+                return breaker
+
+    def clear(self):
+        """Remove all circuit breakers.
+        """
+
+        with self._lock:
+            self._breakers.clear()
+
+
+circuit_breakers = CircuitBreakerRegistry()
+"""Circuit breakers shared by clients by default.
+"""
@@ -1,11 +1,28 @@
+import random
 import socket
+import time
+from .cache import cached_call
+from .circuit import circuit_breakers
 from .constants import MAX_UINT32
 from .connection import Connection
-from .exceptions import UnexpectedMessageError
-from .message import (
-    ExceptionMessage,
-    ResponseMessage,
+from .exceptions import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    UnexpectedMessageError,
 )
+from .message import ExceptionMessage, StreamChunkMessage, StreamEndMessage
+
+
+def backoff_delay(retry, backoff, max_backoff):
+    """Delay before retrying a failed connect.
+
+    :param retry: Number of the retry, from ``0``.
+    :param backoff: Base delay in seconds, doubling with every retry.
+    :param max_backoff: Maximum delay in seconds.
+    :returns: a random delay in seconds up to the backoff of the retry.
+    """
+
+    return random.uniform(0, min(backoff * 2 ** min(retry, 32), max_backoff))
 
 
 class Client(object):
@@ -13,67 +30,184 @@ class Client(object):
 
     Base class for client implementations. Operates in a non thread safe
     blocking manner.
+
+    Requests may be pipelined by starting any number of calls with
+    :meth:`_begin_call` before collecting their responses in any order with
+    :meth:`_end_call`.
+
+    Calls given a timeout raise :class:`DeadlineExceededError` once it
+    expires. The timeout is sent along with the request, so the server can
+    skip requests which have expired by the time it gets to them.
+
+    Failed connects are retried after an exponential backoff with full
+    jitter. A circuit breaker per address, shared by all clients by default,
+    opens once connecting keeps failing, failing calls fast with
+    :class:`CircuitOpenError` until a trial connect succeeds.
     """
 
     def __init__(self,
                  address,
                  connect_timeout=10,
-                 reconnect_limit=3):
+                 reconnect_limit=3,
+                 call_timeout=None,
+                 backoff=0.05,
+                 max_backoff=5.0,
+                 circuit_breaker=None,
+                 response_cache=None,
+                 **kwargs):
         """Initialize a client.
 
         :param address: Address.
         :param connect_timeout: Connect timeout. Default ``10``.
         :param reconnect_limit: Reconnect limit. Default ``3``.
+        :param call_timeout:
+            Default timeout of calls in seconds, or ``None`` to wait for
+            responses indefinitely. Default ``None``.
+        :param backoff:
+            Base delay in seconds before retrying a failed connect, doubling
+            with every retry. Default ``0.05``.
+        :param max_backoff:
+            Maximum delay in seconds before retrying a failed connect.
+            Default ``5.0``.
+        :param circuit_breaker:
+            :class:`CircuitBreaker` of the address. Defaults to the breaker of
+            the address shared by all clients.
+        :param response_cache:
+            :class:`ResponseCache` answering calls to cached methods. Default
+            ``None``.
+        :param kwargs: Connection options, e.g. ``compression_threshold``.
         """
 
         self._address = address
         self._message_id = 0
         self._connect_timeout = connect_timeout
         self._reconnect_limit = reconnect_limit
+        self._connection_options = kwargs
+        self._call_timeout = call_timeout
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._circuit_breaker = circuit_breaker or \
+            circuit_breakers.get(address)
+        self._response_cache = response_cache
         self._conn = None
+        self._in_flight = set()
+        self._deadlines = {}
 
     def _next_message_id(self):
         """Next message ID.
+
+        Message IDs of requests still in flight are skipped, should the
+        message ID counter wrap around.
         """
 
-        self._message_id += 1
-        if self._message_id > MAX_UINT32:
-            self._message_id = 0
-        return self._message_id
+        while True:
+            self._message_id += 1
+            if self._message_id > MAX_UINT32:
+                self._message_id = 0
+            if self._message_id not in self._in_flight and \
+                    (self._conn is None or
+                     not self._conn.is_abandoned(self._message_id)):
+                return self._message_id
+
+    def _reset_conn(self):
+        """Reset the connection.
+
+        Any requests in flight on the connection are lost.
+        """
+
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+        self._in_flight.clear()
+        self._deadlines.clear()
 
     def _get_conn(self):
         """Get connection.
         """
 
-        if self._conn is not None:
-            return self._conn
+        if self._conn is None:
+            self._conn = self._connect()
+
+        return self._conn
+
+    def _connect(self):
+        """Open a new connection.
+
+        :returns: the new connection.
+        :raises entangle.CircuitOpenError:
+            if the circuit breaker of the address is open.
+        """
+
+        breaker = self._circuit_breaker
+
+        if not breaker.allow():
+            raise CircuitOpenError('circuit breaker of %r open' %
+                                   (self._address, ))
 
         retry = 0
 
-        while True:
+        try:
+            while True:
+                try:
+                    sock = socket.create_connection(
+                        self._address,
+                        timeout=self._connect_timeout
+                    )
+                except socket.error:
+                    if retry == self._reconnect_limit:
+                        raise
+                else:
+                    break
+
+                time.sleep(self._backoff_delay(retry))
+                retry += 1
+
             try:
-                sock = socket.create_connection(self._address,
-                                                timeout=self._connect_timeout)
-                self._conn = Connection(sock)
-                return self._conn
+                conn = Connection(sock, **self._connection_options)
             except:
-                if retry == self._reconnect_limit:
-                    raise
+                # Close the socket and re-raise.
+                sock.close()
+                raise
+        except:
+            # Record the failure, ending a trial connect, and re-raise.
+            breaker.failed()
+            raise
 
-            retry += 1
+        breaker.succeeded()
+        return conn
 
-    def _call(self, name, packed_arguments, trace=False, notify=False):
-        """Call a method.
+    def _backoff_delay(self, retry):
+        """Delay before retrying a failed connect.
+
+        :param retry: Number of the retry, from ``0``.
+        :returns: a random delay in seconds up to the backoff of the retry.
+        """
+
+        return backoff_delay(retry, self._backoff, self._max_backoff)
+
+    @property
+    def circuit_breaker(self):
+        """:class:`CircuitBreaker` of the address.
+        """
+
+        return self._circuit_breaker
+
+    def _begin_call(self, name, packed_arguments, trace=False, timeout=None):
+        """Begin a call to a method without waiting for the response.
 
         :param name: Name.
         :param packed_arguments: Package arguments.
-        :param trace: Request trace. Ignored if :param:`notify` is ``True``.
-        :param notify: Notify instead of request.
+        :param trace: Request trace.
+        :param timeout:
+            Timeout in seconds. Defaults to the client's call timeout.
         :returns:
-            the response message if :param:`notify` is ``False``, otherwise
-           ``None`` indicating that the notification has been sent.
+            the message ID of the request, to be passed to :meth:`_end_call`.
         """
 
+        if timeout is None:
+            timeout = self._call_timeout
+
         # Get a new message ID.
         message_id = self._next_message_id()
 
@@ -81,33 +215,297 @@ class Client(object):
         conn = self._get_conn()
 
         try:
-            # Send the request.
-            if notify:
-                conn.send_notification(message_id, name, packed_arguments)
+            conn.send_request(message_id,
+                              name,
+                              packed_arguments,
+                              trace,
+                              timeout)
+        except:
+            # Reset the connection and re-raise.
+            self._reset_conn()
+            raise
+
+        self._in_flight.add(message_id)
+        if timeout is not None:
+            self._deadlines[message_id] = time.time() + timeout
+
+        return message_id
+
+    def _end_call(self, message_id):
+        """End a call begun with :meth:`_begin_call`.
+
+        :param message_id: Message ID of the request.
+        :returns: the response message.
+        :raises entangle.DeadlineExceededError:
+            if the call's timeout expires first. The call is abandoned.
+        """
+
+        if message_id not in self._in_flight:
+            raise UnexpectedMessageError('no request with message ID %d in '
+                                         'flight' % (message_id))
+
+        deadline = self._deadlines.pop(message_id, None)
+
+        try:
+            if deadline is None:
+                response = self._conn.receive_response(message_id)
             else:
-                conn.send_request(message_id, name, packed_arguments, trace)
+                response = self._conn.receive_response(
+                    message_id,
+                    deadline - time.time()
+                )
+        except DeadlineExceededError:
+            self._abandon_call(message_id)
+            raise
+        except:
+            # Reset the connection and re-raise.
+            self._reset_conn()
+            raise
 
-            # Wait for a response.
-            if notify:
-                return
+        self._in_flight.discard(message_id)
+        return response
+
+    def _abandon_call(self, message_id):
+        """Abandon a call in flight, discarding its response once received.
 
-            response = conn.receive()
+        :param message_id: Message ID of the request.
+        """
+
+        self._conn.abandon(message_id)
+        self._in_flight.discard(message_id)
+        self._deadlines.pop(message_id, None)
+
+    def _call_many(self, calls, trace=False, timeout=None):
+        """Call a batch of methods.
+
+        All requests are sent at once before any response is awaited.
+
+        :param calls: Iterable of ``(name, packed_arguments)`` tuples.
+        :param trace: Request trace.
+        :param timeout:
+            Timeout in seconds for the whole batch. Defaults to the client's
+            call timeout.
+        :returns: the response messages in the order of :param:`calls`.
+        """
+
+        if timeout is None:
+            timeout = self._call_timeout
+
+        requests = [(self._next_message_id(),
+                     name,
+                     packed_arguments,
+                     trace,
+                     timeout)
+                    for name, packed_arguments in calls]
+
+        # Get a connection.
+        conn = self._get_conn()
+
+        try:
+            conn.send_requests(requests)
         except:
             # Reset the connection and re-raise.
-            self._conn.close()
-            self._conn = None
+            self._reset_conn()
             raise
 
-        # Make sure the response is either a result or an exception.
-        if not isinstance(response, (ExceptionMessage, ResponseMessage, )):
-            raise UnexpectedMessageError('unexpected response: %r' %
-                                         (response))
+        message_ids = [request[0] for request in requests]
+        self._in_flight.update(message_ids)
+
+        if timeout is not None:
+            deadline = time.time() + timeout
+            for message_id in message_ids:
+                self._deadlines[message_id] = deadline
+
+        responses = []
 
-        # Make sure the message IDs match.
-        if response.message_id != message_id:
-            raise UnexpectedMessageError(
-                'expected response to have message ID %d, but it has message '
-                'ID %d' % (message_id, response.message_id)
-            )
+        try:
+            for message_id in message_ids:
+                responses.append(self._end_call(message_id))
+        except DeadlineExceededError:
+            for message_id in message_ids[len(responses) + 1:]:
+                self._abandon_call(message_id)
+            raise
+
+        return responses
+
+    def _call_stream(self, name, packed_arguments, window=16, trace=False):
+        """Call a method returning a streamed result.
+
+        The server sends at most :param:`window` chunks ahead of those
+        consumed, so a slow consumer throttles the server rather than chunks
+        piling up in memory. Closing the returned generator before the end of
+        the stream cancels the stream.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param window: Number of chunks in flight. Default ``16``.
+        :param trace: Request trace.
+        :returns:
+            a generator of a :class:`StreamChunkMessage` for each chunk as it
+            is received, ending with an :class:`ExceptionMessage` if the call
+            fails.
+        """
+
+        # Get a new message ID.
+        message_id = self._next_message_id()
+
+        # Get a connection.
+        conn = self._get_conn()
+
+        try:
+            conn.send_stream_request(message_id,
+                                     name,
+                                     packed_arguments,
+                                     window,
+                                     trace)
+        except:
+            # Reset the connection and re-raise.
+            self._reset_conn()
+            raise
+
+        self._in_flight.add(message_id)
+        return self._stream(conn, message_id, window)
+
+    def _receive_stream_response(self, conn, message_id):
+        """Receive the next response of a stream.
+
+        :param conn: Connection of the stream.
+        :param message_id: Message ID of the request.
+        """
+
+        try:
+            response = conn.receive_response(message_id)
+        except:
+            # Reset the connection and re-raise.
+            self._reset_conn()
+            raise
+
+        if not isinstance(response, (ExceptionMessage,
+                                     StreamChunkMessage,
+                                     StreamEndMessage, )):
+            self._reset_conn()
+            raise UnexpectedMessageError('unexpected stream response: %r' %
+                                         (response))
 
         return response
+
+    def _stream(self, conn, message_id, window):
+        """Receive the chunks of a stream.
+
+        :param conn: Connection of the stream.
+        :param message_id: Message ID of the request.
+        :param window: Number of chunks in flight.
+        """
+
+        # Grant credit in batches of half the window.
+        batch = max(window // 2, 1)
+        consumed = 0
+        done = False
+
+        try:
+            while True:
+                response = self._receive_stream_response(conn, message_id)
+
+                if not isinstance(response, StreamChunkMessage):
+                    done = True
+                    if isinstance(response, ExceptionMessage):
+                        yield response
+                    return
+
+                yield response
+
+                consumed += 1
+                if consumed == batch:
+                    try:
+                        conn.send_stream_credit(message_id, consumed)
+                    except:
+                        # Reset the connection and re-raise.
+                        self._reset_conn()
+                        raise
+                    consumed = 0
+        finally:
+            if not done and self._conn is conn:
+                self._cancel_stream(conn, message_id)
+
+            self._in_flight.discard(message_id)
+
+    def _cancel_stream(self, conn, message_id):
+        """Cancel a stream, discarding the chunks already in flight.
+
+        :param conn: Connection of the stream.
+        :param message_id: Message ID of the request.
+        """
+
+        try:
+            conn.send_stream_cancel(message_id)
+        except:
+            self._reset_conn()
+            return
+
+        while True:
+            try:
+                response = self._receive_stream_response(conn, message_id)
+            except:
+                return
+
+            if not isinstance(response, StreamChunkMessage):
+                return
+
+    def _request(self, name, packed_arguments, trace, timeout):
+        """Make a request and wait for the response.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace.
+        :param timeout: Timeout in seconds, or ``None``.
+        :returns: the response message.
+        """
+
+        return self._end_call(self._begin_call(name,
+                                               packed_arguments,
+                                               trace,
+                                               timeout))
+
+    def _call(self,
+              name,
+              packed_arguments,
+              trace=False,
+              notify=False,
+              timeout=None):
+        """Call a method.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace. Ignored if :param:`notify` is ``True``.
+        :param notify: Notify instead of request.
+        :param timeout:
+            Timeout in seconds. Defaults to the client's call timeout. Ignored
+            if :param:`notify` is ``True``.
+        :returns:
+            the response message if :param:`notify` is ``False``, otherwise
+           ``None`` indicating that the notification has been sent.
+        :raises entangle.DeadlineExceededError:
+            if the timeout expires before the response is received.
+        """
+
+        if not notify:
+            return cached_call(self._response_cache,
+                               self._request,
+                               name,
+                               packed_arguments,
+                               trace,
+                               timeout)
+
+        # Get a new message ID.
+        message_id = self._next_message_id()
+
+        # Get a connection.
+        conn = self._get_conn()
+
+        try:
+            # Send the notification.
+            conn.send_notification(message_id, name, packed_arguments)
+        except:
+            # Reset the connection and re-raise.
+            self._reset_conn()
+            raise
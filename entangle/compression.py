@@ -0,0 +1,305 @@
+import snappy
+import time
+import zlib
+from .compression_method import CompressionMethod
+from .exceptions import BadMessageError
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+
+class Codec(object):
+    """Compression codec.
+
+    :cvar errors: Exception types raised on invalid compressed data.
+    """
+
+    errors = ()
+
+    def compress(self, data):
+        """Compress data.
+
+        :param data: Data to compress.
+        :returns: the compressed data.
+        """
+
+        raise NotImplementedError()
+
+    def decompress(self, data, max_size=None):
+        """Decompress data.
+
+        :param data: Data to decompress.
+        :param max_size:
+            Maximum decompressed size in bytes, or ``None`` for no limit.
+            Default ``None``.
+        :returns: the decompressed data.
+        :raises entangle.BadMessageError:
+            if the decompressed data would exceed :param:`max_size`, detected
+            before the decompressed data is allocated in full.
+        """
+
+        raise NotImplementedError()
+
+
+def _size_exceeded(max_size):
+    return BadMessageError('decompressed message exceeds maximum size of %d '
+                           'bytes' % (max_size))
+
+
+def _snappy_uncompressed_length(data):
+    """Read the uncompressed length from the header of Snappy data.
+
+    :param data: Snappy compressed data.
+    :returns: the uncompressed length, or ``None`` if the header is invalid.
+    """
+
+    length = 0
+
+    for i, byte in enumerate(bytearray(data[:5])):
+        length |= (byte & 0x7f) << (7 * i)
+        if not byte & 0x80:
+            return length
+
+    return None
+
+
+class SnappyCodec(Codec):
+    """Snappy codec.
+    """
+
+    errors = (snappy.UncompressError, )
+
+    def compress(self, data):
+        return snappy.compress(data)
+
+    def decompress(self, data, max_size=None):
+        if max_size is not None:
+            length = _snappy_uncompressed_length(data)
+            if length is None:
+                raise snappy.UncompressError('invalid Snappy header')
+            if length > max_size:
+                raise _size_exceeded(max_size)
+
+        return snappy.uncompress(data)
+
+
+class ZlibCodec(Codec):
+    """zlib codec.
+    """
+
+    errors = (zlib.error, )
+
+    def __init__(self, level=6):
+        """Initialize a zlib codec.
+
+        :param level: Compression level from ``1`` to ``9``. Default ``6``.
+        """
+
+        self._level = level
+
+    def compress(self, data):
+        return zlib.compress(data, self._level)
+
+    def decompress(self, data, max_size=None):
+        if max_size is None:
+            return zlib.decompress(data)
+
+        decompressor = zlib.decompressobj()
+        decompressed = decompressor.decompress(data, max_size + 1)
+        if len(decompressed) > max_size:
+            raise _size_exceeded(max_size)
+        if not decompressor.eof:
+            raise zlib.error('incomplete or truncated stream')
+
+        return decompressed
+
+
+class LzmaCodec(Codec):
+    """LZMA codec.
+    """
+
+    errors = (lzma.LZMAError, ) if lzma is not None else ()
+
+    def __init__(self, preset=1):
+        """Initialize an LZMA codec.
+
+        :param preset: Compression preset from ``0`` to ``9``. Default ``1``.
+        """
+
+        if lzma is None:
+            raise RuntimeError('lzma is not available')
+
+        self._preset = preset
+
+    def compress(self, data):
+        return lzma.compress(data, preset=self._preset)
+
+    def decompress(self, data, max_size=None):
+        if max_size is None:
+            return lzma.decompress(data)
+
+        decompressor = lzma.LZMADecompressor()
+        decompressed = decompressor.decompress(data, max_size + 1)
+        if len(decompressed) > max_size:
+            raise _size_exceeded(max_size)
+        if not decompressor.eof:
+            raise lzma.LZMAError('incomplete or truncated stream')
+
+        return decompressed
+
+
+codecs = {
+    CompressionMethod.snappy: SnappyCodec(),
+    CompressionMethod.zlib: ZlibCodec(),
+}
+"""Codecs by compression method.
+"""
+
+if lzma is not None:
+    codecs[CompressionMethod.lzma] = LzmaCodec()
+
+
+def register_codec(method, codec):
+    """Register the codec for a compression method.
+
+    Replaces any codec previously registered for the method, e.g. to change
+    the compression level.
+
+    :param method: Compression method.
+    :param codec: :class:`Codec`.
+    """
+
+    codecs[method] = codec
+
+
+class _MethodCompressionStatistics(object):
+    """Compression samples for a single Entangle method name.
+    """
+
+    __slots__ = ('costs', 'count')
+
+    def __init__(self):
+        self.costs = {}
+        self.count = 0
+
+
+class AdaptiveCompression(object):
+    """Adaptive compression.
+
+    Picks the compression method, or no compression, per Entangle method name
+    by sampling how well and how fast each compression method compresses
+    messages for the method name. The estimated cost of sending a message is
+    the time to compress it plus the time to transfer it at the given
+    bandwidth.
+    """
+
+    def __init__(self,
+                 methods=None,
+                 bandwidth=12500000,
+                 sample_interval=100,
+                 decay=0.2):
+        """Initialize adaptive compression.
+
+        :param methods:
+            Candidate compression methods. Defaults to all methods with a
+            registered codec.
+        :param bandwidth:
+            Link bandwidth in bytes per second. Default ``12500000``
+            (100 Mbit/s).
+        :param sample_interval:
+            Number of messages after which a candidate other than the best is
+            sampled again. Default ``100``.
+        :param decay: Weight of new samples. Default ``0.2``.
+        """
+
+        if methods is None:
+            methods = sorted(codecs, key=lambda method: method.value)
+
+        self._candidates = [None] + list(methods)
+        self._bandwidth = float(bandwidth)
+        self._sample_interval = sample_interval
+        self._decay = decay
+        self._stats = {}
+
+    def select(self, name):
+        """Select the compression method for a message.
+
+        :param name: Entangle method name.
+        :returns:
+            the compression method or ``None`` if the message should not be
+            compressed.
+        """
+
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _MethodCompressionStatistics()
+
+        stats.count += 1
+
+        # Sample every candidate at least once.
+        for candidate in self._candidates:
+            if candidate not in stats.costs:
+                return candidate
+
+        best = min(self._candidates, key=lambda c: stats.costs[c])
+
+        # Periodically resample the other candidates in turn.
+        if stats.count % self._sample_interval == 0:
+            others = [c for c in self._candidates if c is not best]
+            if others:
+                turn = stats.count // self._sample_interval
+                return others[turn % len(others)]
+
+        return best
+
+    def record(self, name, method, size, compressed_size, elapsed):
+        """Record a compression sample.
+
+        :param name: Entangle method name.
+        :param method: Compression method or ``None`` for no compression.
+        :param size: Uncompressed size in bytes.
+        :param compressed_size: Compressed size in bytes.
+        :param elapsed: Time spent compressing in seconds.
+        """
+
+        if size <= 0:
+            return
+
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _MethodCompressionStatistics()
+
+        # Normalize the cost to seconds per uncompressed byte.
+        cost = (elapsed + compressed_size / self._bandwidth) / size
+
+        previous = stats.costs.get(method)
+        if previous is None:
+            stats.costs[method] = cost
+        else:
+            stats.costs[method] = previous + self._decay * (cost - previous)
+
+    def compress(self, name, data):
+        """Compress a serialized message with the selected method.
+
+        :param name: Entangle method name.
+        :param data: Serialized message.
+        :returns:
+            a tuple of the compression method and the compressed data, or
+            ``(None, data)`` if the message should not be compressed.
+        """
+
+        method = self.select(name)
+
+        if method is None:
+            self.record(name, None, len(data), len(data), 0.0)
+            return None, data
+
+        start = time.time()
+        compressed = codecs[method].compress(data)
+        elapsed = time.time() - start
+
+        self.record(name, method, len(data), len(compressed), elapsed)
+
+        return method, compressed
@@ -8,3 +8,11 @@ class CompressionMethod(Enum):
     snappy = 0
     """Snappy compression.
     """
+
+    zlib = 1
+    """zlib compression.
+    """
+
+    lzma = 2
+    """LZMA compression.
+    """
@@ -1,8 +1,10 @@
 import errno
 import msgpack
-import snappy
 import socket
-from io import BytesIO
+import time
+from collections import deque
+from .compression import AdaptiveCompression, codecs
+from .compression_method import CompressionMethod
 from .deserialization import (
     deserialize_binary,
     deserialize_bool,
@@ -11,122 +13,585 @@ from .deserialization import (
 )
 from .exceptions import (
     BadMessageError, DeserializationError, ConnectionLostError,
+    DeadlineExceededError, UnexpectedMessageError,
 )
+from .headers import (
+    header_cache as default_header_cache,
+    pack_message_id,
+    pack_prefix,
+)
+from .lazy import LazyValue, is_packed_array
+from .ndarray import ext_hook
 from .message import (
     ExceptionMessage,
     NotificationMessage,
     ResponseMessage,
     RequestMessage,
     NotificationAcknowledgementMessage,
+    StreamCancelMessage,
+    StreamChunkMessage,
+    StreamCreditMessage,
+    StreamEndMessage,
 )
 from .opcode import Opcode
 from .packing import packer
+from .statistics import CompressionStatistics, ReceiveStatistics
 from .trace import Trace
 
 
-class Connection(object):
-    """Entangle connection.
+MAX_SEND_BUFFERS = 1024
+"""Maximum number of buffers written by a single scatter-gather write.
+"""
+
+MIN_RECEIVE_BUFFER_SIZE = 4096
+"""Minimum receive buffer size.
+"""
+
+MAX_RECEIVE_BUFFER_SIZE = 1 << 20
+"""Maximum receive buffer size.
+"""
+
+MAX_RECEIVE_AVAILABLE_SIZE = 1 << 20
+"""Maximum size in bytes of the data read by a single call to
+:meth:`Connection.receive_available`.
+"""
+
+OVERSIZE_MESSAGE_SIZE = 1 << 20
+"""Size from which the unpacker is replaced after unpacking a message, to
+release the memory its internal buffer grew to.
+"""
+
+
+_lazy_fields = {
+    Opcode.request.value: 3,
+    Opcode.notification.value: 3,
+    Opcode.response.value: 2,
+    Opcode.stream_chunk.value: 2,
+}
+"""Position of the lazily decoded field of messages by opcode.
+"""
+
+
+class BaseConnection(object):
+    """Entangle connection base.
+
+    Message encoding and decoding shared by connection implementations
+    regardless of transport.
     """
 
-    def __init__(self, sock):
+    def __init__(self,
+                 compression_threshold=None,
+                 compression_method=CompressionMethod.snappy,
+                 header_cache=None,
+                 max_message_size=None,
+                 max_decompressed_size=None,
+                 lazy=False):
         """Initialize an Entangle connection.
 
-        :param sock: Python socket or object of equivalent interface.
+        :param compression_threshold:
+            Size in bytes from which outgoing requests and notifications are
+            compressed, or ``None`` to never compress. Default ``None``.
+        :param compression_method:
+            Compression method, or :class:`AdaptiveCompression` to pick the
+            compression method per method name. Default
+            :attr:`CompressionMethod.snappy`.
+        :param header_cache:
+            :class:`HeaderCache` of pre-encoded message headers. Defaults to
+            the cache shared by all connections.
+        :param max_message_size:
+            Maximum size in bytes of a received message, or ``None`` for no
+            limit. Default ``None``.
+        :param max_decompressed_size:
+            Maximum decompressed size in bytes of a received compressed
+            message. Defaults to :param:`max_message_size`.
+        :param lazy:
+            Whether to receive the arguments of requests and notifications,
+            and the results of responses and stream chunks, as
+            :class:`LazyValue` objects holding the packed value and decoding
+            it on first access. Default ``False``.
         """
 
-        self._sock = sock
-        self._unpacker = msgpack.Unpacker()
+        if max_decompressed_size is None:
+            max_decompressed_size = max_message_size
 
-    def _send(self, data):
-        """Send data over the wire.
+        self._max_message_size = max_message_size
+        self._max_decompressed_size = max_decompressed_size
+        self._lazy = lazy
+        self._fed = 0
+        self._consumed = 0
+        self._raw = bytearray()
+        self._raw_offset = 0
+        self._partial = None
+        self._received = bytearray()
+        self._header_cache = \
+            header_cache if header_cache is not None else default_header_cache
+        self._compression_threshold = compression_threshold
+        self._compression_method = compression_method
+        self.compression_statistics = CompressionStatistics()
+        """Outbound compression statistics.
+        """
+
+    def _compress(self, message_id, name, buffers):
+        """Compress a serialized message if worthwhile.
 
-        :param data: Data to send.
+        :param message_id: Message ID.
+        :param name: Method name.
+        :param buffers: List of buffers making up the serialized message.
+        :returns:
+            a list holding the serialized compressed message if the message is
+            at least the compression threshold in size and compresses to a
+            smaller size, otherwise :param:`buffers`.
         """
 
-        while data:
-            try:
-                sent = self._sock.send(data)
-            except socket.error as e:
-                code, msg = e
+        if self._compression_threshold is None:
+            return buffers
+
+        size = sum(len(buf) for buf in buffers)
+        if size < self._compression_threshold:
+            return buffers
+
+        data = b''.join(buffers)
+
+        stats = self.compression_statistics
+        stats.messages += 1
+
+        if isinstance(self._compression_method, AdaptiveCompression):
+            method, compressed_data = \
+                self._compression_method.compress(name, data)
+            if method is None:
+                return buffers
+        else:
+            method = self._compression_method
+            compressed_data = codecs[method].compress(data)
+
+        compressed = packer.pack([Opcode.compressed_message.value,
+                                  message_id,
+                                  method.value,
+                                  compressed_data])
+
+        if len(compressed) >= size:
+            return buffers
 
-                if code == errno.EINTR:
+        stats.compressed_messages += 1
+        stats.uncompressed_bytes += size
+        stats.compressed_bytes += len(compressed)
+
+        return [compressed]
+
+    def _create_unpacker(self, max_size=None):
+        """Create an unpacker for received data.
+
+        NumPy arrays are decoded as views over the received data.
+
+        :param max_size:
+            Maximum size in bytes of buffered data. Defaults to the maximum
+            message size.
+        """
+
+        if max_size is None:
+            max_size = self._max_message_size
+
+        return msgpack.Unpacker(ext_hook=ext_hook,
+                                max_buffer_size=max_size or 0)
+
+    def _feed(self, data):
+        """Feed received data to the unpacker.
+
+        Data beyond what fits in the unpacker within the maximum message size
+        is held back until the messages before it have been unpacked, so the
+        limit applies to each message rather than to everything received at
+        once.
+
+        :param data: Received data.
+        """
+
+        if not self._received and \
+                (self._max_message_size is None or
+                 len(data) <= self._max_message_size - self._buffered_size()):
+            self._feed_unpacker(data)
+            return
+
+        self._received += data
+        self._fill()
+
+    def _fill(self):
+        """Feed the unpacker held back data, as much as fits within the
+        maximum message size.
+
+        :returns: whether any data was fed.
+        """
+
+        size = len(self._received)
+        if not size:
+            return False
+
+        if self._max_message_size is not None:
+            size = min(size, self._max_message_size - self._buffered_size())
+            if size <= 0:
+                return False
+
+        data = bytes(self._received[:size])
+        del self._received[:size]
+        self._feed_unpacker(data)
+
+        return True
+
+    def _feed_unpacker(self, data):
+        """Feed data to the unpacker.
+
+        :param data: Data.
+        :raises entangle.BadMessageError:
+            if the buffered data exceeds the maximum message size.
+        """
+
+        try:
+            self._unpacker.feed(data)
+        except msgpack.BufferFull:
+            raise BadMessageError('message exceeds maximum size of %d bytes' %
+                                  (self._max_message_size))
+
+        self._fed += len(data)
+
+        # Lazy decoding slices packed values out of a copy of the data, as
+        # the unpacker does not expose its buffer.
+        if self._lazy:
+            self._raw += data
+
+    def _buffered_size(self):
+        """Size in bytes of the data buffered in the unpacker, not yet
+        unpacked.
+        """
+
+        return self._fed - self._consumed
+
+    def _unpack(self):
+        """Unpack the next message from the unpacker.
+
+        :returns:
+            the unpacked message, or the packed message if decoding lazily.
+        :raises msgpack.OutOfData: if no complete message has been received.
+        :raises entangle.BadMessageError:
+            if the message exceeds the maximum message size.
+        """
+
+        while True:
+            try:
+                if not self._lazy:
+                    ser = self._unpacker.unpack()
+                else:
+                    ser = self._unpack_lazy()
+            except msgpack.OutOfData:
+                if self._fill():
                     continue
-                if code == errno.EPIPE:
-                    raise ConnectionLostError('connection lost')
+
+                # The unpacker holds as much as a message may take, yet not
+                # the whole message.
+                if self._max_message_size is not None and \
+                        self._buffered_size() >= self._max_message_size:
+                    raise BadMessageError('message exceeds maximum size of '
+                                          '%d bytes' %
+                                          (self._max_message_size))
                 raise
+            except ValueError as e:
+                raise BadMessageError('invalid message data received: %s' %
+                                      (e))
 
-            if sent == 0:
-                raise ConnectionLostError('connection lost')
+            break
 
-            data = data[sent:]
+        self._consumed = self._unpacker.tell()
 
-    def send_request(self, message_id, method, packed_arguments, trace=False):
-        """Send request.
+        if self._lazy:
+            self._release_raw()
+
+        return ser
+
+    def _unpack_lazy(self):
+        """Unpack the next message from the unpacker, leaving its arguments
+        or result packed.
+
+        The fields of the message are read one at a time, resuming a message
+        received in part where it left off. The packed field is skipped over
+        and sliced out of the received data, so it is neither decoded nor
+        copied more than once.
+
+        :returns: the unpacked message.
+        :raises msgpack.OutOfData: if no complete message has been received.
+        """
+
+        unpacker = self._unpacker
+
+        if self._partial is None:
+            length = unpacker.read_array_header()
+            if length < 2:
+                raise BadMessageError('invalid message data received')
+            self._partial = [length, [], None]
+
+        length, ser, _ = partial = self._partial
+
+        while len(ser) < length:
+            if len(ser) < 2:
+                ser.append(unpacker.unpack())
+                continue
+
+            try:
+                lazy_field = _lazy_fields.get(ser[0])
+            except TypeError:
+                lazy_field = None
+
+            if len(ser) != lazy_field:
+                ser.append(unpacker.unpack())
+                continue
+
+            # The offset reported after running out of data is off, so the
+            # start of the field is taken before trying to skip it.
+            if partial[2] is None:
+                partial[2] = unpacker.tell()
+            unpacker.skip()
+            ser.append(LazyValue(self._raw_slice(partial[2],
+                                                 unpacker.tell())))
+
+        self._partial = None
+        self._check_lazy(ser)
+
+        return ser
+
+    def _raw_slice(self, start, end):
+        """Copy received data out of the lazy decoding buffer.
+
+        :param start: Start offset into the unpacker's data.
+        :param end: End offset into the unpacker's data.
+        :returns: the data.
+        """
+
+        start -= self._raw_offset
+        end -= self._raw_offset
+
+        with memoryview(self._raw) as view:
+            return bytes(view[start:end])
+
+    def _release_raw(self):
+        """Release the data of unpacked messages from the lazy decoding
+        buffer.
+
+        The buffer is only compacted once the unpacked data makes up half of
+        it, rather than moving the data left on every message.
+        """
+
+        size = self._consumed - self._raw_offset
+
+        if size == len(self._raw):
+            del self._raw[:]
+        elif size * 2 >= len(self._raw):
+            del self._raw[:size]
+        else:
+            return
+
+        self._raw_offset = self._consumed
+
+    def _check_lazy(self, ser):
+        """Check a message unpacked lazily.
+
+        :param ser: Unpacked message.
+        :raises entangle.BadMessageError:
+            if the arguments of a request or notification are not an array.
+        """
+
+        if ser[0] in (Opcode.request.value, Opcode.notification.value, ) and \
+                len(ser) > 3 and not is_packed_array(ser[3].raw):
+            raise BadMessageError('invalid message data received')
+
+    def _deserialize(self, ser):
+        """Deserialize an unpacked message.
+
+        :param ser: Result of :meth:`_unpack`.
+        :returns: the message.
+        """
+
+        return self._deserialize_message(ser)
+
+    def _deserialize_lazy(self, raw):
+        """Deserialize a decompressed packed message, leaving arguments and
+        results packed.
+
+        :param raw: Packed message.
+        :returns: the message.
+        """
+
+        unpacker = self._create_unpacker(max(len(raw), 1))
+        unpacker.feed(raw)
+
+        try:
+            length = unpacker.read_array_header()
+            if length < 2:
+                raise BadMessageError('invalid message data received')
+
+            ser = [unpacker.unpack(), unpacker.unpack()]
+
+            # Positions of the lazily decoded field by opcode.
+            lazy_field = _lazy_fields.get(ser[0])
+
+            for i in range(2, length):
+                if i != lazy_field:
+                    ser.append(unpacker.unpack())
+                    continue
+
+                start = unpacker.tell()
+                unpacker.skip()
+                ser.append(LazyValue(raw[start:unpacker.tell()]))
+        except (msgpack.OutOfData, msgpack.ExtraData, ValueError,
+                TypeError, ):
+            raise BadMessageError('invalid message data received')
+
+        self._check_lazy(ser)
+
+        return self._deserialize_message(ser)
+
+    def _replace_unpacker(self):
+        """Replace the unpacker, releasing the memory held by its buffer.
+
+        Data buffered but not yet unpacked is carried over to the new
+        unpacker.
+        """
+
+        buffered = self._buffered_size()
+        data = self._unpacker.read_bytes(buffered) if buffered else b''
+
+        self._unpacker = self._create_unpacker()
+        self._fed = 0
+        self._consumed = 0
+        del self._raw[:]
+        self._raw_offset = 0
+        if data:
+            self._feed_unpacker(data)
+
+    def _build_request(self,
+                       message_id,
+                       method,
+                       packed_arguments,
+                       trace,
+                       timeout=None):
+        """Build request.
 
         :param message_id: Message ID.
         :param method: Method name.
         :param packed_arguments: Package arguments.
-        :param trace: Request trace. Default ``False``.
+        :param trace: Request trace.
+        :param timeout:
+            Time in seconds the caller waits for the response, or ``None``.
+            Default ``None``.
+        :returns:
+            a list of buffers making up the serialized request. The packed
+            arguments are passed through without being copied.
         """
 
-        # Build the request.
-        stream = BytesIO()
+        prefix, packed_method = self._header_cache.get(Opcode.request, method)
+        buffers = [None, packed_arguments, packer.pack(trace)]
 
-        stream.write(packer.pack_array_header(5))
-        stream.write(packer.pack(Opcode.request.value))
-        stream.write(packer.pack(message_id))
-        stream.write(packer.pack(method))
-        stream.write(packed_arguments)
-        stream.write(packer.pack(trace))
+        # The timeout is sent in milliseconds as an optional last element.
+        if timeout is not None:
+            prefix = pack_prefix(Opcode.request, 6)
+            buffers.append(packer.pack(
+                min(max(int(timeout * 1000), 0), 0xffffffff)
+            ))
 
-        stream.seek(0)
+        buffers[0] = b''.join([prefix,
+                               pack_message_id(message_id),
+                               packed_method])
 
-        # Send the data.
-        self._send(stream.getvalue())
+        return self._compress(message_id, method, buffers)
 
-    def send_notification(self, message_id, method, packed_arguments):
-        """Send notification.
+    def _build_notification(self, message_id, method, packed_arguments):
+        """Build notification.
 
         :param message_id: Message ID.
         :param method: Method name.
         :param packed_arguments: Package arguments.
+        :returns:
+            a list of buffers making up the serialized notification. The
+            packed arguments are passed through without being copied.
         """
 
-        # Build the request.
-        stream = BytesIO()
+        prefix, packed_method = \
+            self._header_cache.get(Opcode.notification, method)
+        header = b''.join([prefix, pack_message_id(message_id), packed_method])
+
+        return self._compress(message_id, method, [header, packed_arguments])
 
-        stream.write(packer.pack_array_header(4))
-        stream.write(packer.pack(Opcode.notification.value))
-        stream.write(packer.pack(message_id))
-        stream.write(packer.pack(method))
-        stream.write(packed_arguments)
+    def _build_response(self, message_id, packed_result, trace=None):
+        """Build response.
 
-        stream.seek(0)
+        :param message_id: Message ID.
+        :param packed_result: Packed result.
+        :param trace: Request trace. Default ``None``.
+        :returns: a list of buffers making up the serialized response.
+        """
 
-        # Send the data.
-        self._send(stream.getvalue())
+        header = pack_prefix(Opcode.response) + pack_message_id(message_id)
 
-    def receive(self):
-        """Receive message.
+        return [header, packed_result, packer.pack(trace)]
+
+    def _build_exception(self,
+                         message_id,
+                         definition,
+                         name,
+                         description,
+                         trace=None):
+        """Build exception.
+
+        :param message_id: Message ID.
+        :param definition: Exception definition.
+        :param name: Exception name.
+        :param description: Exception description.
+        :param trace: Request trace. Default ``None``.
+        :returns: a list of buffers making up the serialized exception.
         """
 
-        # Receive the message data.
-        while True:
-            buf = self._sock.recv(4096)
-            if not buf:
-                raise ConnectionLostError('connection lost')
+        return [packer.pack([Opcode.exception.value,
+                             message_id,
+                             definition,
+                             name,
+                             description,
+                             trace])]
 
-            self._unpacker.feed(buf)
+    def _build_stream_chunk(self, message_id, packed_chunk):
+        """Build stream chunk.
 
-            try:
-                ser = self._unpacker.unpack()
-            except msgpack.OutOfData:
-                continue
+        :param message_id: Message ID of the request.
+        :param packed_chunk: Packed chunk.
+        :returns: a list of buffers making up the serialized stream chunk.
+        """
 
-            break
+        header = pack_prefix(Opcode.stream_chunk) + pack_message_id(message_id)
 
-        # Deserialize the message data.
-        return self._deserialize_message(ser)
+        return [header, packed_chunk]
+
+    def _build_stream_end(self, message_id):
+        """Build stream end.
+
+        :param message_id: Message ID of the request.
+        :returns: a list of buffers making up the serialized stream end.
+        """
+
+        return [packer.pack([Opcode.stream_end.value, message_id])]
+
+    def _build_stream_credit(self, message_id, credits):
+        """Build stream credit.
+
+        :param message_id: Message ID of the request.
+        :param credits: Number of further chunks the receiver accepts.
+        :returns: a list of buffers making up the serialized stream credit.
+        """
+
+        return [packer.pack([Opcode.stream_credit.value, message_id, credits])]
+
+    def _build_stream_cancel(self, message_id):
+        """Build stream cancel.
+
+        :param message_id: Message ID of the request.
+        :returns: a list of buffers making up the serialized stream cancel.
+        """
+
+        return [packer.pack([Opcode.stream_cancel.value, message_id])]
 
     def _deserialize_message(self, ser):
         # Deserialize the response.
@@ -148,21 +613,30 @@ class Connection(object):
         ser = ser[2:]
 
         if opcode == Opcode.request:
-            if len(ser) != 3:
+            if len(ser) not in (3, 4, ):
                 raise BadMessageError('invalid message data received')
 
+            deadline = None
+
             try:
                 method = deserialize_string(ser[0])
                 trace = deserialize_bool(ser[2])
+                if len(ser) == 4:
+                    deadline = time.time() + \
+                        deserialize_uint32(ser[3]) / 1000.0
             except DeserializationError:
                 raise BadMessageError('invalid message data received')
 
             arguments = ser[1]
 
-            if not isinstance(arguments, (list, tuple, )):
+            if not isinstance(arguments, (list, tuple, LazyValue, )):
                 raise BadMessageError('invalid message data received')
 
-            return RequestMessage(message_id, method, arguments, trace)
+            return RequestMessage(message_id,
+                                  method,
+                                  arguments,
+                                  trace,
+                                  deadline)
 
         if opcode == Opcode.notification:
             if len(ser) != 2:
@@ -175,7 +649,7 @@ class Connection(object):
 
             arguments = ser[1]
 
-            if not isinstance(arguments, (list, tuple, )):
+            if not isinstance(arguments, (list, tuple, LazyValue, )):
                 raise BadMessageError('invalid message data received')
 
             return NotificationMessage(message_id, method, arguments)
@@ -222,35 +696,652 @@ class Connection(object):
                                     description,
                                     trace)
 
+        if opcode == Opcode.stream_chunk:
+            if len(ser) != 1:
+                raise BadMessageError('invalid message data received')
+
+            return StreamChunkMessage(message_id, ser[0])
+
+        if opcode == Opcode.stream_end:
+            if len(ser) != 0:
+                raise BadMessageError('invalid message data received')
+
+            return StreamEndMessage(message_id)
+
+        if opcode == Opcode.stream_credit:
+            if len(ser) != 1:
+                raise BadMessageError('invalid message data received')
+
+            try:
+                credits = deserialize_uint32(ser[0])
+            except DeserializationError:
+                raise BadMessageError('invalid message data received')
+
+            return StreamCreditMessage(message_id, credits)
+
+        if opcode == Opcode.stream_cancel:
+            if len(ser) != 0:
+                raise BadMessageError('invalid message data received')
+
+            return StreamCancelMessage(message_id)
+
         if opcode == Opcode.compressed_message:
             if len(ser) != 2:
                 raise BadMessageError('invalid message data received')
 
             # Determine the compression method and deserialize the data.
             try:
-                method = Opcode(ser[0])
+                method = CompressionMethod(ser[0])
             except ValueError:
                 raise BadMessageError('invalid compression method: %r' %
                                       (ser[0]))
 
+            try:
+                codec = codecs[method]
+            except KeyError:
+                raise BadMessageError('unsupported compression method: %s' %
+                                      (method.name))
+
             try:
                 compressed_data = deserialize_binary(ser[1])
             except DeserializationError:
                 raise BadMessageError('invalid compressed data received')
 
-            # Decompress the received data -- for now, we know that this is
-            # Snappy, so let's be dirty. It's 3 AM after all.
+            # Decompress the received data.
             try:
-                data = snappy.uncompress(compressed_data)
-            except snappy.UncompressError as e:
+                data = codec.decompress(compressed_data,
+                                        self._max_decompressed_size)
+            except codec.errors as e:
                 raise BadMessageError('decompression error: %s' % (e))
 
             # Deserialize the uncompressed data and recursively deserialize.
-            unpacker = msgpack.Unpacker()
+            if self._lazy:
+                return self._deserialize_lazy(data)
+
+            unpacker = self._create_unpacker(max(len(data), 1))
             unpacker.feed(data)
-            return self._deserialize_message(unpacker.unpack())
+            try:
+                ser = unpacker.unpack()
+            except (msgpack.OutOfData, ValueError):
+                raise BadMessageError('invalid compressed data received')
+            return self._deserialize_message(ser)
 
         raise NotImplementedError('opcode not implemented: %r' % (opcode))
 
+
+class Connection(BaseConnection):
+    """Entangle connection.
+    """
+
+    def __init__(self, sock, **kwargs):
+        """Initialize an Entangle connection.
+
+        :param sock: Python socket or object of equivalent interface.
+        :param kwargs: Options passed to :class:`BaseConnection`.
+        """
+
+        super(Connection, self).__init__(**kwargs)
+
+        self._sock = sock
+        self._unpacker = self._create_unpacker()
+        self._unpacked_offset = 0
+        self._responses = {}
+        self._abandoned = set()
+        self._recv_buffer = bytearray(MIN_RECEIVE_BUFFER_SIZE)
+        self._message_size = float(MIN_RECEIVE_BUFFER_SIZE)
+        self.receive_statistics = ReceiveStatistics()
+        """Receive statistics.
+        """
+        self.receive_statistics.buffer_size = len(self._recv_buffer)
+
+    def _send(self, buffers):
+        """Send data over the wire.
+
+        The buffers are written with scatter-gather I/O where the socket
+        supports it. Partial writes are resumed from an offset into the
+        buffers, so the data is never copied.
+
+        :param buffers: List of buffers to send.
+        """
+
+        buffers = [memoryview(buf) for buf in buffers if len(buf)]
+        sendmsg = getattr(self._sock, 'sendmsg', None)
+        index = 0
+
+        while index < len(buffers):
+            try:
+                if sendmsg is not None:
+                    sent = sendmsg(buffers[index:index + MAX_SEND_BUFFERS])
+                else:
+                    sent = self._sock.send(buffers[index])
+            except socket.error as e:
+                if e.errno == errno.EINTR:
+                    continue
+                if e.errno in (errno.EPIPE, errno.ECONNRESET, ):
+                    raise ConnectionLostError('connection lost')
+                raise
+
+            if sent == 0:
+                raise ConnectionLostError('connection lost')
+
+            # Advance past the sent data.
+            while sent:
+                size = len(buffers[index])
+                if sent < size:
+                    buffers[index] = buffers[index][sent:]
+                    break
+
+                sent -= size
+                index += 1
+
+    def send_request(self,
+                     message_id,
+                     method,
+                     packed_arguments,
+                     trace=False,
+                     timeout=None):
+        """Send request.
+
+        :param message_id: Message ID.
+        :param method: Method name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace. Default ``False``.
+        :param timeout:
+            Time in seconds the caller waits for the response, letting the
+            server skip the request once it has expired. Default ``None``.
+        """
+
+        self._send(self._build_request(message_id,
+                                       method,
+                                       packed_arguments,
+                                       trace,
+                                       timeout))
+
+    def send_stream_request(self,
+                            message_id,
+                            method,
+                            packed_arguments,
+                            window,
+                            trace=False):
+        """Send request for a streamed result.
+
+        The request is sent along with the initial credit for the stream.
+
+        :param message_id: Message ID.
+        :param method: Method name.
+        :param packed_arguments: Package arguments.
+        :param window: Number of chunks the server may send before being
+            granted further credit.
+        :param trace: Request trace. Default ``False``.
+        """
+
+        self._send(
+            self._build_request(message_id, method, packed_arguments, trace) +
+            self._build_stream_credit(message_id, window)
+        )
+
+    def send_requests(self, requests):
+        """Send a batch of requests at once.
+
+        :param requests:
+            Iterable of ``(message_id, method, packed_arguments, trace)`` or
+            ``(message_id, method, packed_arguments, trace, timeout)``
+            tuples.
+        """
+
+        buffers = []
+
+        for request in requests:
+            buffers.extend(self._build_request(*request))
+
+        self._send(buffers)
+
+    def send_notification(self, message_id, method, packed_arguments):
+        """Send notification.
+
+        :param message_id: Message ID.
+        :param method: Method name.
+        :param packed_arguments: Package arguments.
+        """
+
+        self._send(self._build_notification(message_id,
+                                            method,
+                                            packed_arguments))
+
+    def send_response(self, message_id, packed_result, trace=None):
+        """Send response.
+
+        :param message_id: Message ID of the request.
+        :param packed_result: Packed result.
+        :param trace: Request trace. Default ``None``.
+        """
+
+        self._send(self._build_response(message_id, packed_result, trace))
+
+    def send_exception(self,
+                       message_id,
+                       definition,
+                       name,
+                       description,
+                       trace=None):
+        """Send exception.
+
+        :param message_id: Message ID of the request.
+        :param definition: Exception definition.
+        :param name: Exception name.
+        :param description: Exception description.
+        :param trace: Request trace. Default ``None``.
+        """
+
+        self._send(self._build_exception(message_id,
+                                         definition,
+                                         name,
+                                         description,
+                                         trace))
+
+    def send_stream_chunk(self, message_id, packed_chunk):
+        """Send stream chunk.
+
+        :param message_id: Message ID of the request.
+        :param packed_chunk: Packed chunk.
+        """
+
+        self._send(self._build_stream_chunk(message_id, packed_chunk))
+
+    def send_stream_end(self, message_id):
+        """Send stream end.
+
+        :param message_id: Message ID of the request.
+        """
+
+        self._send(self._build_stream_end(message_id))
+
+    def send_stream_credit(self, message_id, credits):
+        """Send stream credit.
+
+        :param message_id: Message ID of the request.
+        :param credits: Number of further chunks the receiver accepts.
+        """
+
+        self._send(self._build_stream_credit(message_id, credits))
+
+    def send_stream_cancel(self, message_id):
+        """Send stream cancel.
+
+        :param message_id: Message ID of the request.
+        """
+
+        self._send(self._build_stream_cancel(message_id))
+
+    def fileno(self):
+        """File descriptor of the socket, e.g. for use with :mod:`select`.
+        """
+
+        return self._sock.fileno()
+
+    def receive(self, timeout=None):
+        """Receive message.
+
+        :param timeout:
+            Maximum time in seconds to wait for the message, or ``None`` to
+            wait indefinitely. Default ``None``.
+        :raises entangle.DeadlineExceededError:
+            if no message is received within the timeout. Any part of the
+            message already received is kept for the next receive.
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+
+        # Receive the message data. Pipelined messages may already have been
+        # received along with a previous message.
+        while True:
+            try:
+                ser = self._unpack()
+            except msgpack.OutOfData:
+                pass
+            else:
+                break
+
+            if deadline is None:
+                self._recv()
+            else:
+                self._recv_until(deadline)
+
+        self._message_unpacked()
+
+        # Deserialize the message data.
+        return self._deserialize(ser)
+
+    def receive_many(self):
+        """Receive all messages available.
+
+        Blocks until at least one message has been received, then returns all
+        messages which were received along with it, without reading from the
+        wire again.
+
+        :returns: a list of messages.
+        """
+
+        while True:
+            messages = self._unpack_buffered()
+            if messages:
+                return messages
+
+            self._recv()
+
+    def receive_available(self):
+        """Receive all messages available without blocking.
+
+        Reads whatever data is waiting on the socket, e.g. after a selector
+        has reported the socket as readable, up to
+        :data:`MAX_RECEIVE_AVAILABLE_SIZE` bytes. The rest is left for the
+        next call.
+
+        :returns: a possibly empty list of messages.
+        :raises entangle.ConnectionLostError:
+            if the connection was lost and no messages received before are
+            left. Messages received before the connection was lost are
+            returned first.
+        """
+
+        timeout = self._sock.gettimeout()
+        if timeout != 0.0:
+            self._sock.settimeout(0.0)
+
+        received = 0
+
+        try:
+            while received < MAX_RECEIVE_AVAILABLE_SIZE:
+                size = self._recv(blocking=False)
+                if not size:
+                    break
+                received += size
+
+                # Leave the rest of a flood for the next call, once the
+                # messages received so far have been unpacked.
+                if self._max_message_size is not None and \
+                        len(self._received) >= self._max_message_size:
+                    break
+        except ConnectionLostError:
+            # Return what was received before the connection was lost. The
+            # next call finds the connection lost again.
+            messages = self._unpack_buffered()
+            if messages:
+                return messages
+            raise
+        finally:
+            if timeout != 0.0:
+                self._sock.settimeout(timeout)
+
+        return self._unpack_buffered()
+
+    def iter_messages(self):
+        """Iterate over received messages.
+
+        Messages received together are yielded before reading from the wire
+        again. Iteration ends by :class:`ConnectionLostError` being raised.
+        """
+
+        while True:
+            for message in self.receive_many():
+                yield message
+
+    def _unpack_buffered(self):
+        """Unpack all messages already received.
+
+        :returns: a list of messages.
+        """
+
+        messages = []
+
+        while True:
+            try:
+                ser = self._unpack()
+            except msgpack.OutOfData:
+                return messages
+
+            self._message_unpacked()
+            messages.append(self._deserialize(ser))
+
+    def _recv_until(self, deadline):
+        """Receive data from the wire into the unpacker before a deadline.
+
+        :param deadline: Deadline as returned by :func:`time.time`.
+        :raises entangle.DeadlineExceededError:
+            if no data is received before the deadline.
+        """
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise DeadlineExceededError('deadline exceeded')
+
+        timeout = self._sock.gettimeout()
+        self._sock.settimeout(remaining)
+
+        try:
+            self._recv()
+        except socket.timeout:
+            raise DeadlineExceededError('deadline exceeded')
+        finally:
+            self._sock.settimeout(timeout)
+
+    def _recv(self, blocking=True):
+        """Receive data from the wire into the unpacker.
+
+        :param blocking:
+            Whether the socket is blocking. If not, no data being available is
+            not an error.
+        :returns: the size in bytes of the data received.
+        """
+
+        stats = self.receive_statistics
+        buf = self._recv_buffer
+
+        try:
+            size = self._sock.recv_into(buf)
+        except socket.error as e:
+            if not blocking and \
+                    e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, ):
+                return 0
+            raise
+
+        if not size:
+            raise ConnectionLostError('connection lost')
+
+        stats.syscalls += 1
+        stats.bytes += size
+
+        self._feed(memoryview(buf)[:size])
+
+        # A full buffer means more data is likely waiting, so grow the buffer
+        # to receive it in fewer calls.
+        if size == len(self._recv_buffer) and size < MAX_RECEIVE_BUFFER_SIZE:
+            self._resize_recv_buffer(size * 2)
+
+        return size
+
+    def _message_unpacked(self):
+        """Account for a message having been unpacked.
+
+        The receive buffer is sized after a moving average of recent message
+        sizes, shrinking it again after a burst of large messages. The
+        unpacker is replaced after an oversize message.
+        """
+
+        stats = self.receive_statistics
+        offset = self._unpacker.tell()
+        size = offset - self._unpacked_offset
+        self._unpacked_offset = offset
+
+        if size >= OVERSIZE_MESSAGE_SIZE:
+            self._replace_unpacker()
+            self._unpacked_offset = 0
+
+        stats.messages += 1
+        self._message_size += 0.25 * (size - self._message_size)
+
+        if self._message_size * 4 < len(self._recv_buffer):
+            self._resize_recv_buffer(int(self._message_size) * 2)
+
+    def _resize_recv_buffer(self, size):
+        """Resize the receive buffer.
+
+        :param size:
+            Requested size, rounded up to a power of two and clamped between
+            the minimum and maximum receive buffer size.
+        """
+
+        size = max(MIN_RECEIVE_BUFFER_SIZE, min(size, MAX_RECEIVE_BUFFER_SIZE))
+        size = 1 << (size - 1).bit_length()
+
+        if size != len(self._recv_buffer):
+            self._recv_buffer = bytearray(size)
+            self.receive_statistics.buffer_size = size
+
+    def receive_response(self, message_id, timeout=None):
+        """Receive the response to a request.
+
+        Responses to other outstanding requests received in the meantime are
+        held back until they are asked for, allowing any number of requests
+        to be in flight on the connection at once.
+
+        Requests for streamed results have a response for every chunk of the
+        stream, returned in order.
+
+        :param message_id: Message ID of the request.
+        :param timeout:
+            Maximum time in seconds to wait for the response, or ``None`` to
+            wait indefinitely. Default ``None``.
+        :returns:
+            the :class:`ResponseMessage`, :class:`ExceptionMessage`,
+            :class:`StreamChunkMessage` or :class:`StreamEndMessage` for the
+            request.
+        :raises entangle.UnexpectedMessageError:
+            if a message other than a response is received.
+        :raises entangle.DeadlineExceededError:
+            if the response is not received within the timeout. The request
+            remains in flight.
+        """
+
+        response = self._pop_held(message_id)
+        if response is not None:
+            return response
+
+        deadline = None if timeout is None else time.time() + timeout
+
+        while True:
+            if deadline is None:
+                response = self.receive()
+            else:
+                response = self.receive(deadline - time.time())
+
+            if response.message_id == message_id and \
+                    self._is_response(response):
+                return response
+
+            self._hold(response)
+
+    def poll_response(self, message_id):
+        """Receive the response to a request if it is available, without
+        blocking.
+
+        :param message_id: Message ID of the request.
+        :returns: the response as by :meth:`receive_response`, or ``None``.
+        """
+
+        response = self._pop_held(message_id)
+        if response is not None:
+            return response
+
+        for message in self.receive_available():
+            if response is None and message.message_id == message_id and \
+                    self._is_response(message):
+                response = message
+            else:
+                self._hold(message)
+
+        return response
+
+    def abandon(self, message_id):
+        """Abandon a request in flight.
+
+        Responses to the request are discarded as they are received.
+
+        :param message_id: Message ID of the request.
+        """
+
+        held = self._responses.pop(message_id, ())
+
+        # Nothing more is received for the request once its final response
+        # has been received.
+        if all(isinstance(response, StreamChunkMessage) for response in held):
+            self._abandoned.add(message_id)
+
+    def is_abandoned(self, message_id):
+        """Whether a request has been abandoned and is still in flight.
+
+        :param message_id: Message ID of the request.
+        """
+
+        return message_id in self._abandoned
+
+    def _is_response(self, message):
+        return isinstance(message, (ExceptionMessage,
+                                    ResponseMessage,
+                                    StreamChunkMessage,
+                                    StreamEndMessage, ))
+
+    def _pop_held(self, message_id):
+        """Pop the next held back response to a request.
+
+        :param message_id: Message ID of the request.
+        :returns: the response or ``None``.
+        """
+
+        held = self._responses.get(message_id)
+        if not held:
+            return None
+
+        response = held.popleft()
+        if not held:
+            del self._responses[message_id]
+        return response
+
+    def _hold(self, response):
+        """Hold back a response until it is asked for.
+
+        Responses to abandoned requests are discarded.
+
+        :param response: Response.
+        :raises entangle.UnexpectedMessageError:
+            if the message is not a response to a request.
+        """
+
+        # Make sure the message is a response to a request.
+        if not self._is_response(response):
+            raise UnexpectedMessageError('unexpected response: %r' %
+                                         (response))
+
+        if response.message_id in self._abandoned:
+            if not isinstance(response, StreamChunkMessage):
+                self._abandoned.discard(response.message_id)
+            return
+
+        held = self._responses.get(response.message_id)
+        if held is None:
+            held = self._responses[response.message_id] = deque()
+        held.append(response)
+
+    def shutdown(self):
+        """Shut down the connection.
+
+        Wakes up any thread blocked receiving from the connection.
+        """
+
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+
     def close(self):
         self._sock.close()
@@ -4,6 +4,8 @@ from .constants import (
     MAX_INT8, MIN_INT8, MAX_INT16, MIN_INT16, MAX_INT32, MIN_INT32, MAX_INT64,
     MIN_INT64, MAX_UINT8, MAX_UINT16, MAX_UINT32, MAX_UINT64,
 )
+from .ndarray import is_ndarray, ndarray_in_range
+from .validation import all_floats, integers_in_range
 
 
 def deserialize_int8(x):
@@ -155,3 +157,170 @@ def deserialize_float64(x):
         raise DeserializationError('cannot deserialize %r to 64-bit floating '
                                    'point number' % (x))
     return x
+
+
+def _deserialize_ndarray(x, dtype, minimum=None, maximum=None):
+    """Deserialize NumPy array for a numeric element type.
+    """
+
+    valid = ndarray_in_range(x, dtype, minimum, maximum)
+    if valid is None:
+        raise DeserializationError('cannot deserialize NumPy array of dtype '
+                                   '%s to list of %s' % (x.dtype, dtype))
+    return valid
+
+
+def _deserialize_integer_list(x,
+                              minimum,
+                              maximum,
+                              deserialize_element,
+                              dtype):
+    """Deserialize list of integers.
+
+    NumPy arrays are deserialized as such.
+
+    :param x: Serialized list.
+    :param minimum: Minimum value.
+    :param maximum: Maximum value.
+    :param deserialize_element:
+        Element deserializer reporting invalid elements.
+    :param dtype: Name of the matching NumPy dtype.
+    """
+
+    if is_ndarray(x):
+        return _deserialize_ndarray(x, dtype, minimum, maximum)
+
+    if not isinstance(x, (list, tuple, )):
+        raise DeserializationError('cannot deserialize %r to list' % (x))
+
+    if not integers_in_range(x, minimum, maximum):
+        for element in x:
+            deserialize_element(element)
+
+    return list(x)
+
+
+def _deserialize_float_list(x, deserialize_element, dtype):
+    """Deserialize list of floating point numbers.
+
+    NumPy arrays are deserialized as such.
+
+    :param x: Serialized list.
+    :param deserialize_element:
+        Element deserializer reporting invalid elements.
+    :param dtype: Name of the matching NumPy dtype.
+    """
+
+    if is_ndarray(x):
+        return _deserialize_ndarray(x, dtype)
+
+    if not isinstance(x, (list, tuple, )):
+        raise DeserializationError('cannot deserialize %r to list' % (x))
+
+    if not all_floats(x):
+        for element in x:
+            deserialize_element(element)
+
+    return list(x)
+
+
+def deserialize_int8_list(x):
+    """Deserialize list of 8-bit signed integers.
+    """
+
+    return _deserialize_integer_list(x,
+                                     MIN_INT8,
+                                     MAX_INT8,
+                                     deserialize_int8,
+                                     'int8')
+
+
+def deserialize_int16_list(x):
+    """Deserialize list of 16-bit signed integers.
+    """
+
+    return _deserialize_integer_list(x,
+                                     MIN_INT16,
+                                     MAX_INT16,
+                                     deserialize_int16,
+                                     'int16')
+
+
+def deserialize_int32_list(x):
+    """Deserialize list of 32-bit signed integers.
+    """
+
+    return _deserialize_integer_list(x,
+                                     MIN_INT32,
+                                     MAX_INT32,
+                                     deserialize_int32,
+                                     'int32')
+
+
+def deserialize_int64_list(x):
+    """Deserialize list of 64-bit signed integers.
+    """
+
+    return _deserialize_integer_list(x,
+                                     MIN_INT64,
+                                     MAX_INT64,
+                                     deserialize_int64,
+                                     'int64')
+
+
+def deserialize_uint8_list(x):
+    """Deserialize list of 8-bit unsigned integers.
+    """
+
+    return _deserialize_integer_list(x,
+                                     0,
+                                     MAX_UINT8,
+                                     deserialize_uint8,
+                                     'uint8')
+
+
+def deserialize_uint16_list(x):
+    """Deserialize list of 16-bit unsigned integers.
+    """
+
+    return _deserialize_integer_list(x,
+                                     0,
+                                     MAX_UINT16,
+                                     deserialize_uint16,
+                                     'uint16')
+
+
+def deserialize_uint32_list(x):
+    """Deserialize list of 32-bit unsigned integers.
+    """
+
+    return _deserialize_integer_list(x,
+                                     0,
+                                     MAX_UINT32,
+                                     deserialize_uint32,
+                                     'uint32')
+
+
+def deserialize_uint64_list(x):
+    """Deserialize list of 64-bit unsigned integers.
+    """
+
+    return _deserialize_integer_list(x,
+                                     0,
+                                     MAX_UINT64,
+                                     deserialize_uint64,
+                                     'uint64')
+
+
+def deserialize_float32_list(x):
+    """Deserialize list of 32-bit floating point numbers.
+    """
+
+    return _deserialize_float_list(x, deserialize_float32, 'float32')
+
+
+def deserialize_float64_list(x):
+    """Deserialize list of 64-bit floating point numbers.
+    """
+
+    return _deserialize_float_list(x, deserialize_float64, 'float64')
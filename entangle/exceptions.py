@@ -85,11 +85,62 @@ class ConnectionLostError(EntangleException):
     name = 'ConnectionLost'
 
 
+class ServerOverloadedError(EntangleException):
+    """Server overloaded.
+    """
+
+    definition = 'entangle'
+    name = 'ServerOverloaded'
+
+
+class PoolTimeoutError(EntangleException):
+    """Timed out waiting for a pooled connection.
+    """
+
+    definition = 'entangle'
+    name = 'PoolTimeout'
+
+
+class PoolExhaustedError(EntangleException):
+    """Too many callers waiting for a pooled connection.
+    """
+
+    definition = 'entangle'
+    name = 'PoolExhausted'
+
+
+class BackendUnavailableError(EntangleException):
+    """Backend unavailable.
+    """
+
+    definition = 'entangle'
+    name = 'BackendUnavailable'
+
+
+class DeadlineExceededError(EntangleException):
+    """Deadline of a call exceeded.
+    """
+
+    definition = 'entangle'
+    name = 'DeadlineExceeded'
+
+
+class CircuitOpenError(EntangleException):
+    """Circuit breaker of an address open.
+    """
+
+    definition = 'entangle'
+    name = 'CircuitOpen'
+
+
 entangle_exceptions = {
     BadMessageError.name: BadMessageError,
     InternalServerError.name: InternalServerError,
     UnknownMethodError.name: UnknownMethodError,
     InvalidArgumentError.name: InvalidArgumentError,
+    ServerOverloadedError.name: ServerOverloadedError,
+    BackendUnavailableError.name: BackendUnavailableError,
+    DeadlineExceededError.name: DeadlineExceededError,
 }
 """Entangle exceptions.
 """
@@ -0,0 +1,113 @@
+import struct
+import threading
+from collections import OrderedDict
+from .opcode import Opcode
+from .packing import packer
+
+
+_message_id_struct = struct.Struct('>BI')
+
+_header_lengths = {
+    Opcode.request: 5,
+    Opcode.notification: 4,
+    Opcode.response: 4,
+    Opcode.stream_chunk: 3,
+}
+"""Message array lengths by opcode of messages with cached headers.
+"""
+
+_prefixes = dict((opcode, packer.pack_array_header(length) +
+                  packer.pack(opcode.value))
+                 for opcode, length in _header_lengths.items())
+"""Packed array headers and opcodes by opcode.
+"""
+
+
+def pack_message_id(message_id):
+    """Pack message ID.
+
+    Message IDs are packed as fixed-width unsigned 32-bit integers, so a
+    packed message ID is always 5 bytes long.
+
+    :param message_id: Message ID.
+    :returns: the packed message ID.
+    """
+
+    if 0 <= message_id <= 0xffffffff:
+        return _message_id_struct.pack(0xce, message_id)
+    return packer.pack(message_id)
+
+
+def pack_prefix(opcode, length=None):
+    """Pack the part of a message header preceding the message ID.
+
+    :param opcode:
+        :class:`Opcode` of a request, notification, response or stream chunk.
+    :param length:
+        Length of the message array, if other than the usual length for the
+        opcode, e.g. for requests with a timeout. Default ``None``.
+    :returns: the packed array header and opcode.
+    """
+
+    if length is None:
+        return _prefixes[opcode]
+    return packer.pack_array_header(length) + packer.pack(opcode.value)
+
+
+class HeaderCache(object):
+    """Cache of pre-encoded message headers.
+
+    Caches the packed array header, opcode and method name of messages by
+    opcode and method name, so a message header is built by joining the
+    cached parts with the packed message ID. The least recently used headers
+    are evicted once the cache is full.
+    """
+
+    def __init__(self, max_size=1024):
+        """Initialize a header cache.
+
+        :param max_size: Maximum number of cached headers. Default ``1024``.
+        """
+
+        self._max_size = max_size
+        self._headers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._headers)
+
+    def get(self, opcode, method):
+        """Get the pre-encoded header of a message.
+
+        :param opcode: :class:`Opcode` of a request or notification.
+        :param method: Method name.
+        :returns:
+            a tuple of the packed array header and opcode preceding the
+            message ID, and the packed method name following it.
+        """
+
+        key = (opcode, method)
+
+        with self._lock:
+            try:
+                header = self._headers.pop(key)
+            except KeyError:
+                header = (_prefixes[opcode], packer.pack(method))
+                if len(self._headers) >= self._max_size:
+                    self._headers.popitem(last=False)
+
+            self._headers[key] = header
+
+        return header
+
+    def clear(self):
+        """Remove all cached headers.
+        """
+
+        with self._lock:
+            self._headers.clear()
+
+
+header_cache = HeaderCache()
+"""Header cache shared by connections by default.
+"""
@@ -0,0 +1,278 @@
+import select
+import time
+from collections import deque
+from .cache import cached_call
+from .client import Client
+from .exceptions import DeadlineExceededError
+
+
+class HedgedClient(Client):
+    """Hedged client.
+
+    Calls made with ``hedge=True`` which have not been answered within a
+    percentile of recent call latencies are sent again to a second address.
+    The first response to arrive is used and the other is discarded, cutting
+    the tail latency caused by a slow server. Only idempotent calls should be
+    hedged.
+    """
+
+    def __init__(self,
+                 address,
+                 hedge_address,
+                 hedge_percentile=95.0,
+                 min_samples=20,
+                 window=1000,
+                 connect_timeout=10,
+                 reconnect_limit=3,
+                 call_timeout=None,
+                 circuit_breaker=None,
+                 response_cache=None,
+                 **kwargs):
+        """Initialize a hedged client.
+
+        :param address: Address.
+        :param hedge_address: Address hedged calls are sent to.
+        :param hedge_percentile:
+            Percentile of recent call latencies after which a call is hedged.
+            Default ``95.0``.
+        :param min_samples:
+            Number of calls made before calls are hedged. Default ``20``.
+        :param window:
+            Number of recent call latencies kept. Default ``1000``.
+        :param connect_timeout: Connect timeout. Default ``10``.
+        :param reconnect_limit: Reconnect limit. Default ``3``.
+        :param call_timeout:
+            Default timeout of calls in seconds. Default ``None``.
+        :param circuit_breaker:
+            :class:`CircuitBreaker` of :param:`address`. Defaults to the
+            shared breaker of the address. The hedge address always uses its
+            shared breaker.
+        :param response_cache:
+            :class:`ResponseCache` answering calls to cached methods. Default
+            ``None``.
+        :param kwargs: Connection options, e.g. ``compression_threshold``.
+        """
+
+        super(HedgedClient, self).__init__(address,
+                                           connect_timeout,
+                                           reconnect_limit,
+                                           call_timeout,
+                                           circuit_breaker=circuit_breaker,
+                                           response_cache=response_cache,
+                                           **kwargs)
+
+        self._hedge = Client(hedge_address,
+                             connect_timeout,
+                             reconnect_limit,
+                             **kwargs)
+        self._hedge_percentile = hedge_percentile
+        self._min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._delay = None
+        self._delay_samples = 0
+        self.hedged_calls = 0
+        """Number of calls hedged.
+        """
+        self.hedge_wins = 0
+        """Number of hedged calls answered first from the hedge address.
+        """
+
+    def _hedge_delay(self):
+        """Delay after which a call is hedged.
+
+        :returns: the delay in seconds, or ``None`` if too few calls have
+            been made yet.
+        """
+
+        count = len(self._latencies)
+        if count < self._min_samples:
+            return None
+
+        # Sorting the latencies is only worth it every so often.
+        if self._delay is None or \
+                self._delay_samples >= max(count // 10, 1):
+            latencies = sorted(self._latencies)
+            index = int(count * self._hedge_percentile / 100.0)
+            self._delay = latencies[min(index, count - 1)]
+            self._delay_samples = 0
+
+        return self._delay
+
+    def _record(self, latency):
+        """Record the latency of a call.
+
+        :param latency: Latency in seconds.
+        """
+
+        self._latencies.append(latency)
+        self._delay_samples += 1
+
+    def _call(self,
+              name,
+              packed_arguments,
+              trace=False,
+              notify=False,
+              timeout=None,
+              hedge=False):
+        """Call a method.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace. Ignored if :param:`notify` is ``True``.
+        :param notify: Notify instead of request.
+        :param timeout:
+            Timeout in seconds. Defaults to the client's call timeout. Ignored
+            if :param:`notify` is ``True``.
+        :param hedge:
+            Whether to hedge the call, which must be idempotent. Default
+            ``False``.
+        :returns:
+            the response message if :param:`notify` is ``False``, otherwise
+           ``None`` indicating that the notification has been sent.
+        :raises entangle.DeadlineExceededError:
+            if the timeout expires before the response is received.
+        """
+
+        if notify:
+            return super(HedgedClient, self)._call(name,
+                                                   packed_arguments,
+                                                   notify=True)
+
+        return cached_call(self._response_cache,
+                           self._call_hedged,
+                           name,
+                           packed_arguments,
+                           trace,
+                           timeout,
+                           hedge)
+
+    def _call_hedged(self, name, packed_arguments, trace, timeout, hedge):
+        """Make a request, hedging it if need be.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace.
+        :param timeout: Timeout in seconds, or ``None``.
+        :param hedge: Whether to hedge the call.
+        :returns: the response message.
+        """
+
+        if timeout is None:
+            timeout = self._call_timeout
+
+        start = time.time()
+        deadline = None if timeout is None else start + timeout
+        message_id = self._begin_call(name, packed_arguments, trace, timeout)
+        delay = self._hedge_delay() if hedge else None
+
+        if delay is None or (deadline is not None and
+                             start + delay >= deadline):
+            response = self._end_call(message_id)
+            self._record(time.time() - start)
+            return response
+
+        response = self._receive(message_id, start + delay - time.time())
+        if response is not None:
+            self._record(time.time() - start)
+            return response
+
+        # Hedge the call, unless the hedge address is unavailable.
+        try:
+            hedge_message_id = self._hedge._begin_call(
+                name,
+                packed_arguments,
+                trace,
+                None if deadline is None else deadline - time.time()
+            )
+        except Exception:
+            response = self._end_call(message_id)
+            self._record(time.time() - start)
+            return response
+
+        self.hedged_calls += 1
+
+        client, response = self._race([(self, message_id),
+                                       (self._hedge, hedge_message_id)],
+                                      deadline)
+
+        if client is self._hedge:
+            self.hedge_wins += 1
+        self._record(time.time() - start)
+
+        return response
+
+    def _receive(self, message_id, timeout):
+        """Receive the response to a call within a timeout.
+
+        :param message_id: Message ID of the request.
+        :param timeout: Timeout in seconds.
+        :returns: the response, or ``None`` if the timeout expires.
+        """
+
+        try:
+            response = self._conn.receive_response(message_id, timeout)
+        except DeadlineExceededError:
+            return None
+        except:
+            # Reset the connection and re-raise.
+            self._reset_conn()
+            raise
+
+        self._in_flight.discard(message_id)
+        self._deadlines.pop(message_id, None)
+
+        return response
+
+    def _race(self, calls, deadline):
+        """Wait for the first response to any of a set of calls.
+
+        The other calls are abandoned.
+
+        :param calls: List of ``(client, message_id)`` tuples.
+        :param deadline: Deadline as returned by :func:`time.time` or ``None``.
+        :returns: a tuple of the answering client and the response.
+        """
+
+        error = None
+
+        while calls:
+            for call in list(calls):
+                client, message_id = call
+
+                try:
+                    response = client._conn.poll_response(message_id)
+                except Exception as e:
+                    client._reset_conn()
+                    calls.remove(call)
+                    error = e
+                    continue
+
+                if response is None:
+                    continue
+
+                client._in_flight.discard(message_id)
+                client._deadlines.pop(message_id, None)
+
+                for other, other_message_id in calls:
+                    if other is not client:
+                        other._abandon_call(other_message_id)
+
+                return client, response
+
+            if not calls:
+                break
+
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    for client, message_id in calls:
+                        client._abandon_call(message_id)
+                    raise DeadlineExceededError('deadline exceeded')
+
+            select.select([client._conn for client, _ in calls],
+                          [],
+                          [],
+                          remaining)
+
+        raise error
@@ -0,0 +1,79 @@
+import msgpack
+from .ndarray import ext_hook
+
+
+class LazyValue(object):
+    """Lazily decoded value.
+
+    Holds the packed form of a value received over the wire, decoding it only
+    when first accessed. The packed form can be passed on as is, e.g. as the
+    packed arguments of a request or the packed result of a response, without
+    ever decoding it.
+    """
+
+    __slots__ = ('raw', '_value', '_decoded')
+
+    def __init__(self, raw):
+        """Initialize a lazily decoded value.
+
+        :param raw: Packed value.
+        """
+
+        self.raw = raw
+        self._value = None
+        self._decoded = False
+
+    @property
+    def decoded(self):
+        """Whether the value has been decoded.
+        """
+
+        return self._decoded
+
+    @property
+    def value(self):
+        """Decoded value.
+        """
+
+        if not self._decoded:
+            self._value = msgpack.unpackb(self.raw, ext_hook=ext_hook)
+            self._decoded = True
+
+        return self._value
+
+    def __len__(self):
+        return len(self.value)
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __getitem__(self, key):
+        return self.value[key]
+
+    def __eq__(self, other):
+        if isinstance(other, LazyValue):
+            return self.raw == other.raw
+        return self.value == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<%s.%s: %d bytes>' % (self.__class__.__module__,
+                                      self.__class__.__name__,
+                                      len(self.raw))
+
+
+def is_packed_array(raw):
+    """Whether packed data starts with an array.
+
+    :param raw: Packed data.
+    """
+
+    if not raw:
+        return False
+
+    first = bytearray(raw[:1])[0]
+    return 0x90 <= first <= 0x9f or first in (0xdc, 0xdd, )
@@ -2,13 +2,17 @@ class RequestMessage(object):
     """Request message.
     """
 
-    __slots__ = ('message_id', 'method', 'arguments', 'trace')
+    __slots__ = ('message_id', 'method', 'arguments', 'trace', 'deadline')
 
-    def __init__(self, message_id, method, arguments, trace):
+    def __init__(self, message_id, method, arguments, trace, deadline=None):
         self.message_id = message_id
         self.method = method
         self.arguments = arguments
         self.trace = trace
+        self.deadline = deadline
+        """Time by which the caller needs the response, as returned by
+        :func:`time.time`, or ``None``.
+        """
 
     def __repr__(self):
         return '<%s.%s: message ID = %d, method = %r, arguments = %r, ' \
@@ -97,3 +101,71 @@ class NotificationAcknowledgementMessage(object):
         return '<%s.%s: message ID = %d>' % (self.__class__.__module__,
                                              self.__class__.__name__,
                                              self.message_id)
+
+
+class StreamChunkMessage(object):
+    """Stream chunk message.
+    """
+
+    __slots__ = ('message_id', 'chunk')
+
+    def __init__(self, message_id, chunk):
+        self.message_id = message_id
+        self.chunk = chunk
+
+    def __repr__(self):
+        return '<%s.%s: message ID = %d, chunk = %r>' % (
+            self.__class__.__module__,
+            self.__class__.__name__,
+            self.message_id,
+            self.chunk
+        )
+
+
+class StreamEndMessage(object):
+    """Stream end message.
+    """
+
+    __slots__ = ('message_id')
+
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+    def __repr__(self):
+        return '<%s.%s: message ID = %d>' % (self.__class__.__module__,
+                                             self.__class__.__name__,
+                                             self.message_id)
+
+
+class StreamCreditMessage(object):
+    """Stream credit message.
+    """
+
+    __slots__ = ('message_id', 'credits')
+
+    def __init__(self, message_id, credits):
+        self.message_id = message_id
+        self.credits = credits
+
+    def __repr__(self):
+        return '<%s.%s: message ID = %d, credits = %d>' % (
+            self.__class__.__module__,
+            self.__class__.__name__,
+            self.message_id,
+            self.credits
+        )
+
+
+class StreamCancelMessage(object):
+    """Stream cancel message.
+    """
+
+    __slots__ = ('message_id')
+
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+    def __repr__(self):
+        return '<%s.%s: message ID = %d>' % (self.__class__.__module__,
+                                             self.__class__.__name__,
+                                             self.message_id)
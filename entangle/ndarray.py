@@ -0,0 +1,115 @@
+import msgpack
+import struct
+from .exceptions import BadMessageError, PackingError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+NDARRAY_EXT_TYPE = 1
+"""msgpack extension type of NumPy arrays.
+
+The extension data is a packed ``[dtype, shape]`` header followed by the raw
+array data in C order.
+"""
+
+
+def is_ndarray(x):
+    """Whether an object is a NumPy array.
+
+    Always ``False`` if NumPy is not available.
+    """
+
+    return numpy is not None and isinstance(x, numpy.ndarray)
+
+
+def _ext_header(size):
+    """Pack the header of an extension type of a given size.
+    """
+
+    if size < 1 << 8:
+        return struct.pack('>BBb', 0xc7, size, NDARRAY_EXT_TYPE)
+    if size < 1 << 16:
+        return struct.pack('>BHb', 0xc8, size, NDARRAY_EXT_TYPE)
+    return struct.pack('>BIb', 0xc9, size, NDARRAY_EXT_TYPE)
+
+
+def pack_ndarray(x):
+    """Pack NumPy array.
+
+    Only arrays of boolean, integer, floating point and complex dtypes are
+    supported. The array data is copied only once, into the packed result.
+
+    :raises entangle.PackingError:
+        if :param:`x` is not a NumPy array of a supported dtype.
+    """
+
+    if not is_ndarray(x):
+        raise PackingError('cannot pack %r to NumPy array' % (x))
+    if x.dtype.kind not in 'biufc':
+        raise PackingError('cannot pack NumPy array of dtype %s' % (x.dtype))
+
+    x = numpy.ascontiguousarray(x)
+    header = msgpack.packb([x.dtype.str, list(x.shape)])
+    data = memoryview(x).cast('B') if x.size else b''
+
+    return b''.join([_ext_header(len(header) + x.nbytes), header, data])
+
+
+def ndarray_in_range(x, dtype, minimum=None, maximum=None):
+    """Validate a NumPy array for a numeric element type.
+
+    Arrays of other integer or floating point dtypes are converted when all
+    values are within range.
+
+    :param x: NumPy array.
+    :param dtype: Name of the NumPy dtype of the element type.
+    :param minimum: Minimum value of integer element types.
+    :param maximum: Maximum value of integer element types.
+    :returns: the array as the dtype, or ``None`` if it is not valid.
+    """
+
+    target = numpy.dtype(dtype)
+
+    if x.dtype == target:
+        return x
+
+    if target.kind in 'iu':
+        if x.dtype.kind not in 'iu':
+            return None
+        if x.size and (x.min() < minimum or x.max() > maximum):
+            return None
+    elif target.kind == 'f':
+        if x.dtype.kind != 'f':
+            return None
+    else:
+        return None
+
+    return x.astype(target)
+
+
+def ext_hook(code, data):
+    """msgpack extension type hook.
+
+    Decodes NumPy arrays as read-only views over the received data without
+    copying it. Other extension types, or NumPy arrays if NumPy is not
+    available, are returned as :class:`msgpack.ExtType`.
+    """
+
+    if code != NDARRAY_EXT_TYPE or numpy is None:
+        return msgpack.ExtType(code, data)
+
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(data)
+
+    try:
+        dtype, shape = unpacker.unpack()
+        dtype = numpy.dtype(dtype)
+        if dtype.kind not in 'biufc':
+            raise TypeError('arrays of dtype %s are not supported' % (dtype))
+        return numpy.frombuffer(data, dtype, offset=unpacker.tell()) \
+            .reshape(shape)
+    except (msgpack.OutOfData, TypeError, ValueError) as e:
+        raise BadMessageError('invalid NumPy array received: %s' % (e))
@@ -25,6 +25,22 @@ class Opcode(Enum):
     """Notification acknowledgement opcode.
     """
 
+    stream_chunk = 5
+    """Stream chunk opcode.
+    """
+
+    stream_end = 6
+    """Stream end opcode.
+    """
+
+    stream_credit = 7
+    """Stream credit opcode.
+    """
+
+    stream_cancel = 8
+    """Stream cancel opcode.
+    """
+
     compressed_message = 0x7f
     """Compressed message opcode.
     """
@@ -1,10 +1,13 @@
 import msgpack
+from array import array
 from six import integer_types, string_types, binary_type
 from .exceptions import PackingError
 from .constants import (
     MAX_INT8, MIN_INT8, MAX_INT16, MIN_INT16, MAX_INT32, MIN_INT32, MAX_INT64,
     MIN_INT64, MAX_UINT8, MAX_UINT16, MAX_UINT32, MAX_UINT64,
 )
+from .ndarray import is_ndarray, ndarray_in_range, pack_ndarray
+from .validation import all_floats, integers_in_range
 
 
 packer = msgpack.Packer()
@@ -144,3 +147,142 @@ def pack_float64(x):
         raise PackingError('cannot pack %r to 64-bit floating point number'
                            % (x))
     return packer.pack(x)
+
+
+def _sequence(x):
+    """Sequence to pack as a list.
+    """
+
+    if isinstance(x, array):
+        return x.tolist()
+    if not isinstance(x, (list, tuple, )):
+        raise PackingError('cannot pack %r to list' % (x))
+    return x
+
+
+def _pack_ndarray(x, dtype, minimum=None, maximum=None):
+    """Pack NumPy array for a numeric element type.
+    """
+
+    valid = ndarray_in_range(x, dtype, minimum, maximum)
+    if valid is None:
+        raise PackingError('cannot pack NumPy array of dtype %s to list of '
+                           '%s' % (x.dtype, dtype))
+    return pack_ndarray(valid)
+
+
+def _pack_integer_list(x, minimum, maximum, pack_element, dtype):
+    """Pack list of integers.
+
+    NumPy arrays are packed as such.
+
+    :param x: Sequence of integers.
+    :param minimum: Minimum value.
+    :param maximum: Maximum value.
+    :param pack_element: Element packer reporting invalid elements.
+    :param dtype: Name of the matching NumPy dtype.
+    """
+
+    if is_ndarray(x):
+        return _pack_ndarray(x, dtype, minimum, maximum)
+
+    x = _sequence(x)
+
+    if not integers_in_range(x, minimum, maximum):
+        for element in x:
+            pack_element(element)
+
+    return packer.pack(x)
+
+
+def _pack_float_list(x, pack_element, float_packer, dtype):
+    """Pack list of floating point numbers.
+
+    NumPy arrays are packed as such.
+
+    :param x: Sequence of floating point numbers.
+    :param pack_element: Element packer reporting invalid elements.
+    :param float_packer: Packer.
+    :param dtype: Name of the matching NumPy dtype.
+    """
+
+    if is_ndarray(x):
+        return _pack_ndarray(x, dtype)
+
+    x = _sequence(x)
+
+    if not all_floats(x):
+        for element in x:
+            pack_element(element)
+
+    return float_packer.pack(x)
+
+
+def pack_int8_list(x):
+    """Pack list of 8-bit signed integers.
+    """
+
+    return _pack_integer_list(x, MIN_INT8, MAX_INT8, pack_int8, 'int8')
+
+
+def pack_int16_list(x):
+    """Pack list of 16-bit signed integers.
+    """
+
+    return _pack_integer_list(x, MIN_INT16, MAX_INT16, pack_int16, 'int16')
+
+
+def pack_int32_list(x):
+    """Pack list of 32-bit signed integers.
+    """
+
+    return _pack_integer_list(x, MIN_INT32, MAX_INT32, pack_int32, 'int32')
+
+
+def pack_int64_list(x):
+    """Pack list of 64-bit signed integers.
+    """
+
+    return _pack_integer_list(x, MIN_INT64, MAX_INT64, pack_int64, 'int64')
+
+
+def pack_uint8_list(x):
+    """Pack list of 8-bit unsigned integers.
+    """
+
+    return _pack_integer_list(x, 0, MAX_UINT8, pack_uint8, 'uint8')
+
+
+def pack_uint16_list(x):
+    """Pack list of 16-bit unsigned integers.
+    """
+
+    return _pack_integer_list(x, 0, MAX_UINT16, pack_uint16, 'uint16')
+
+
+def pack_uint32_list(x):
+    """Pack list of 32-bit unsigned integers.
+    """
+
+    return _pack_integer_list(x, 0, MAX_UINT32, pack_uint32, 'uint32')
+
+
+def pack_uint64_list(x):
+    """Pack list of 64-bit unsigned integers.
+    """
+
+    return _pack_integer_list(x, 0, MAX_UINT64, pack_uint64, 'uint64')
+
+
+def pack_float32_list(x):
+    """Pack list of 32-bit floating point numbers.
+    """
+
+    return _pack_float_list(x, pack_float32, float_packer, 'float32')
+
+
+def pack_float64_list(x):
+    """Pack list of 64-bit floating point numbers.
+    """
+
+    return _pack_float_list(x, pack_float64, packer, 'float64')
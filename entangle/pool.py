@@ -0,0 +1,620 @@
+import threading
+import time
+from collections import deque
+from .cache import cached_call
+from .client import Client
+from .exceptions import (
+    DeadlineExceededError,
+    PoolExhaustedError,
+    PoolTimeoutError,
+    UnexpectedMessageError,
+)
+from .message import ExceptionMessage, StreamChunkMessage, StreamEndMessage
+
+
+class ConnectionPool(object):
+    """Thread safe connection pool.
+    """
+
+    def __init__(self,
+                 connect,
+                 min_size=0,
+                 max_size=10,
+                 max_waiters=None,
+                 wait_timeout=None,
+                 idle_timeout=None):
+        """Initialize a connection pool.
+
+        :param connect: Callable opening a new connection.
+        :param min_size:
+            Minimum number of connections kept open. Default ``0``.
+        :param max_size: Maximum number of open connections. Default ``10``.
+        :param max_waiters:
+            Maximum number of callers waiting for a connection when all
+            connections are in use, or ``None`` for no limit. Default ``None``.
+        :param wait_timeout:
+            Maximum time in seconds to wait for a connection, or ``None`` to
+            wait indefinitely. Default ``None``.
+        :param idle_timeout:
+            Time in seconds after which idle connections in excess of
+            :param:`min_size` are closed, or ``None`` to keep them open.
+            Default ``None``.
+        """
+
+        if min_size > max_size:
+            raise ValueError('minimum pool size exceeds maximum pool size')
+
+        self._connect = connect
+        self._min_size = min_size
+        self._max_size = max_size
+        self._max_waiters = max_waiters
+        self._wait_timeout = wait_timeout
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._waiters = 0
+
+    @property
+    def size(self):
+        """Number of open connections.
+        """
+
+        return self._size
+
+    @property
+    def idle(self):
+        """Number of idle connections.
+        """
+
+        return len(self._idle)
+
+    def _evict_idle(self):
+        """Close connections idle for longer than the idle timeout.
+
+        Must be called with the lock held.
+        """
+
+        if self._idle_timeout is None:
+            return
+
+        deadline = time.time() - self._idle_timeout
+
+        # Idle connections are reused from the right, so the least recently
+        # used ones are on the left.
+        while self._idle and \
+                self._size > self._min_size and \
+                self._idle[0][1] < deadline:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            conn.close()
+
+    def _open(self):
+        """Open a new connection on behalf of a caller.
+
+        The slot for the connection must already have been reserved.
+        """
+
+        try:
+            return self._connect()
+        except:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+
+    def prewarm(self):
+        """Open connections until the pool holds the minimum pool size.
+        """
+
+        while True:
+            with self._lock:
+                if self._size >= self._min_size:
+                    return
+                self._size += 1
+
+            conn = self._open()
+
+            with self._lock:
+                self._idle.append((conn, time.time()))
+                self._lock.notify()
+
+    def acquire(self):
+        """Acquire a connection.
+
+        :returns: a connection which must be returned by :meth:`release`.
+        :raises entangle.PoolExhaustedError:
+            if too many callers are already waiting for a connection.
+        :raises entangle.PoolTimeoutError:
+            if no connection became available within the wait timeout.
+        """
+
+        deadline = None
+        if self._wait_timeout is not None:
+            deadline = time.time() + self._wait_timeout
+
+        with self._lock:
+            self._evict_idle()
+
+            while not self._idle and self._size >= self._max_size:
+                if self._max_waiters is not None and \
+                        self._waiters >= self._max_waiters:
+                    raise PoolExhaustedError('too many callers waiting for '
+                                             'a connection')
+
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        raise PoolTimeoutError('timed out waiting for a '
+                                               'connection')
+
+                self._waiters += 1
+                try:
+                    self._lock.wait(timeout)
+                finally:
+                    self._waiters -= 1
+
+            if self._idle:
+                conn, _ = self._idle.pop()
+                return conn
+
+            self._size += 1
+
+        return self._open()
+
+    def release(self, conn):
+        """Return a healthy connection to the pool.
+
+        :param conn: Connection.
+        """
+
+        with self._lock:
+            self._idle.append((conn, time.time()))
+            self._lock.notify()
+
+    def discard(self, conn):
+        """Close a connection rather than returning it to the pool.
+
+        :param conn: Connection.
+        """
+
+        conn.close()
+
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+
+    def close(self):
+        """Close all idle connections.
+        """
+
+        with self._lock:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                conn.close()
+
+
+class _Pipeline(object):
+    """Pooled connection the calls begun by a thread are pipelined on.
+    """
+
+    __slots__ = ('conn', 'in_flight', 'deadlines', 'expired')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.in_flight = set()
+        self.deadlines = {}
+        self.expired = False
+
+
+class PooledClient(Client):
+    """Pooled client.
+
+    Base class for client implementations shared between threads. Each call
+    is made on a connection acquired from a :class:`ConnectionPool`.
+    """
+
+    def __init__(self,
+                 address,
+                 connect_timeout=10,
+                 reconnect_limit=3,
+                 min_size=0,
+                 max_size=10,
+                 max_waiters=None,
+                 wait_timeout=None,
+                 idle_timeout=None,
+                 prewarm=True,
+                 **kwargs):
+        """Initialize a pooled client.
+
+        :param address: Address.
+        :param connect_timeout: Connect timeout. Default ``10``.
+        :param reconnect_limit: Reconnect limit. Default ``3``.
+        :param min_size: Minimum pool size. Default ``0``.
+        :param max_size: Maximum pool size. Default ``10``.
+        :param max_waiters:
+            Maximum number of callers waiting for a connection. Default
+            ``None``.
+        :param wait_timeout:
+            Connection wait timeout in seconds. Default ``None``.
+        :param idle_timeout: Idle connection timeout. Default ``None``.
+        :param prewarm:
+            Open :param:`min_size` connections up front. Default ``True``.
+        :param kwargs: Connection options, e.g. ``compression_threshold``.
+        """
+
+        super(PooledClient, self).__init__(address,
+                                           connect_timeout,
+                                           reconnect_limit,
+                                           **kwargs)
+
+        self._message_id_lock = threading.Lock()
+        self._local = threading.local()
+        self._pool = ConnectionPool(self._connect,
+                                    min_size=min_size,
+                                    max_size=max_size,
+                                    max_waiters=max_waiters,
+                                    wait_timeout=wait_timeout,
+                                    idle_timeout=idle_timeout)
+
+        if prewarm:
+            self._pool.prewarm()
+
+    def _next_message_id(self):
+        with self._message_id_lock:
+            return super(PooledClient, self)._next_message_id()
+
+    def _begin_call(self, name, packed_arguments, trace=False, timeout=None):
+        """Begin a call to a method without waiting for the response.
+
+        The calls a thread has in flight are pipelined on a single pooled
+        connection, returned to the pool once they have all been ended.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace.
+        :param timeout:
+            Timeout in seconds. Defaults to the client's call timeout.
+        :returns:
+            the message ID of the request, to be passed to :meth:`_end_call`
+            from the same thread.
+        """
+
+        if timeout is None:
+            timeout = self._call_timeout
+
+        # Get the thread's pipeline, acquiring a connection for it if need be.
+        pipeline = getattr(self._local, 'pipeline', None)
+        if pipeline is None:
+            pipeline = self._local.pipeline = _Pipeline(self._pool.acquire())
+
+        # Get a new message ID.
+        message_id = self._next_message_id()
+
+        try:
+            pipeline.conn.send_request(message_id,
+                                       name,
+                                       packed_arguments,
+                                       trace,
+                                       timeout)
+        except:
+            # Discard the connection and re-raise.
+            self._discard_pipeline(pipeline)
+            raise
+
+        pipeline.in_flight.add(message_id)
+        if timeout is not None:
+            pipeline.deadlines[message_id] = time.time() + timeout
+
+        return message_id
+
+    def _end_call(self, message_id):
+        """End a call begun with :meth:`_begin_call`.
+
+        A connection on which a call exceeds its timeout is discarded rather
+        than returned to the pool, once the thread's other calls on it have
+        been ended.
+
+        :param message_id: Message ID of the request.
+        :returns: the response message.
+        :raises entangle.DeadlineExceededError:
+            if the call's timeout expires first. The call is abandoned.
+        """
+
+        pipeline = getattr(self._local, 'pipeline', None)
+        if pipeline is None or message_id not in pipeline.in_flight:
+            raise UnexpectedMessageError('no request with message ID %d in '
+                                         'flight' % (message_id))
+
+        deadline = pipeline.deadlines.pop(message_id, None)
+
+        try:
+            response = pipeline.conn.receive_response(
+                message_id,
+                None if deadline is None else deadline - time.time()
+            )
+        except DeadlineExceededError:
+            pipeline.conn.abandon(message_id)
+            pipeline.expired = True
+            self._end_pipelined_call(pipeline, message_id)
+            raise
+        except:
+            # Discard the connection and re-raise.
+            self._discard_pipeline(pipeline)
+            raise
+
+        self._end_pipelined_call(pipeline, message_id)
+
+        return response
+
+    def _end_pipelined_call(self, pipeline, message_id):
+        """Remove an ended call from a pipeline, giving up the pipeline's
+        connection once no calls are left in flight.
+
+        :param pipeline: Pipeline.
+        :param message_id: Message ID of the request.
+        """
+
+        pipeline.in_flight.discard(message_id)
+        if pipeline.in_flight:
+            return
+
+        self._local.pipeline = None
+        if pipeline.expired:
+            self._pool.discard(pipeline.conn)
+        else:
+            self._pool.release(pipeline.conn)
+
+    def _discard_pipeline(self, pipeline):
+        """Discard the connection of a pipeline, failing its calls in flight.
+
+        :param pipeline: Pipeline.
+        """
+
+        self._local.pipeline = None
+        self._pool.discard(pipeline.conn)
+
+    def _call_many(self, calls, trace=False, timeout=None):
+        """Call a batch of methods.
+
+        All requests are sent at once on a single pooled connection before
+        any response is awaited.
+
+        :param calls: Iterable of ``(name, packed_arguments)`` tuples.
+        :param trace: Request trace.
+        :param timeout:
+            Timeout in seconds for the whole batch. Defaults to the client's
+            call timeout.
+        :returns: the response messages in the order of :param:`calls`.
+        """
+
+        if timeout is None:
+            timeout = self._call_timeout
+
+        requests = [(self._next_message_id(),
+                     name,
+                     packed_arguments,
+                     trace,
+                     timeout)
+                    for name, packed_arguments in calls]
+        deadline = None if timeout is None else time.time() + timeout
+
+        # Get a connection.
+        conn = self._pool.acquire()
+
+        try:
+            conn.send_requests(requests)
+            responses = [
+                conn.receive_response(
+                    request[0],
+                    None if deadline is None else deadline - time.time()
+                )
+                for request in requests
+            ]
+        except:
+            # Discard the connection and re-raise.
+            self._pool.discard(conn)
+            raise
+
+        self._pool.release(conn)
+
+        return responses
+
+    def _request(self, name, packed_arguments, trace, timeout):
+        """Make a request and wait for the response.
+
+        A connection on which a call exceeds its timeout is discarded rather
+        than returned to the pool.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace.
+        :param timeout:
+            Timeout in seconds. Defaults to the client's call timeout.
+        :returns: the response message.
+        """
+
+        if timeout is None:
+            timeout = self._call_timeout
+
+        # Get a new message ID.
+        message_id = self._next_message_id()
+
+        # Get a connection.
+        conn = self._pool.acquire()
+
+        try:
+            # Send the request.
+            conn.send_request(message_id,
+                              name,
+                              packed_arguments,
+                              trace,
+                              timeout)
+
+            # Wait for a response.
+            response = conn.receive_response(message_id, timeout)
+        except:
+            # Discard the connection and re-raise.
+            self._pool.discard(conn)
+            raise
+
+        self._pool.release(conn)
+
+        return response
+
+    def _call(self,
+              name,
+              packed_arguments,
+              trace=False,
+              notify=False,
+              timeout=None):
+        """Call a method.
+
+        A connection on which a call exceeds its timeout is discarded rather
+        than returned to the pool.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace. Ignored if :param:`notify` is ``True``.
+        :param notify: Notify instead of request.
+        :param timeout:
+            Timeout in seconds. Defaults to the client's call timeout. Ignored
+            if :param:`notify` is ``True``.
+        :returns:
+            the response message if :param:`notify` is ``False``, otherwise
+           ``None`` indicating that the notification has been sent.
+        """
+
+        if not notify:
+            return cached_call(self._response_cache,
+                               self._request,
+                               name,
+                               packed_arguments,
+                               trace,
+                               timeout)
+
+        # Get a new message ID.
+        message_id = self._next_message_id()
+
+        # Get a connection.
+        conn = self._pool.acquire()
+
+        try:
+            # Send the notification.
+            conn.send_notification(message_id, name, packed_arguments)
+        except:
+            # Discard the connection and re-raise.
+            self._pool.discard(conn)
+            raise
+
+        self._pool.release(conn)
+
+    def _call_stream(self, name, packed_arguments, window=16, trace=False):
+        """Call a method returning a streamed result.
+
+        The stream holds a pooled connection until it ends or is closed.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param window: Number of chunks in flight. Default ``16``.
+        :param trace: Request trace.
+        :returns:
+            a generator of a :class:`StreamChunkMessage` for each chunk as it
+            is received, ending with an :class:`ExceptionMessage` if the call
+            fails.
+        """
+
+        # Get a new message ID.
+        message_id = self._next_message_id()
+
+        # Get a connection.
+        conn = self._pool.acquire()
+
+        try:
+            conn.send_stream_request(message_id,
+                                     name,
+                                     packed_arguments,
+                                     window,
+                                     trace)
+        except:
+            # Discard the connection and re-raise.
+            self._pool.discard(conn)
+            raise
+
+        return self._pooled_stream(conn, message_id, window)
+
+    def _pooled_stream(self, conn, message_id, window):
+        """Receive the chunks of a stream on a pooled connection.
+
+        The connection is returned to the pool once the stream has ended or
+        been cancelled, and discarded should anything go wrong.
+
+        :param conn: Connection of the stream.
+        :param message_id: Message ID of the request.
+        :param window: Number of chunks in flight.
+        """
+
+        # Grant credit in batches of half the window.
+        batch = max(window // 2, 1)
+        consumed = 0
+        done = False
+        healthy = False
+
+        try:
+            while True:
+                response = conn.receive_response(message_id)
+
+                if isinstance(response, StreamChunkMessage):
+                    yield response
+
+                    consumed += 1
+                    if consumed == batch:
+                        conn.send_stream_credit(message_id, consumed)
+                        consumed = 0
+                    continue
+
+                if not isinstance(response, (ExceptionMessage,
+                                             StreamEndMessage, )):
+                    raise UnexpectedMessageError('unexpected stream response: '
+                                                 '%r' % (response))
+
+                done = healthy = True
+                if isinstance(response, ExceptionMessage):
+                    yield response
+                return
+        except GeneratorExit:
+            if not done:
+                healthy = self._cancel_pooled_stream(conn, message_id)
+            raise
+        finally:
+            if healthy:
+                self._pool.release(conn)
+            else:
+                self._pool.discard(conn)
+
+    def _cancel_pooled_stream(self, conn, message_id):
+        """Cancel a stream, discarding the chunks already in flight.
+
+        :param conn: Connection of the stream.
+        :param message_id: Message ID of the request.
+        :returns: whether the connection is still usable.
+        """
+
+        try:
+            conn.send_stream_cancel(message_id)
+
+            while True:
+                response = conn.receive_response(message_id)
+                if not isinstance(response, StreamChunkMessage):
+                    return isinstance(response, (ExceptionMessage,
+                                                 StreamEndMessage, ))
+        except Exception:
+            return False
+
+    def close(self):
+        """Close all idle pooled connections.
+        """
+
+        self._pool.close()
@@ -0,0 +1,444 @@
+import errno
+import logging
+import msgpack
+import multiprocessing
+import os
+import select
+import signal
+import socket
+import threading
+import time
+from .server import Server
+from .statistics import ServerStatistics
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Worker(object):
+    """Worker process as seen by the master process.
+    """
+
+    __slots__ = (
+        'index',
+        'pid',
+        'stats_fd',
+        'unpacker',
+        'statistics',
+        'started',
+    )
+
+    def __init__(self, index, pid, stats_fd):
+        self.index = index
+        self.pid = pid
+        self.stats_fd = stats_fd
+        self.started = time.time()
+        self.unpacker = msgpack.Unpacker()
+        self.statistics = ServerStatistics()
+
+
+class PreforkServer(object):
+    """Pre-fork server.
+
+    Forks a number of worker processes, each running a thread pool
+    :class:`Server`. With ``SO_REUSEPORT`` every worker listens on its own
+    socket bound to the same address and the kernel spreads connections
+    between them, otherwise the workers accept from a shared listening socket.
+
+    The master process restarts workers which exit unexpectedly and gathers
+    the server statistics reported by the workers. Workers exiting again
+    soon after being started, e.g. failing at startup, are restarted after
+    a delay doubling with every exit.
+    """
+
+    def __init__(self,
+                 address,
+                 processes=None,
+                 reuse_port=None,
+                 drain_timeout=30.0,
+                 stats_interval=1.0,
+                 backlog=128,
+                 restart_backoff=0.1,
+                 max_restart_backoff=30.0,
+                 **kwargs):
+        """Initialize a pre-fork server.
+
+        :param address: Address to listen on.
+        :param processes:
+            Number of worker processes. Defaults to the number of CPUs.
+        :param reuse_port:
+            Whether to give each worker its own listening socket using
+            ``SO_REUSEPORT``. Defaults to whether ``SO_REUSEPORT`` is
+            available.
+        :param drain_timeout:
+            Time in seconds workers are given to finish queued requests on
+            shutdown before being killed. Default ``30.0``.
+        :param stats_interval:
+            Interval in seconds at which workers report statistics. Default
+            ``1.0``.
+        :param backlog: Listen backlog. Default ``128``.
+        :param restart_backoff:
+            Delay in seconds before restarting a worker which exited soon
+            after being started, doubling with every further such exit.
+            Default ``0.1``.
+        :param max_restart_backoff:
+            Maximum delay in seconds before restarting a worker. Workers
+            running for longer before exiting are restarted at once. Default
+            ``30.0``.
+        :param kwargs: Options passed to each worker's :class:`Server`.
+        """
+
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if reuse_port is None:
+            reuse_port = hasattr(socket, 'SO_REUSEPORT')
+
+        self._processes = processes
+        self._reuse_port = reuse_port
+        self._drain_timeout = drain_timeout
+        self._stats_interval = stats_interval
+        self._backlog = backlog
+        self._restart_backoff = restart_backoff
+        self._max_restart_backoff = max_restart_backoff
+        self._server_options = kwargs
+        self._methods = {}
+        self._workers = {}
+        self._crashes = {}
+        self._restarts = {}
+        self._retired = ServerStatistics()
+        self._shutdown = False
+
+        # With SO_REUSEPORT, the master only binds its socket to reserve the
+        # address; a socket which is not listening receives no connections.
+        self._sock = self._socket()
+        self._sock.bind(address)
+        if not self._reuse_port:
+            self._sock.listen(self._backlog)
+
+    @property
+    def address(self):
+        """Address the server is listening on.
+        """
+
+        return self._sock.getsockname()
+
+    def _socket(self):
+        """Create a server socket.
+        """
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self._reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        return sock
+
+    def register(self, name, handler, stream=False):
+        """Register a method.
+
+        Methods must be registered before the workers are started.
+
+        :param name: Method name.
+        :param handler:
+            Callable taking the method arguments and returning the result.
+        :param stream: Whether the result is streamed. Default ``False``.
+        """
+
+        self._methods[name] = (handler, stream)
+
+    def method(self, name, stream=False):
+        """Decorator registering a method.
+
+        :param name: Method name.
+        :param stream: Whether the result is streamed. Default ``False``.
+        """
+
+        def decorator(handler):
+            self.register(name, handler, stream)
+            return handler
+
+        return decorator
+
+    def statistics(self):
+        """Aggregate the statistics reported by all workers.
+
+        Includes the final statistics of workers which have exited.
+
+        :returns: :class:`ServerStatistics`.
+        """
+
+        stats = ServerStatistics()
+        stats.add(self._retired)
+        for worker in self._workers.values():
+            stats.add(worker.statistics)
+        return stats
+
+    def _spawn(self, index):
+        """Fork a worker process.
+
+        :param index: Worker index.
+        """
+
+        stats_r, stats_w = os.pipe()
+        pid = os.fork()
+
+        if pid == 0:
+            os.close(stats_r)
+            status = 1
+            try:
+                self._run_worker(stats_w)
+                status = 0
+            except Exception:
+                logger.exception('worker %d failed', index)
+            finally:
+                os._exit(status)
+
+        os.close(stats_w)
+        self._workers[pid] = _Worker(index, pid, stats_r)
+
+    def _run_worker(self, stats_fd):
+        """Run a worker process.
+
+        :param stats_fd: Pipe to report statistics on.
+        """
+
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        for worker in self._workers.values():
+            os.close(worker.stats_fd)
+        self._workers.clear()
+
+        if self._reuse_port:
+            sock = self._socket()
+            sock.bind(self.address)
+            sock.listen(self._backlog)
+            self._sock.close()
+        else:
+            sock = self._sock
+
+        server = Server(sock=sock, **self._server_options)
+        for name, (handler, stream) in self._methods.items():
+            server.register(name, handler, stream)
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+
+        def report():
+            os.write(stats_fd, msgpack.packb(server.statistics.serialize()))
+
+        def reporter():
+            while not server._shutdown.wait(self._stats_interval):
+                report()
+
+        thread = threading.Thread(target=reporter)
+        thread.daemon = True
+        thread.start()
+
+        server.serve_forever()
+        report()
+
+    def _read_statistics(self, timeout):
+        """Read statistics reported by the workers.
+
+        :param timeout: Maximum time in seconds to wait for reports.
+        """
+
+        fds = dict((worker.stats_fd, worker)
+                   for worker in self._workers.values())
+        if not fds:
+            time.sleep(timeout)
+            return
+
+        try:
+            readable, _, _ = select.select(list(fds), [], [], timeout)
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                return
+            raise
+
+        for fd in readable:
+            self._read_worker_statistics(fds[fd])
+
+    def _read_worker_statistics(self, worker):
+        """Read statistics reported by a worker.
+
+        :param worker: Worker with statistics waiting to be read.
+        :returns: whether the worker's end of the pipe is still open.
+        """
+
+        data = os.read(worker.stats_fd, 65536)
+        if not data:
+            return False
+
+        worker.unpacker.feed(data)
+        for ser in worker.unpacker:
+            worker.statistics = ServerStatistics.deserialize(ser)
+
+        return True
+
+    def _retire(self, worker):
+        """Retire an exited worker.
+
+        :param worker: Worker.
+        """
+
+        # Pick up the final statistics the worker reported before exiting.
+        while self._read_worker_statistics(worker):
+            pass
+
+        os.close(worker.stats_fd)
+
+        worker.statistics.connections = 0
+        self._retired.add(worker.statistics)
+
+    def _reap(self):
+        """Reap exited workers.
+
+        :returns: the exited workers.
+        """
+
+        exited = []
+
+        while self._workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError as e:
+                if e.errno == errno.ECHILD:
+                    break
+                raise
+
+            if pid == 0:
+                break
+
+            worker = self._workers.pop(pid, None)
+            if worker is None:
+                continue
+
+            self._retire(worker)
+            exited.append(worker)
+
+            if not self._shutdown:
+                logger.warning('worker %d (pid %d) exited with status %d',
+                               worker.index,
+                               pid,
+                               status)
+
+        return exited
+
+    def _schedule_restart(self, worker):
+        """Schedule the restart of an exited worker.
+
+        :param worker: Worker.
+        """
+
+        index = worker.index
+        now = time.time()
+
+        if now - worker.started >= self._max_restart_backoff:
+            self._crashes[index] = 0
+            delay = 0.0
+        else:
+            crashes = self._crashes.get(index, 0)
+            self._crashes[index] = crashes + 1
+            delay = min(self._restart_backoff * 2 ** crashes,
+                        self._max_restart_backoff)
+            logger.warning('restarting worker %d in %.1f seconds',
+                           index,
+                           delay)
+
+        self._restarts[index] = now + delay
+
+    def _restart_due(self):
+        """Restart the workers whose restart is due.
+
+        :returns:
+            the time in seconds until the next restart is due, or ``None``.
+        """
+
+        now = time.time()
+
+        for index, restart in list(self._restarts.items()):
+            if restart <= now:
+                del self._restarts[index]
+                self._spawn(index)
+
+        if not self._restarts:
+            return None
+
+        return max(min(self._restarts.values()) - now, 0.0)
+
+    def serve_forever(self, install_signal_handlers=True, poll_interval=0.5):
+        """Serve until :meth:`shutdown` is called.
+
+        :param install_signal_handlers:
+            Shut down on ``SIGTERM`` and ``SIGINT``. Only possible from the
+            main thread. Default ``True``.
+        :param poll_interval:
+            Interval in seconds at which workers are supervised. Default
+            ``0.5``.
+        """
+
+        if install_signal_handlers:
+            for signum in (signal.SIGTERM, signal.SIGINT, ):
+                signal.signal(signum, lambda signum, frame: self.shutdown())
+
+        for index in range(self._processes):
+            self._spawn(index)
+
+        timeout = poll_interval
+
+        try:
+            while not self._shutdown:
+                self._read_statistics(timeout)
+
+                # Restart workers which exited unexpectedly.
+                for worker in self._reap():
+                    if not self._shutdown:
+                        self._schedule_restart(worker)
+
+                if self._shutdown:
+                    break
+
+                timeout = self._restart_due()
+                if timeout is None or timeout > poll_interval:
+                    timeout = poll_interval
+        finally:
+            self._drain()
+
+    def _drain(self):
+        """Stop all workers, giving them time to finish queued requests.
+        """
+
+        for pid in list(self._workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+        deadline = time.time() + self._drain_timeout
+
+        while self._workers and time.time() < deadline:
+            self._read_statistics(0.05)
+            self._reap()
+
+        for pid in list(self._workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+        while self._workers:
+            pid, _ = os.waitpid(-1, 0)
+            worker = self._workers.pop(pid, None)
+            if worker is not None:
+                self._retire(worker)
+
+    def shutdown(self):
+        """Stop serving.
+        """
+
+        self._shutdown = True
+
+    def close(self):
+        """Close the listening socket.
+        """
+
+        self._sock.close()
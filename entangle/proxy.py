@@ -0,0 +1,533 @@
+import asyncio
+import logging
+import time
+from .async_connection import AsyncConnection
+from .circuit import circuit_breakers
+from .client import backoff_delay
+from .constants import MAX_UINT32
+from .exceptions import (
+    BackendUnavailableError,
+    EntangleException,
+    UnknownMethodError,
+)
+from .message import (
+    ExceptionMessage,
+    NotificationMessage,
+    RequestMessage,
+    ResponseMessage,
+    StreamCancelMessage,
+    StreamChunkMessage,
+    StreamCreditMessage,
+    StreamEndMessage,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class _BackendConnection(AsyncConnection):
+    """Connection from the proxy to a backend.
+    """
+
+    def __init__(self, backend, **kwargs):
+        kwargs['lazy'] = True
+        super(_BackendConnection, self).__init__(**kwargs)
+
+        self._backend = backend
+
+    def connection_lost(self, exc):
+        super(_BackendConnection, self).connection_lost(exc)
+
+        self._backend._connection_lost(self)
+
+    def _message_received(self, message):
+        self._backend._relay(message)
+
+
+class _Backend(object):
+    """Backend of the proxy.
+
+    Requests from any number of client connections are pipelined on a single
+    connection to the backend, under message IDs of the backend connection.
+    """
+
+    def __init__(self,
+                 address,
+                 connect_timeout,
+                 backoff,
+                 max_backoff,
+                 connection_options):
+        self.address = address
+        self.conn = None
+        self._connect_timeout = connect_timeout
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._breaker = circuit_breakers.get(address)
+        self._failures = 0
+        self._connection_options = connection_options
+        self._connecting = None
+        self._deferred = []
+        self._message_id = 0
+        self._requests = {}
+
+    def _next_message_id(self):
+        """Next message ID on the backend connection.
+        """
+
+        while True:
+            self._message_id += 1
+            if self._message_id > MAX_UINT32:
+                self._message_id = 0
+            if self._message_id not in self._requests:
+                return self._message_id
+
+    def _send(self, build, *args):
+        """Send a message to the backend, connecting first if need be.
+
+        :param build: :class:`AsyncConnection` method building the message.
+        :param args: Arguments of :param:`build`.
+        """
+
+        if self.conn is not None:
+            try:
+                self.conn._write(build(self.conn, *args))
+                return
+            except EntangleException:
+                self._connection_lost(self.conn)
+
+        self._deferred.append((build, args))
+
+        if self._connecting is None:
+            self._connecting = asyncio.get_event_loop().create_task(
+                self._connect()
+            )
+
+    async def _connect(self):
+        """Connect to the backend and send the messages deferred meanwhile.
+        """
+
+        loop = asyncio.get_event_loop()
+        host, port = self.address
+
+        if not self._breaker.allow():
+            self._connecting = None
+            self._fail(BackendUnavailableError('circuit breaker of backend '
+                                               '%s:%d open' % (host, port)))
+            return
+
+        try:
+            # Back off after failing to connect.
+            if self._failures:
+                await asyncio.sleep(backoff_delay(self._failures - 1,
+                                                  self._backoff,
+                                                  self._max_backoff))
+
+            _, conn = await asyncio.wait_for(
+                loop.create_connection(
+                    lambda: _BackendConnection(self,
+                                               **self._connection_options),
+                    host,
+                    port
+                ),
+                self._connect_timeout
+            )
+        except Exception as e:
+            self._failures += 1
+            self._breaker.failed()
+            self._fail(BackendUnavailableError('cannot connect to backend '
+                                               '%s:%d: %s' % (host, port, e)))
+            return
+        except:
+            # Record the failure, ending a trial connect, and re-raise.
+            self._breaker.failed()
+            raise
+        finally:
+            self._connecting = None
+
+        self._failures = 0
+        self._breaker.succeeded()
+        self.conn = conn
+
+        deferred = self._deferred
+        self._deferred = []
+        for build, args in deferred:
+            conn._write(build(conn, *args))
+
+    def _connection_lost(self, conn):
+        """Handle loss of the backend connection.
+
+        :param conn: :class:`_BackendConnection`.
+        """
+
+        if self.conn is conn:
+            self.conn = None
+            self._fail(BackendUnavailableError('connection to backend '
+                                               '%s:%d lost' % self.address))
+
+    def _fail(self, exc):
+        """Fail all requests in flight to the backend.
+
+        :param exc: :class:`EntangleException`.
+        """
+
+        requests = self._requests
+        self._requests = {}
+        self._deferred = []
+
+        for client_conn, client_message_id in requests.values():
+            client_conn._request_done(client_message_id)
+            client_conn._relay(client_conn._build_exception(client_message_id,
+                                                            exc.definition,
+                                                            exc.name,
+                                                            str(exc)))
+
+    def forward_request(self, client_conn, message):
+        """Forward a request.
+
+        :param client_conn: :class:`ProxyConnection` of the request.
+        :param message: :class:`RequestMessage`.
+        """
+
+        message_id = self._next_message_id()
+
+        # Pass on the time remaining until the caller's deadline.
+        timeout = None
+        if message.deadline is not None:
+            timeout = message.deadline - time.time()
+
+        self._send(AsyncConnection._build_request,
+                   message_id,
+                   message.method,
+                   message.arguments.raw,
+                   message.trace,
+                   timeout)
+
+        self._requests[message_id] = (client_conn, message.message_id)
+        client_conn._forwarded[message.message_id] = (self, message_id)
+
+    def forward_notification(self, message):
+        """Forward a notification.
+
+        :param message: :class:`NotificationMessage`.
+        """
+
+        self._send(AsyncConnection._build_notification,
+                   self._next_message_id(),
+                   message.method,
+                   message.arguments.raw)
+
+    def _relay(self, message):
+        """Relay a message from the backend to the client connection of its
+        request.
+
+        :param message: Message received from the backend.
+        """
+
+        try:
+            client_conn, client_message_id = \
+                self._requests[message.message_id]
+        except KeyError:
+            logger.warning('unexpected message from backend %r: %r',
+                           self.address,
+                           message)
+            return
+
+        if isinstance(message, StreamChunkMessage):
+            client_conn._relay(client_conn._build_stream_chunk(
+                client_message_id,
+                message.chunk.raw
+            ))
+            return
+
+        del self._requests[message.message_id]
+        client_conn._request_done(client_message_id)
+
+        if isinstance(message, ResponseMessage):
+            buffers = client_conn._build_response(client_message_id,
+                                                  message.result.raw)
+        elif isinstance(message, ExceptionMessage):
+            buffers = client_conn._build_exception(client_message_id,
+                                                   message.definition,
+                                                   message.name,
+                                                   message.description)
+        elif isinstance(message, StreamEndMessage):
+            buffers = client_conn._build_stream_end(client_message_id)
+        else:
+            logger.warning('unexpected message from backend %r: %r',
+                           self.address,
+                           message)
+            return
+
+        client_conn._relay(buffers)
+
+    def close(self):
+        """Close the backend connection.
+        """
+
+        if self._connecting is not None:
+            self._connecting.cancel()
+        if self.conn is not None:
+            self.conn.close()
+
+
+class ProxyConnection(AsyncConnection):
+    """Client connection of the proxy.
+
+    Reading from the connection is paused while the maximum number of
+    requests are in flight to the backends.
+    """
+
+    def __init__(self, proxy, max_concurrency, **kwargs):
+        """Initialize a proxy connection.
+
+        :param proxy: :class:`Proxy`.
+        :param max_concurrency: Maximum number of requests in flight.
+        :param kwargs: Options passed to :class:`AsyncConnection`.
+        """
+
+        kwargs['lazy'] = True
+        super(ProxyConnection, self).__init__(**kwargs)
+
+        self._proxy = proxy
+        self._max_concurrency = max_concurrency
+        self._forwarded = {}
+        self._streams = set()
+        self._reading_paused = False
+
+    def connection_lost(self, exc):
+        super(ProxyConnection, self).connection_lost(exc)
+
+        # Cancel streams still being relayed. Other requests are left to
+        # complete, as backends may treat stream messages for them as a
+        # protocol error.
+        forwarded = self._forwarded
+        streams = self._streams
+        self._forwarded = {}
+        self._streams = set()
+
+        for client_message_id in streams:
+            try:
+                backend, message_id = forwarded[client_message_id]
+            except KeyError:
+                continue
+
+            backend._send(AsyncConnection._build_stream_cancel, message_id)
+
+    def _message_received(self, message):
+        if isinstance(message, RequestMessage):
+            self._proxy._forward_request(self, message)
+
+            if len(self._forwarded) >= self._max_concurrency and \
+                    not self._reading_paused:
+                self._reading_paused = True
+                self._transport.pause_reading()
+        elif isinstance(message, NotificationMessage):
+            self._proxy._forward_notification(message)
+        elif isinstance(message, (StreamCreditMessage,
+                                  StreamCancelMessage, )):
+            try:
+                backend, message_id = self._forwarded[message.message_id]
+            except KeyError:
+                return
+
+            # Stream requests are followed by the initial credit.
+            self._streams.add(message.message_id)
+
+            if isinstance(message, StreamCreditMessage):
+                backend._send(AsyncConnection._build_stream_credit,
+                              message_id,
+                              message.credits)
+            else:
+                backend._send(AsyncConnection._build_stream_cancel,
+                              message_id)
+        else:
+            logger.warning('unexpected message: %r', message)
+            self.close()
+
+    def _request_done(self, message_id):
+        """Account for a forwarded request being done.
+
+        :param message_id: Message ID of the request.
+        """
+
+        self._forwarded.pop(message_id, None)
+        self._streams.discard(message_id)
+
+        if self._reading_paused and \
+                len(self._forwarded) < self._max_concurrency and \
+                not self._transport.is_closing():
+            self._reading_paused = False
+            self._transport.resume_reading()
+
+    def _relay(self, buffers):
+        """Write a relayed message, ignoring a lost connection.
+
+        :param buffers: List of buffers making up the message.
+        """
+
+        try:
+            self._write(buffers)
+        except EntangleException:
+            pass
+
+
+class Proxy(object):
+    """Pass-through proxy.
+
+    Routes requests and notifications to backends by method name. Only the
+    opcode, message ID and method name of each message are decoded; packed
+    arguments and results are skipped over and passed on without being
+    decoded, so relaying a call costs no more than copying its arguments or
+    result. Streamed results are relayed chunk by chunk, along with the flow
+    control of the client.
+
+    Calls from all client connections to a backend are pipelined on a single
+    connection to the backend, with message IDs rewritten accordingly.
+    Connecting to a backend again after failing to is delayed with
+    exponential backoff and jitter, and calls to a backend fail fast while
+    the circuit breaker of its address is open.
+    """
+
+    def __init__(self,
+                 route,
+                 connect_timeout=10,
+                 max_concurrency=128,
+                 backoff=0.05,
+                 max_backoff=5.0,
+                 **kwargs):
+        """Initialize a proxy.
+
+        :param route:
+            Callable taking a method name and returning the address of the
+            backend as a ``(host, port)`` tuple, or ``None`` if the method is
+            unknown. May also be a mapping of method names to addresses.
+        :param connect_timeout: Backend connect timeout. Default ``10``.
+        :param max_concurrency:
+            Maximum number of requests in flight per client connection.
+            Default ``128``.
+        :param backoff:
+            Base delay in seconds before connecting to a backend again after
+            failing to, doubling with every failure in a row. Default
+            ``0.05``.
+        :param max_backoff:
+            Maximum delay in seconds before connecting to a backend again.
+            Default ``5.0``.
+        :param kwargs: Connection options, e.g. ``compression_threshold``.
+        """
+
+        if not callable(route):
+            route = route.get
+
+        self._route = route
+        self._connect_timeout = connect_timeout
+        self._max_concurrency = max_concurrency
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._connection_options = kwargs
+        self._backends = {}
+        self._server = None
+
+    @property
+    def sockets(self):
+        """Listening sockets.
+        """
+
+        return self._server.sockets
+
+    def _get_backend(self, address):
+        """Get the backend at an address.
+
+        :param address: Address.
+        """
+
+        try:
+            return self._backends[address]
+        except KeyError:
+            backend = self._backends[address] = _Backend(
+                address,
+                self._connect_timeout,
+                self._backoff,
+                self._max_backoff,
+                self._connection_options
+            )
+            return backend
+
+    def _forward_request(self, conn, message):
+        """Forward a request to its backend.
+
+        :param conn: :class:`ProxyConnection`.
+        :param message: :class:`RequestMessage`.
+        """
+
+        address = self._route(message.method)
+
+        if address is None:
+            exc = UnknownMethodError('unknown method: %s' % (message.method))
+            conn._relay(conn._build_exception(message.message_id,
+                                              exc.definition,
+                                              exc.name,
+                                              str(exc)))
+            return
+
+        self._get_backend(address).forward_request(conn, message)
+
+    def _forward_notification(self, message):
+        """Forward a notification to its backend.
+
+        :param message: :class:`NotificationMessage`.
+        """
+
+        address = self._route(message.method)
+
+        if address is not None:
+            self._get_backend(address).forward_notification(message)
+
+    def _connection_factory(self):
+        return ProxyConnection(self,
+                               self._max_concurrency,
+                               **self._connection_options)
+
+    async def start(self, address=None, sock=None, backlog=128):
+        """Start listening.
+
+        :param address:
+            Address as a ``(host, port)`` tuple. Ignored if :param:`sock` is
+            given.
+        :param sock: Listening socket. Default ``None``.
+        :param backlog: Listen backlog. Default ``128``.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        if sock is not None:
+            self._server = await loop.create_server(self._connection_factory,
+                                                    sock=sock,
+                                                    backlog=backlog)
+        else:
+            host, port = address
+            self._server = await loop.create_server(self._connection_factory,
+                                                    host,
+                                                    port,
+                                                    backlog=backlog)
+
+    async def serve_forever(self):
+        """Serve until closed.
+        """
+
+        await self._server.serve_forever()
+
+    def close(self):
+        """Stop listening and close the backend connections.
+        """
+
+        self._server.close()
+
+        for backend in self._backends.values():
+            backend.close()
+        self._backends.clear()
+
+    async def wait_closed(self):
+        """Wait until the proxy has closed.
+        """
+
+        await self._server.wait_closed()
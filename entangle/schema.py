@@ -0,0 +1,302 @@
+import re
+import threading
+from six import integer_types, string_types, binary_type
+from .constants import (
+    MAX_INT8, MIN_INT8, MAX_INT16, MIN_INT16, MAX_INT32, MIN_INT32, MAX_INT64,
+    MIN_INT64, MAX_UINT8, MAX_UINT16, MAX_UINT32, MAX_UINT64,
+)
+from .exceptions import DeserializationError, PackingError
+from .packing import packer, float_packer
+from .types import Enum
+
+
+_integer_types = {
+    'int8': (MIN_INT8, MAX_INT8, 'signed 8-bit integer'),
+    'int16': (MIN_INT16, MAX_INT16, 'signed 16-bit integer'),
+    'int32': (MIN_INT32, MAX_INT32, 'signed 32-bit integer'),
+    'int64': (MIN_INT64, MAX_INT64, 'signed 64-bit integer'),
+    'uint8': (0, MAX_UINT8, 'unsigned 8-bit integer'),
+    'uint16': (0, MAX_UINT16, 'unsigned 16-bit integer'),
+    'uint32': (0, MAX_UINT32, 'unsigned 32-bit integer'),
+    'uint64': (0, MAX_UINT64, 'unsigned 64-bit integer'),
+}
+"""Integer field types by name as ``(minimum, maximum, description)``.
+"""
+
+_simple_types = {
+    'string': ('string_types', 'string_types', 'string'),
+    'binary': ('binary_type', 'binary_types', 'binary'),
+    'bool': ('bool', 'bool', 'boolean'),
+    'float32': ('float', 'float', '32-bit floating point number'),
+    'float64': ('float', 'float', '64-bit floating point number'),
+}
+"""Other scalar field types by name as ``(packing type, deserialization
+type, description)``.
+"""
+
+_identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class Schema(object):
+    """Compiled struct schema.
+
+    Compiles the field list of a struct into a single specialized function
+    for each of packing and deserializing the struct, validating every field
+    inline and packing the whole struct in a single call to the packer.
+
+    Field types are given by name, e.g. ``'int32'`` or ``'string'``, as an
+    :class:`entangle.types.Enum` subclass, or as a nested :class:`Schema`.
+
+    Use :func:`compile_schema` to share compiled schemas.
+    """
+
+    def __init__(self, fields, factory):
+        """Initialize a schema.
+
+        :param fields: Sequence of ``(name, type)`` tuples.
+        :param factory:
+            Callable constructing a struct from the field values given as
+            positional arguments in field order.
+        """
+
+        self.fields = tuple(fields)
+        self.factory = factory
+
+        for name, _ in self.fields:
+            if not _identifier.match(name):
+                raise ValueError('invalid field name: %r' % (name, ))
+
+        self._float_types = set()
+
+        for _, field_type in self.fields:
+            if isinstance(field_type, Schema):
+                self._float_types.update(field_type._float_types)
+            elif field_type in ('float32', 'float64', ):
+                self._float_types.add(field_type)
+
+        self.serialize = self._compile_serialize()
+        self.deserialize = self._compile_deserialize()
+
+        # Pack with a single call to the packer unless 32-bit and 64-bit
+        # floating point numbers are mixed, as the packer packs every floating
+        # point number with the same precision.
+        if self._float_types == set(['float32']):
+            self.pack = self._pack_single_float
+        elif 'float32' not in self._float_types:
+            self.pack = self._pack
+        else:
+            self.pack = self._pack_mixed
+
+    def _pack(self, obj):
+        """Pack a struct.
+
+        :param obj: Struct.
+        :returns: the packed struct.
+        """
+
+        return packer.pack(self.serialize(obj))
+
+    def _pack_single_float(self, obj):
+        return float_packer.pack(self.serialize(obj))
+
+    def _pack_mixed(self, obj):
+        return self.pack_serialized(self.serialize(obj))
+
+    def _namespace(self):
+        """Namespace of the compiled functions.
+        """
+
+        namespace = {
+            'integer_types': integer_types,
+            'string_types': string_types,
+            'binary_type': binary_type,
+            'binary_types': string_types + (binary_type, ),
+            'list': list,
+            'tuple': tuple,
+            'len': len,
+            'bool': bool,
+            'float': float,
+            'isinstance': isinstance,
+            'PackingError': PackingError,
+            'DeserializationError': DeserializationError,
+            'ValueError': ValueError,
+            'factory': self.factory,
+        }
+
+        for i, (_, field_type) in enumerate(self.fields):
+            namespace['type_%d' % (i)] = field_type
+
+        return namespace
+
+    def _compile(self, name, lines):
+        """Compile a function.
+
+        :param name: Function name.
+        :param lines: Source lines of the function.
+        """
+
+        namespace = self._namespace()
+        exec('\n'.join(lines), namespace)
+        return namespace[name]
+
+    def _pack_checks(self, lines, i, field_type):
+        """Generate validation of a field for packing.
+
+        The field value must be in ``v<i>``, and is replaced by its serialized
+        form for enumerations and nested structs.
+        """
+
+        v = 'v%d' % (i)
+
+        if isinstance(field_type, Schema):
+            lines.append('    %s = type_%d.serialize(%s)' % (v, i, v))
+        elif isinstance(field_type, type) and issubclass(field_type, Enum):
+            lines.extend([
+                '    if not isinstance(%s, type_%d):' % (v, i),
+                '        raise PackingError(\'cannot pack %%r to %s\' %% '
+                '(%s, ))' % (field_type.__name__, v),
+                '    %s = %s.value' % (v, v),
+            ])
+        elif field_type in _integer_types:
+            minimum, maximum, description = _integer_types[field_type]
+            lines.extend([
+                '    if not isinstance(%s, integer_types):' % (v),
+                '        raise PackingError(\'cannot pack %%r to %s\' %% '
+                '(%s, ))' % (description, v),
+                '    if %s < %d or %s > %d:' % (v, minimum, v, maximum),
+                '        raise PackingError(\'%%r out of range for %s\' %% '
+                '(%s, ))' % (description, v),
+            ])
+        elif field_type in _simple_types:
+            python_type, _, description = _simple_types[field_type]
+            lines.extend([
+                '    if not isinstance(%s, %s):' % (v, python_type),
+                '        raise PackingError(\'cannot pack %%r to %s\' %% '
+                '(%s, ))' % (description, v),
+            ])
+        else:
+            raise ValueError('unsupported field type: %r' % (field_type, ))
+
+    def _compile_serialize(self):
+        """Compile the serialize function.
+
+        :returns:
+            a function validating a struct and returning the list of its
+            field values ready for packing.
+        """
+
+        lines = ['def serialize(obj):']
+
+        for i, (name, field_type) in enumerate(self.fields):
+            lines.append('    v%d = obj.%s' % (i, name))
+            self._pack_checks(lines, i, field_type)
+
+        lines.append('    return [%s]' % (', '.join(
+            'v%d' % (i) for i in range(len(self.fields))
+        )))
+
+        return self._compile('serialize', lines)
+
+    def pack_serialized(self, ser):
+        """Pack the serialized form of a struct.
+
+        :param ser: Serialized struct as returned by :attr:`serialize`.
+        :returns: the packed struct.
+        """
+
+        if self._float_types == set(['float32']):
+            return float_packer.pack(ser)
+        if 'float32' not in self._float_types:
+            return packer.pack(ser)
+
+        pieces = [packer.pack_array_header(len(self.fields))]
+
+        for value, (_, field_type) in zip(ser, self.fields):
+            if isinstance(field_type, Schema):
+                pieces.append(field_type.pack_serialized(value))
+            elif field_type == 'float32':
+                pieces.append(float_packer.pack(value))
+            else:
+                pieces.append(packer.pack(value))
+
+        return b''.join(pieces)
+
+    def _compile_deserialize(self):
+        """Compile the deserialize function.
+
+        :returns:
+            a function validating serialized input and constructing the
+            struct.
+        """
+
+        count = len(self.fields)
+        lines = [
+            'def deserialize(ser):',
+            '    if not isinstance(ser, (list, tuple, )) or len(ser) != %d:'
+            % (count),
+            '        raise DeserializationError(\'cannot deserialize %%r to '
+            'struct of %d fields\' %% (ser, ))' % (count),
+        ]
+
+        for i, (_, field_type) in enumerate(self.fields):
+            v = 'v%d' % (i)
+            lines.append('    %s = ser[%d]' % (v, i))
+
+            if isinstance(field_type, Schema):
+                lines.append('    %s = type_%d.deserialize(%s)' % (v, i, v))
+            elif isinstance(field_type, type) and \
+                    issubclass(field_type, Enum):
+                lines.append('    %s = type_%d.deserialize(%s)' % (v, i, v))
+            elif field_type in _integer_types:
+                minimum, maximum, description = _integer_types[field_type]
+                lines.extend([
+                    '    if not isinstance(%s, integer_types):' % (v),
+                    '        raise DeserializationError(\'cannot deserialize '
+                    '%%r to %s\' %% (%s, ))' % (description, v),
+                    '    if %s < %d or %s > %d:' % (v, minimum, v, maximum),
+                    '        raise DeserializationError(\'%%r out of range '
+                    'for %s\' %% (%s, ))' % (description, v),
+                ])
+            elif field_type in _simple_types:
+                _, python_type, description = _simple_types[field_type]
+                lines.extend([
+                    '    if not isinstance(%s, %s):' % (v, python_type),
+                    '        raise DeserializationError(\'cannot deserialize '
+                    '%%r to %s\' %% (%s, ))' % (description, v),
+                ])
+            else:
+                raise ValueError('unsupported field type: %r' %
+                                 (field_type, ))
+
+        lines.append('    return factory(%s)' % (', '.join(
+            'v%d' % (i) for i in range(count)
+        )))
+
+        return self._compile('deserialize', lines)
+
+
+_schemas = {}
+_schemas_lock = threading.Lock()
+
+
+def compile_schema(fields, factory):
+    """Compile a struct schema.
+
+    Compiled schemas are cached, so generated structs can compile their
+    schema at import time at no further cost.
+
+    :param fields: Sequence of ``(name, type)`` tuples.
+    :param factory:
+        Callable constructing a struct from the field values given as
+        positional arguments in field order.
+    :returns: the compiled :class:`Schema`.
+    """
+
+    key = (tuple(fields), factory)
+
+    with _schemas_lock:
+        try:
+            return _schemas[key]
+        except KeyError:
+            schema = _schemas[key] = Schema(fields, factory)
+            return schema
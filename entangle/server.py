@@ -0,0 +1,561 @@
+import logging
+import socket
+import threading
+import time
+from six.moves import queue
+from .connection import Connection
+from .exceptions import (
+    ConnectionLostError,
+    DeadlineExceededError,
+    EntangleException,
+    InternalServerError,
+    ServerOverloadedError,
+    UnknownMethodError,
+)
+from .message import (
+    NotificationMessage,
+    RequestMessage,
+    StreamCancelMessage,
+    StreamCreditMessage,
+)
+from .packing import packer
+from .statistics import ServerStatistics
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Stream(object):
+    """Flow control state of a streamed result.
+    """
+
+    def __init__(self):
+        self.credits = 0
+        self.cancelled = False
+        self.exception = None
+        self._condition = threading.Condition()
+
+    def grant(self, credits):
+        """Grant credit for further chunks.
+
+        :param credits: Number of further chunks the client accepts.
+        """
+
+        with self._condition:
+            self.credits += credits
+            self._condition.notify()
+
+    def cancel(self, exception=None):
+        """Cancel the stream.
+
+        :param exception:
+            :class:`EntangleException` to send instead of ending the stream,
+            or ``None`` if the client cancelled the stream.
+        """
+
+        with self._condition:
+            if not self.cancelled:
+                self.cancelled = True
+                self.exception = exception
+            self._condition.notify()
+
+    def acquire(self):
+        """Wait for credit to send a chunk.
+
+        :returns: whether a chunk may be sent, ``False`` once cancelled.
+        """
+
+        with self._condition:
+            while not self.credits and not self.cancelled:
+                self._condition.wait()
+
+            if self.cancelled:
+                return False
+
+            self.credits -= 1
+            return True
+
+
+class ServerConnection(object):
+    """Server side of a client connection.
+
+    Serializes writes from worker threads to the connection.
+    """
+
+    def __init__(self, conn, address):
+        """Initialize a server connection.
+
+        :param conn: :class:`Connection`.
+        :param address: Client address.
+        """
+
+        self.conn = conn
+        self.address = address
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._streams = {}
+        self._streams_lock = threading.Lock()
+        self._streams_cancelled = None
+
+    def send_response(self, message_id, packed_result):
+        """Send response.
+
+        :param message_id: Message ID of the request.
+        :param packed_result: Packed result.
+        """
+
+        with self._write_lock:
+            if not self._closed:
+                self.conn.send_response(message_id, packed_result)
+
+    def send_exception(self, message_id, exc):
+        """Send exception.
+
+        :param message_id: Message ID of the request.
+        :param exc: :class:`EntangleException`.
+        """
+
+        with self._write_lock:
+            if not self._closed:
+                self.conn.send_exception(message_id,
+                                         exc.definition,
+                                         exc.name,
+                                         str(exc))
+
+    def send_stream_chunk(self, message_id, packed_chunk):
+        """Send stream chunk.
+
+        :param message_id: Message ID of the request.
+        :param packed_chunk: Packed chunk.
+        """
+
+        with self._write_lock:
+            if not self._closed:
+                self.conn.send_stream_chunk(message_id, packed_chunk)
+
+    def send_stream_end(self, message_id):
+        """Send stream end.
+
+        :param message_id: Message ID of the request.
+        """
+
+        with self._write_lock:
+            if not self._closed:
+                self.conn.send_stream_end(message_id)
+
+    def open_stream(self, message_id):
+        """Open a stream for a request.
+
+        :param message_id: Message ID of the request.
+        """
+
+        stream = _Stream()
+
+        with self._streams_lock:
+            if self._streams_cancelled is not None:
+                stream.cancel(self._streams_cancelled)
+            self._streams[message_id] = stream
+
+    def get_stream(self, message_id):
+        """Get the stream of a request.
+
+        :param message_id: Message ID of the request.
+        :returns: the stream or ``None``.
+        """
+
+        with self._streams_lock:
+            return self._streams.get(message_id)
+
+    def close_stream(self, message_id):
+        """Close the stream of a request.
+
+        :param message_id: Message ID of the request.
+        """
+
+        with self._streams_lock:
+            self._streams.pop(message_id, None)
+
+    def cancel_streams(self, exception):
+        """Cancel all current and future streams.
+
+        :param exception: :class:`EntangleException` to end the streams with.
+        """
+
+        with self._streams_lock:
+            self._streams_cancelled = exception
+            streams = list(self._streams.values())
+
+        for stream in streams:
+            stream.cancel(exception)
+
+    def close(self):
+        """Close the connection.
+        """
+
+        self.cancel_streams(InternalServerError('connection closed'))
+
+        with self._write_lock:
+            if not self._closed:
+                self._closed = True
+                self.conn.shutdown()
+                self.conn.close()
+
+
+class Server(object):
+    """Thread pool server.
+
+    Requests are read off each client connection by a thread per connection
+    and handled by a fixed pool of worker threads. When the request queue is
+    full, reading from the connection stalls for up to the queue timeout,
+    pushing back on the client, after which the request is rejected with
+    :class:`ServerOverloadedError`.
+    """
+
+    def __init__(self,
+                 address=None,
+                 sock=None,
+                 workers=8,
+                 max_queue_size=1024,
+                 queue_timeout=1.0,
+                 max_connections=1024,
+                 backlog=128,
+                 **kwargs):
+        """Initialize a server.
+
+        :param address:
+            Address to listen on. Ignored if :param:`sock` is given.
+        :param sock: Listening socket. Default ``None``.
+        :param workers: Number of worker threads. Default ``8``.
+        :param max_queue_size:
+            Maximum number of queued requests. Default ``1024``.
+        :param queue_timeout:
+            Maximum time in seconds to wait for room in the request queue
+            before rejecting a request. Default ``1.0``.
+        :param max_connections:
+            Maximum number of client connections. Default ``1024``.
+        :param backlog: Listen backlog. Default ``128``.
+        :param kwargs: Connection options, e.g. ``compression_threshold``.
+        """
+
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(address)
+            sock.listen(backlog)
+
+        self._sock = sock
+        self._workers = workers
+        self._queue = queue.Queue(max_queue_size)
+        self._queue_timeout = queue_timeout
+        self._max_connections = max_connections
+        self._connection_options = kwargs
+        self._methods = {}
+        self._stream_methods = set()
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._shutdown = threading.Event()
+        self.statistics = ServerStatistics()
+        """Server statistics.
+        """
+
+    @property
+    def address(self):
+        """Address the server is listening on.
+        """
+
+        return self._sock.getsockname()
+
+    def register(self, name, handler, stream=False):
+        """Register a method.
+
+        :param name: Method name.
+        :param handler:
+            Callable taking the method arguments and returning the result.
+        :param stream:
+            Whether the result is streamed, in which case the handler returns
+            an iterable of chunks sent as the client consumes them. Default
+            ``False``.
+        """
+
+        self._methods[name] = handler
+        if stream:
+            self._stream_methods.add(name)
+        else:
+            self._stream_methods.discard(name)
+
+    def method(self, name, stream=False):
+        """Decorator registering a method.
+
+        :param name: Method name.
+        :param stream: Whether the result is streamed. Default ``False``.
+        """
+
+        def decorator(handler):
+            self.register(name, handler, stream)
+            return handler
+
+        return decorator
+
+    def _handle(self, server_conn, message):
+        """Handle a request or notification.
+
+        :param server_conn: :class:`ServerConnection`.
+        :param message:
+            :class:`RequestMessage` or :class:`NotificationMessage`.
+        """
+
+        notify = isinstance(message, NotificationMessage)
+
+        with self._lock:
+            if notify:
+                self.statistics.notifications += 1
+            else:
+                self.statistics.requests += 1
+
+        try:
+            # Skip requests the caller has already given up on.
+            deadline = getattr(message, 'deadline', None)
+            if deadline is not None and time.time() > deadline:
+                raise DeadlineExceededError('deadline exceeded')
+
+            try:
+                handler = self._methods[message.method]
+            except KeyError:
+                raise UnknownMethodError('unknown method: %s' %
+                                         (message.method))
+
+            result = handler(*message.arguments)
+
+            if not notify:
+                if message.method in self._stream_methods:
+                    self._send_stream(server_conn, message.message_id, result)
+                else:
+                    server_conn.send_response(message.message_id,
+                                              packer.pack(result))
+        except EntangleException as e:
+            if not notify:
+                self._close_stream(server_conn, message)
+                self._send_exception(server_conn, message.message_id, e)
+        except Exception:
+            logger.exception('error handling %s', message.method)
+            if not notify:
+                self._close_stream(server_conn, message)
+                self._send_exception(
+                    server_conn,
+                    message.message_id,
+                    InternalServerError('internal server error')
+                )
+
+    def _close_stream(self, server_conn, message):
+        """Close the stream of a failed request, if for a streamed result.
+
+        :param server_conn: :class:`ServerConnection`.
+        :param message: :class:`RequestMessage`.
+        """
+
+        if message.method in self._stream_methods:
+            server_conn.close_stream(message.message_id)
+
+    def _send_stream(self, server_conn, message_id, chunks):
+        """Send a streamed result, a chunk at a time as credit is granted.
+
+        :param server_conn: :class:`ServerConnection`.
+        :param message_id: Message ID of the request.
+        :param chunks: Iterable of chunks.
+        """
+
+        stream = server_conn.get_stream(message_id)
+
+        try:
+            for chunk in chunks:
+                if not stream.acquire():
+                    break
+                server_conn.send_stream_chunk(message_id, packer.pack(chunk))
+        finally:
+            server_conn.close_stream(message_id)
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+        if stream.exception is not None:
+            raise stream.exception
+
+        server_conn.send_stream_end(message_id)
+
+    def _send_exception(self, server_conn, message_id, exc):
+        """Send an exception, ignoring a lost connection.
+        """
+
+        with self._lock:
+            self.statistics.exceptions += 1
+
+        try:
+            server_conn.send_exception(message_id, exc)
+        except Exception:
+            server_conn.close()
+
+    def _work(self):
+        """Worker thread.
+        """
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            server_conn, message = item
+
+            try:
+                self._handle(server_conn, message)
+            except Exception:
+                # The connection is gone; its reader cleans up after it.
+                server_conn.close()
+
+    def _read(self, server_conn):
+        """Connection reader thread.
+
+        :param server_conn: :class:`ServerConnection`.
+        """
+
+        try:
+            for message in server_conn.conn.iter_messages():
+                if isinstance(message, StreamCreditMessage):
+                    stream = server_conn.get_stream(message.message_id)
+                    if stream is not None:
+                        stream.grant(message.credits)
+                    continue
+
+                if isinstance(message, StreamCancelMessage):
+                    stream = server_conn.get_stream(message.message_id)
+                    if stream is not None:
+                        stream.cancel()
+                    continue
+
+                if not isinstance(message,
+                                  (RequestMessage, NotificationMessage, )):
+                    logger.warning('unexpected message from %r: %r',
+                                   server_conn.address,
+                                   message)
+                    break
+
+                # Open streams before any credit for them is received.
+                stream = isinstance(message, RequestMessage) and \
+                    message.method in self._stream_methods
+                if stream:
+                    server_conn.open_stream(message.message_id)
+
+                try:
+                    self._queue.put((server_conn, message),
+                                    timeout=self._queue_timeout)
+                except queue.Full:
+                    if stream:
+                        server_conn.close_stream(message.message_id)
+
+                    with self._lock:
+                        self.statistics.rejected += 1
+
+                    if isinstance(message, RequestMessage):
+                        self._send_exception(
+                            server_conn,
+                            message.message_id,
+                            ServerOverloadedError('server overloaded')
+                        )
+        except (ConnectionLostError, socket.error):
+            pass
+        except Exception:
+            logger.exception('error reading from %r', server_conn.address)
+        finally:
+            server_conn.close()
+
+            with self._lock:
+                self._connections.discard(server_conn)
+                self.statistics.connections = len(self._connections)
+
+    def _accept(self, sock, address):
+        """Accept a client connection.
+
+        :param sock: Client socket.
+        :param address: Client address.
+        """
+
+        with self._lock:
+            if len(self._connections) >= self._max_connections:
+                sock.close()
+                return
+
+            server_conn = ServerConnection(
+                Connection(sock, **self._connection_options),
+                address
+            )
+            self._connections.add(server_conn)
+            self.statistics.connections = len(self._connections)
+
+        thread = threading.Thread(target=self._read, args=(server_conn, ))
+        thread.daemon = True
+        thread.start()
+
+    def serve_forever(self, poll_interval=0.5):
+        """Serve until :meth:`shutdown` is called.
+
+        :param poll_interval:
+            Interval in seconds at which to check for shutdown. Default
+            ``0.5``.
+        """
+
+        for _ in range(self._workers):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+        self._sock.settimeout(poll_interval)
+
+        try:
+            while not self._shutdown.is_set():
+                try:
+                    sock, address = self._sock.accept()
+                except socket.timeout:
+                    continue
+
+                sock.settimeout(None)
+                self._accept(sock, address)
+        finally:
+            self._stop()
+
+    def _stop(self):
+        """Stop the worker threads and close all connections.
+
+        Requests already queued are handled before the workers stop, except
+        that streamed results are cut short.
+        """
+
+        with self._lock:
+            connections = list(self._connections)
+        for server_conn in connections:
+            server_conn.cancel_streams(
+                InternalServerError('server shutting down')
+            )
+
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        del self._threads[:]
+
+        with self._lock:
+            connections = list(self._connections)
+        for server_conn in connections:
+            server_conn.close()
+
+    def shutdown(self):
+        """Stop serving.
+        """
+
+        self._shutdown.set()
+
+    def close(self):
+        """Close the listening socket.
+        """
+
+        self._sock.close()
@@ -0,0 +1,307 @@
+import bisect
+import hashlib
+import struct
+from .client import Client
+from .lazy import LazyValue
+from .packing import packer
+
+
+_hash_struct = struct.Struct('>Q')
+
+
+def _hash(data):
+    """Hash data onto the ring.
+
+    :param data: Bytes.
+    :returns: the position on the ring as an unsigned 64-bit integer.
+    """
+
+    return _hash_struct.unpack(hashlib.md5(data).digest()[:8])[0]
+
+
+class HashRing(object):
+    """Consistent hash ring.
+
+    Each node is placed on the ring at a number of points, or virtual nodes,
+    and keys are assigned to the node of the first point following their
+    hash. Adding or removing a node thus only moves the keys of that node.
+    Keys are hashed in their packed form, so equal keys map to the same node
+    whatever the client.
+    """
+
+    def __init__(self, nodes=(), replicas=160):
+        """Initialize a hash ring.
+
+        :param nodes: Initial nodes, e.g. addresses.
+        :param replicas: Number of virtual nodes per node. Default ``160``.
+        """
+
+        self._replicas = replicas
+        self._nodes = set()
+        self._points = []
+        self._owners = []
+
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, node):
+        return node in self._nodes
+
+    def _node_points(self, node):
+        """Points of a node on the ring.
+
+        :param node: Node.
+        """
+
+        name = packer.pack(list(node) if isinstance(node, tuple) else node)
+        return [_hash(name + packer.pack(i)) for i in range(self._replicas)]
+
+    def add(self, node):
+        """Add a node.
+
+        :param node: Node.
+        """
+
+        if node in self._nodes:
+            return
+
+        self._nodes.add(node)
+
+        for point in self._node_points(node):
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        """Remove a node.
+
+        :param node: Node.
+        """
+
+        if node not in self._nodes:
+            return
+
+        self._nodes.remove(node)
+
+        kept = [(point, owner)
+                for point, owner in zip(self._points, self._owners)
+                if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def get(self, key):
+        """Get the node of a key.
+
+        :param key: Key.
+        :returns: the node.
+        :raises ValueError: if the ring is empty.
+        """
+
+        if not self._points:
+            raise ValueError('hash ring is empty')
+
+        index = bisect.bisect(self._points, _hash(packer.pack(key)))
+        if index == len(self._points):
+            index = 0
+
+        return self._owners[index]
+
+
+class ShardedClient(object):
+    """Sharded client.
+
+    Base class for client implementations of services sharded by key. Each
+    call is routed to a shard by a consistent hash of its key, which is
+    either given explicitly or taken from an argument of the method, over a
+    connection per shard.
+
+    Calls on many keys can be fanned out with :meth:`_call_keys`, sending
+    one call per shard with the keys of that shard. Operates in a non thread
+    safe blocking manner.
+    """
+
+    def __init__(self,
+                 addresses,
+                 shard_arguments=None,
+                 replicas=160,
+                 connect_timeout=10,
+                 reconnect_limit=3,
+                 call_timeout=None,
+                 **kwargs):
+        """Initialize a sharded client.
+
+        :param addresses: Shard addresses.
+        :param shard_arguments:
+            Mapping of method names to the index of the argument holding the
+            key of calls to the method. Default ``None``.
+        :param replicas: Number of virtual nodes per shard. Default ``160``.
+        :param connect_timeout: Connect timeout. Default ``10``.
+        :param reconnect_limit: Reconnect limit. Default ``3``.
+        :param call_timeout:
+            Default timeout of calls in seconds. Default ``None``.
+        :param kwargs: Connection options, e.g. ``compression_threshold``.
+        """
+
+        self._shard_arguments = dict(shard_arguments or {})
+        self._connect_timeout = connect_timeout
+        self._reconnect_limit = reconnect_limit
+        self._call_timeout = call_timeout
+        self._connection_options = kwargs
+        self._ring = HashRing(replicas=replicas)
+        self._clients = {}
+
+        for address in addresses:
+            self.add_shard(address)
+
+    def add_shard(self, address):
+        """Add a shard.
+
+        Only the keys which map to the new shard move.
+
+        :param address: Address.
+        """
+
+        address = tuple(address)
+        if address in self._clients:
+            return
+
+        self._clients[address] = Client(address,
+                                        self._connect_timeout,
+                                        self._reconnect_limit,
+                                        self._call_timeout,
+                                        **self._connection_options)
+        self._ring.add(address)
+
+    def remove_shard(self, address):
+        """Remove a shard, closing its connection.
+
+        Only the keys of the removed shard move.
+
+        :param address: Address.
+        """
+
+        address = tuple(address)
+        client = self._clients.pop(address, None)
+        if client is None:
+            return
+
+        self._ring.remove(address)
+        client._reset_conn()
+
+    def _shard(self, key):
+        """Get the address of the shard of a key.
+
+        :param key: Key.
+        """
+
+        return self._ring.get(key)
+
+    def _key(self, name, packed_arguments):
+        """Get the key of a call from its arguments.
+
+        :param name: Name.
+        :param packed_arguments: Packed arguments.
+        :raises ValueError: if the method has no shard argument.
+        """
+
+        try:
+            index = self._shard_arguments[name]
+        except KeyError:
+            raise ValueError('no key given for method %s, which has no shard '
+                             'argument' % (name))
+
+        return LazyValue(packed_arguments)[index]
+
+    def _call(self,
+              name,
+              packed_arguments,
+              trace=False,
+              notify=False,
+              timeout=None,
+              key=None):
+        """Call a method.
+
+        :param name: Name.
+        :param packed_arguments: Package arguments.
+        :param trace: Request trace. Ignored if :param:`notify` is ``True``.
+        :param notify: Notify instead of request.
+        :param timeout:
+            Timeout in seconds. Defaults to the client's call timeout. Ignored
+            if :param:`notify` is ``True``.
+        :param key:
+            Key routing the call. Defaults to the method's shard argument,
+            which requires decoding the arguments.
+        :returns:
+            the response message if :param:`notify` is ``False``, otherwise
+           ``None`` indicating that the notification has been sent.
+        """
+
+        if key is None:
+            key = self._key(name, packed_arguments)
+
+        return self._clients[self._shard(key)]._call(name,
+                                                     packed_arguments,
+                                                     trace,
+                                                     notify,
+                                                     timeout)
+
+    def _call_keys(self,
+                   name,
+                   keys,
+                   pack_arguments,
+                   trace=False,
+                   timeout=None):
+        """Call a method on many keys.
+
+        The keys are grouped by shard and the method called once per shard,
+        with the calls to all shards in flight at once.
+
+        :param name: Name.
+        :param keys: Iterable of keys.
+        :param pack_arguments:
+            Callable taking the list of keys of a shard and returning the
+            packed arguments of the call to the shard.
+        :param trace: Request trace.
+        :param timeout:
+            Timeout in seconds. Defaults to the client's call timeout.
+        :returns:
+            a list of ``(keys, response)`` tuples, one per shard called.
+        """
+
+        shards = {}
+        for key in keys:
+            shards.setdefault(self._shard(key), []).append(key)
+
+        calls = []
+        responses = []
+
+        try:
+            for address, shard_keys in shards.items():
+                client = self._clients[address]
+                message_id = client._begin_call(name,
+                                                pack_arguments(shard_keys),
+                                                trace,
+                                                timeout)
+                calls.append((client, shard_keys, message_id))
+
+            for client, shard_keys, message_id in calls:
+                responses.append((shard_keys, client._end_call(message_id)))
+        except:
+            # Abandon the calls to other shards still in flight and re-raise.
+            for client, _, message_id in calls:
+                if client._conn is not None and \
+                        message_id in client._in_flight:
+                    client._abandon_call(message_id)
+            raise
+
+        return responses
+
+    def close(self):
+        """Close the connections to all shards.
+        """
+
+        for client in self._clients.values():
+            client._reset_conn()
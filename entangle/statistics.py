@@ -0,0 +1,149 @@
+class CompressionStatistics(object):
+    """Outbound compression statistics.
+    """
+
+    __slots__ = ('messages',
+                 'compressed_messages',
+                 'uncompressed_bytes',
+                 'compressed_bytes')
+
+    def __init__(self):
+        self.messages = 0
+        """Number of messages considered for compression.
+        """
+
+        self.compressed_messages = 0
+        """Number of messages sent compressed.
+        """
+
+        self.uncompressed_bytes = 0
+        """Size of the messages sent compressed before compression.
+        """
+
+        self.compressed_bytes = 0
+        """Size of the messages sent compressed after compression.
+        """
+
+    @property
+    def bytes_saved(self):
+        """Number of bytes saved by compression.
+        """
+
+        return self.uncompressed_bytes - self.compressed_bytes
+
+    def __repr__(self):
+        return '<%s.%s: messages = %d, compressed messages = %d, bytes ' \
+            'saved = %d>' % (self.__class__.__module__,
+                             self.__class__.__name__,
+                             self.messages,
+                             self.compressed_messages,
+                             self.bytes_saved)
+
+
+class ReceiveStatistics(object):
+    """Receive statistics.
+    """
+
+    __slots__ = ('syscalls', 'bytes', 'messages', 'buffer_size')
+
+    def __init__(self):
+        self.syscalls = 0
+        """Number of receive system calls.
+        """
+
+        self.bytes = 0
+        """Number of bytes received.
+        """
+
+        self.messages = 0
+        """Number of messages received.
+        """
+
+        self.buffer_size = 0
+        """Current receive buffer size.
+        """
+
+    @property
+    def average_receive_size(self):
+        """Average number of bytes received per system call.
+        """
+
+        if not self.syscalls:
+            return 0.0
+
+        return float(self.bytes) / self.syscalls
+
+    def __repr__(self):
+        return '<%s.%s: syscalls = %d, bytes = %d, messages = %d, buffer ' \
+            'size = %d>' % (self.__class__.__module__,
+                            self.__class__.__name__,
+                            self.syscalls,
+                            self.bytes,
+                            self.messages,
+                            self.buffer_size)
+
+
+class ServerStatistics(object):
+    """Server statistics.
+    """
+
+    __slots__ = ('connections', 'requests', 'notifications', 'exceptions',
+                 'rejected')
+
+    def __init__(self):
+        self.connections = 0
+        """Number of open client connections.
+        """
+
+        self.requests = 0
+        """Number of requests handled.
+        """
+
+        self.notifications = 0
+        """Number of notifications handled.
+        """
+
+        self.exceptions = 0
+        """Number of requests answered with an exception.
+        """
+
+        self.rejected = 0
+        """Number of requests rejected due to overload.
+        """
+
+    def add(self, other):
+        """Add another set of server statistics to these.
+
+        :param other: :class:`ServerStatistics`.
+        """
+
+        for field in self.__slots__:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def serialize(self):
+        """Serialize.
+        """
+
+        return [getattr(self, field) for field in self.__slots__]
+
+    @classmethod
+    def deserialize(cls, ser):
+        """Deserialize.
+        """
+
+        stats = cls()
+        for field, value in zip(cls.__slots__, ser):
+            setattr(stats, field, value)
+        return stats
+
+    def __repr__(self):
+        return '<%s.%s: connections = %d, requests = %d, notifications = ' \
+            '%d, exceptions = %d, rejected = %d>' % (
+                self.__class__.__module__,
+                self.__class__.__name__,
+                self.connections,
+                self.requests,
+                self.notifications,
+                self.exceptions,
+                self.rejected
+            )
@@ -0,0 +1,43 @@
+from array import array
+
+try:
+    array('q')
+    _signed_typecode, _unsigned_typecode = 'q', 'Q'
+except ValueError:
+    _signed_typecode, _unsigned_typecode = 'l', 'L'
+
+
+def integers_in_range(x, minimum, maximum):
+    """Whether a sequence holds only integers within a range.
+
+    The checks are performed in a few passes over the sequence in C rather
+    than element by element in Python. A negative result does not tell which
+    element is invalid, so callers should validate element by element to
+    report the error.
+
+    :param x: Sequence.
+    :param minimum: Minimum value.
+    :param maximum: Maximum value.
+    """
+
+    try:
+        array(_signed_typecode if minimum < 0 else _unsigned_typecode, x)
+    except (TypeError, OverflowError):
+        return False
+
+    return not x or (min(x) >= minimum and max(x) <= maximum)
+
+
+def all_floats(x):
+    """Whether a sequence holds only floating point numbers.
+
+    Subclasses of :class:`float` are not recognized, so callers should
+    validate element by element on a negative result.
+
+    :param x: Sequence.
+    """
+
+    return set(map(type, x)) <= _float_type
+
+
+_float_type = set([float])
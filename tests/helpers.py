@@ -0,0 +1,74 @@
+import socket
+import threading
+import time
+from entangle.server import Server
+
+
+def start_server(**kwargs):
+    """Start a server on a free port, serving from a thread.
+
+    :param kwargs: Server options.
+    :returns: the server and its thread, to be passed to :func:`stop_server`.
+    """
+
+    server = Server(('127.0.0.1', 0), **kwargs)
+    thread = threading.Thread(target=server.serve_forever,
+                              kwargs={'poll_interval': 0.01})
+    thread.start()
+    return server, thread
+
+
+def stop_server(server, thread):
+    """Stop a server started with :func:`start_server`.
+
+    :param server: Server.
+    :param thread: Thread serving.
+    """
+
+    server.shutdown()
+    thread.join()
+    server.close()
+
+
+def unused_address():
+    """Address nothing listens on.
+    """
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    address = sock.getsockname()
+    sock.close()
+    return address
+
+
+class DelayedServersMixin(object):
+    """Test case mixin running a number of servers.
+
+    The ``get`` method of each server returns the index of the server, after
+    sleeping for the ``'delay'`` in seconds of the server's entry in
+    ``self.delays``.
+    """
+
+    def _start_servers(self, count=2):
+        self.servers = []
+        self.threads = []
+        self.delays = []
+
+        for i in range(count):
+            server, thread = start_server()
+            delays = {'delay': 0}
+            server.register('get', self._handler(i, delays))
+            self.servers.append(server)
+            self.threads.append(thread)
+            self.delays.append(delays)
+
+    def _handler(self, index, delays):
+        def get():
+            time.sleep(delays['delay'])
+            return index
+
+        return get
+
+    def _stop_servers(self):
+        for server, thread in zip(self.servers, self.threads):
+            stop_server(server, thread)
@@ -0,0 +1,126 @@
+import asyncio
+import msgpack
+from unittest import IsolatedAsyncioTestCase
+from entangle.async_client import AsyncClient
+from entangle.circuit import CircuitBreaker, CircuitState
+from entangle.exceptions import CircuitOpenError, ConnectionLostError
+from entangle.message import ResponseMessage
+from entangle.opcode import Opcode
+from .helpers import unused_address
+
+
+packer = msgpack.Packer()
+
+
+class AsyncClientTestCase(IsolatedAsyncioTestCase):
+    """Test case for :class:`AsyncClient`.
+    """
+
+    async def asyncSetUp(self):
+        self.server = await asyncio.start_server(self._handle,
+                                                 '127.0.0.1',
+                                                 0)
+        self.address = self.server.sockets[0].getsockname()[:2]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        unpacker = msgpack.Unpacker()
+
+        while True:
+            data = await reader.read(4096)
+            if not data:
+                break
+
+            unpacker.feed(data)
+
+            # Respond to each batch of requests in reverse order.
+            for request in reversed(list(unpacker)):
+                if request[2] == 'hang_up':
+                    writer.close()
+                    return
+
+                writer.write(packer.pack(
+                    [Opcode.response.value, request[1], request[3][0], None]
+                ))
+
+        writer.close()
+
+    async def test_concurrent_calls(self):
+        """AsyncClient._call(..) concurrently
+        """
+
+        client = AsyncClient(self.address)
+
+        responses = await asyncio.gather(*[
+            client._call('echo', packer.pack([i])) for i in range(500)
+        ])
+
+        for i, response in enumerate(responses):
+            self.assertIsInstance(response, ResponseMessage)
+            self.assertEqual(response.result, i)
+
+        client.close()
+
+    async def test_connection_lost(self):
+        """AsyncClient._call(..) with the connection lost
+        """
+
+        client = AsyncClient(self.address)
+
+        with self.assertRaises(ConnectionLostError):
+            await client._call('hang_up', packer.pack([]))
+
+        response = await client._call('echo', packer.pack([1]))
+        self.assertEqual(response.result, 1)
+
+        client.close()
+
+    async def test_connect(self):
+        """AsyncClient._get_conn(..) backs off and fails fast while the
+        circuit breaker is open
+        """
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        client = AsyncClient(unused_address(),
+                             reconnect_limit=2,
+                             circuit_breaker=breaker)
+
+        delays = []
+        client._backoff_delay = lambda retry: delays.append(retry) or 0
+
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                await client._call('echo', packer.pack([1]))
+        self.assertEqual(delays, [0, 1, 0, 1])
+        self.assertIs(client.circuit_breaker.state, CircuitState.open)
+
+        with self.assertRaises(CircuitOpenError):
+            await client._call('echo', packer.pack([1]))
+        self.assertEqual(len(delays), 4)
+
+    async def test_cancel(self):
+        """AsyncClient._call(..) cancelled while draining
+        """
+
+        client = AsyncClient(self.address)
+        conn = await client._get_conn()
+        conn.pause_writing()
+
+        call = asyncio.ensure_future(client._call('echo', packer.pack([1])))
+        for _ in range(3):
+            await asyncio.sleep(0)
+        self.assertEqual(len(conn._waiters), 1)
+
+        call.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await call
+        self.assertEqual(conn._waiters, {})
+
+        conn.resume_writing()
+        response = await client._call('echo', packer.pack([2]))
+        self.assertEqual(response.result, 2)
+
+        client.close()
@@ -0,0 +1,86 @@
+import asyncio
+import msgpack
+from unittest import IsolatedAsyncioTestCase
+from entangle.async_connection import AsyncConnection
+from entangle.exceptions import BadMessageError, ConnectionLostError
+from entangle.opcode import Opcode
+
+
+packer = msgpack.Packer()
+
+
+class _Transport(object):
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def is_closing(self):
+        return self.closed
+
+
+class AsyncConnectionTestCase(IsolatedAsyncioTestCase):
+    """Test case for :class:`AsyncConnection`.
+    """
+
+    def setUp(self):
+        self.transport = _Transport()
+
+    def _connection(self, **kwargs):
+        conn = AsyncConnection(**kwargs)
+        conn.connection_made(self.transport)
+        return conn
+
+    async def test_max_message_size(self):
+        """AsyncConnection.data_received(..) with a maximum message size
+        """
+
+        conn = self._connection(max_message_size=1024)
+
+        # Far more than the maximum message size at once, in messages within
+        # it.
+        conn.data_received(b''.join(
+            packer.pack([Opcode.notification.value, i, 'method', ['x' * 50]])
+            for i in range(200)
+        ))
+
+        self.assertFalse(self.transport.closed)
+        for i in range(200):
+            message = await conn.receive()
+            self.assertEqual(message.message_id, i)
+
+        conn.data_received(packer.pack(
+            [Opcode.notification.value, 200, 'method', ['x' * 5000]]
+        ))
+        self.assertTrue(self.transport.closed)
+        self.assertIsInstance(conn._exception, BadMessageError)
+
+        # The error is kept once the transport reports the connection lost.
+        conn.connection_lost(None)
+        with self.assertRaises(BadMessageError):
+            await conn.receive()
+
+    async def test_drain(self):
+        """AsyncConnection.drain() with concurrent callers
+        """
+
+        conn = self._connection()
+        conn.pause_writing()
+
+        drains = [asyncio.ensure_future(conn.drain()) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.assertFalse(any(drain.done() for drain in drains))
+
+        conn.resume_writing()
+        await asyncio.wait_for(asyncio.gather(*drains), 1)
+
+        # Losing the connection fails everyone waiting.
+        conn.pause_writing()
+        drains = [asyncio.ensure_future(conn.drain()) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        conn.connection_lost(None)
+        for drain in drains:
+            with self.assertRaises(ConnectionLostError):
+                await asyncio.wait_for(drain, 1)
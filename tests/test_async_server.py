@@ -0,0 +1,119 @@
+import asyncio
+import msgpack
+from unittest import IsolatedAsyncioTestCase
+from entangle.async_client import AsyncClient
+from entangle.async_server import AsyncServer, AsyncServerConnection
+from entangle.exceptions import InvalidArgumentError
+from entangle.message import ExceptionMessage, ResponseMessage
+
+
+packer = msgpack.Packer()
+
+
+class AsyncServerTestCase(IsolatedAsyncioTestCase):
+    """Test case for :class:`AsyncServer`.
+    """
+
+    async def asyncSetUp(self):
+        self.server = AsyncServer()
+        await self.server.start(('127.0.0.1', 0))
+        self.client = AsyncClient(self.server.sockets[0].getsockname()[:2])
+
+    async def asyncTearDown(self):
+        self.client.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_call(self):
+        """AsyncServer request handling
+        """
+
+        @self.server.method('add')
+        async def add(a, b):
+            await asyncio.sleep(0)
+            return a + b
+
+        @self.server.method('invalid')
+        def invalid():
+            raise InvalidArgumentError('invalid')
+
+        response = await self.client._call('add', packer.pack([1, 2]))
+        self.assertIsInstance(response, ResponseMessage)
+        self.assertEqual(response.result, 3)
+
+        for method, name in [
+                ('unknown', 'UnknownMethod'),
+                ('invalid', 'InvalidArgument'),
+        ]:
+            response = await self.client._call(method, packer.pack([]))
+            self.assertIsInstance(response, ExceptionMessage)
+            self.assertEqual(response.name, name)
+
+    async def test_write_coalescing(self):
+        """AsyncServer coalesces responses into few writes
+        """
+
+        self.server.register('echo', lambda x: x)
+        flushes = []
+        flush = AsyncServerConnection._flush
+
+        def counting_flush(conn):
+            flushes.append(len(conn._pending))
+            flush(conn)
+
+        AsyncServerConnection._flush = counting_flush
+        try:
+            responses = await asyncio.gather(*[
+                self.client._call('echo', packer.pack([i]))
+                for i in range(200)
+            ])
+        finally:
+            AsyncServerConnection._flush = flush
+
+        self.assertEqual([r.result for r in responses], list(range(200)))
+        self.assertLess(len(flushes), 200)
+        self.assertEqual(sum(flushes), 200 * 3)
+
+    async def test_slow_client(self):
+        """AsyncServer with a client slow to read responses
+        """
+
+        server = AsyncServer(max_concurrency=8)
+        server.register('big', lambda: b'x' * 65536)
+
+        conns = []
+        factory = server._connection_factory
+
+        def connection_factory():
+            conns.append(factory())
+            return conns[-1]
+
+        server._connection_factory = connection_factory
+        await server.start(('127.0.0.1', 0))
+
+        reader, writer = await asyncio.open_connection(
+            *server.sockets[0].getsockname()[:2]
+        )
+
+        try:
+            for i in range(500):
+                writer.write(packer.pack([0, i, 'big', [], False]))
+            await writer.drain()
+            await asyncio.sleep(0.5)
+
+            # Responses do not pile up in the server's write buffer.
+            self.assertLess(conns[0]._transport.get_write_buffer_size(),
+                            4 << 20)
+
+            unpacker = msgpack.Unpacker()
+            responses = []
+            while len(responses) < 500:
+                unpacker.feed(await reader.read(1 << 20))
+                responses.extend(unpacker)
+
+            self.assertEqual(sorted(response[1] for response in responses),
+                             list(range(500)))
+        finally:
+            writer.close()
+            server.close()
+            await server.wait_closed()
@@ -0,0 +1,125 @@
+import msgpack
+import time
+from unittest import TestCase
+from entangle.balancing import BalancedClient
+from entangle.exceptions import DeadlineExceededError
+from .helpers import DelayedServersMixin, unused_address
+
+
+packer = msgpack.Packer()
+
+
+class BalancedClientTestCase(DelayedServersMixin, TestCase):
+    """Test case for :class:`BalancedClient`.
+    """
+
+    def setUp(self):
+        self._start_servers()
+        self.unavailable = unused_address()
+        self.clients = []
+
+    def _client(self, addresses, **kwargs):
+        client = BalancedClient(addresses, connect_timeout=1, **kwargs)
+        self.clients.append(client)
+        return client
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self._stop_servers()
+
+    def test_call(self):
+        """BalancedClient._call(..) spreads calls over backends
+        """
+
+        client = self._client([server.address for server in self.servers])
+
+        results = set()
+        for _ in range(20):
+            results.add(client._call('get', packer.pack([])).result)
+        self.assertEqual(results, set([0, 1]))
+
+        responses = client._call_many([('get', packer.pack([]))] * 10)
+        self.assertEqual(len(responses), 10)
+        self.assertEqual(set(response.result for response in responses),
+                         set([0, 1]))
+        for backend in client._backends:
+            self.assertEqual(backend.outstanding, 0)
+
+    def test_call_many_timeout(self):
+        """BalancedClient._call_many(..) with a call exceeding its timeout
+        """
+
+        client = self._client([server.address for server in self.servers])
+        self.delays[1]['delay'] = 0.2
+
+        with self.assertRaises(DeadlineExceededError):
+            client._call_many([('get', packer.pack([]))] * 6, timeout=0.1)
+
+        for backend in client._backends:
+            self.assertEqual(backend.outstanding, 0)
+            self.assertEqual(backend.client._in_flight, set())
+
+        # Late responses are discarded.
+        self.delays[1]['delay'] = 0
+        time.sleep(0.3)
+        responses = client._call_many([('get', packer.pack([]))] * 6)
+        self.assertEqual(len(responses), 6)
+
+    def test_latency(self):
+        """BalancedClient._call(..) balancing by latency
+        """
+
+        client = self._client([server.address for server in self.servers],
+                              balance='latency')
+        self.delays[1]['delay'] = 0.05
+
+        results = [client._call('get', packer.pack([])).result
+                   for _ in range(20)]
+        self.assertGreater(results.count(0), 15)
+
+    def test_ejection(self):
+        """BalancedClient._call(..) ejects failing backends
+        """
+
+        client = self._client([self.servers[0].address, self.unavailable],
+                              max_failures=2,
+                              ejection_time=0.2,
+                              slow_start=0.2)
+
+        failures = 0
+        for _ in range(20):
+            try:
+                self.assertEqual(client._call('get', packer.pack([])).result,
+                                 0)
+            except Exception:
+                failures += 1
+        self.assertEqual(failures, 2)
+        self.assertEqual(client.ejected, [self.unavailable])
+
+        # Ejected backends come back after the ejection time, slowly.
+        time.sleep(0.25)
+        self.assertEqual(client.ejected, [])
+        now = time.time()
+        backend = client._backends[1]
+        client._available(now)
+        self.assertLess(client._weight(backend, now), 0.5)
+        self.assertEqual(client._weight(backend, now + 0.2), 1.0)
+
+        # Ejected again, for twice as long.
+        backend.recovering_since = now
+        backend.ejections = 1
+        backend.failures = 1
+        client._failed(backend)
+        self.assertGreater(backend.ejected_until - time.time(), 0.3)
+
+    def test_all_ejected(self):
+        """BalancedClient._call(..) with all backends ejected
+        """
+
+        client = self._client([self.servers[0].address],
+                              max_failures=1)
+        client._failed(client._backends[0])
+        self.assertEqual(client.ejected, [self.servers[0].address])
+
+        self.assertEqual(client._call('get', packer.pack([])).result, 0)
@@ -0,0 +1,175 @@
+import msgpack
+import time
+from unittest import TestCase
+from entangle.balancing import BalancedClient
+from entangle.cache import CachePolicy, ResponseCache
+from entangle.circuit import CircuitBreaker, circuit_breakers
+from entangle.client import Client
+from entangle.exceptions import InvalidArgumentError
+from entangle.hedged import HedgedClient
+from entangle.message import ExceptionMessage, ResponseMessage
+from .helpers import start_server, stop_server
+
+
+packer = msgpack.Packer()
+
+
+class ResponseCacheTestCase(TestCase):
+    """Test case for :class:`ResponseCache`.
+    """
+
+    def setUp(self):
+        self.cache = ResponseCache({
+            'get': CachePolicy(0.1, exceptions=['NotFound']),
+        }, max_entries=3)
+
+    def test_get(self):
+        """ResponseCache.get(..) and ResponseCache.put(..)
+        """
+
+        response = ResponseMessage(1, 'value', None)
+        self.assertIsNone(self.cache.get('get', packer.pack([1])))
+        self.cache.put('get', packer.pack([1]), response)
+        self.assertIs(self.cache.get('get', packer.pack([1])), response)
+        self.assertIsNone(self.cache.get('get', packer.pack([2])))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+        # Methods without a policy are not cached.
+        self.cache.put('set', packer.pack([1]), response)
+        self.assertIsNone(self.cache.get('set', packer.pack([1])))
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.misses, 2)
+
+        # Entries expire.
+        time.sleep(0.15)
+        self.assertIsNone(self.cache.get('get', packer.pack([1])))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
+
+    def test_negative(self):
+        """ResponseCache.put(..) with exceptions
+        """
+
+        not_found = ExceptionMessage(1, 'test', 'NotFound', 'not found', None)
+        self.cache.put('get', packer.pack([1]), not_found)
+        self.assertIs(self.cache.get('get', packer.pack([1])), not_found)
+
+        error = ExceptionMessage(2, 'test', 'Error', 'error', None)
+        self.cache.put('get', packer.pack([2]), error)
+        self.assertIsNone(self.cache.get('get', packer.pack([2])))
+
+    def test_eviction(self):
+        """ResponseCache.put(..) evicts the least recently used entries
+        """
+
+        for i in range(3):
+            self.cache.put('get',
+                           packer.pack([i]),
+                           ResponseMessage(i, i, None))
+        self.cache.get('get', packer.pack([0]))
+        self.cache.put('get', packer.pack([3]), ResponseMessage(3, 3, None))
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNone(self.cache.get('get', packer.pack([1])))
+        self.assertIsNotNone(self.cache.get('get', packer.pack([0])))
+
+        # Bounded by bytes.
+        cache = ResponseCache({'get': CachePolicy(10)}, max_bytes=100)
+        cache.put('get', packer.pack([0]), ResponseMessage(0, 'x' * 50, None))
+        cache.put('get', packer.pack([1]), ResponseMessage(1, 'x' * 50, None))
+        self.assertEqual(len(cache), 1)
+        self.assertLessEqual(cache.size, 100)
+        cache.put('get', packer.pack([2]), ResponseMessage(2, 'x' * 200, None))
+        self.assertIsNone(cache.get('get', packer.pack([2])))
+
+    def test_invalidate(self):
+        """ResponseCache.invalidate(..)
+        """
+
+        for i in range(3):
+            self.cache.put('get',
+                           packer.pack([i]),
+                           ResponseMessage(i, i, None))
+
+        self.cache.invalidate('get', packer.pack([0]))
+        self.assertEqual(len(self.cache), 2)
+        self.cache.invalidate('get')
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
+
+
+class ClientResponseCacheTestCase(TestCase):
+    """Test case for :class:`Client` with a :class:`ResponseCache`.
+    """
+
+    def setUp(self):
+        self.calls = []
+        self.server, self.thread = start_server()
+        self.server.register('get', self._get)
+
+        self.cache = ResponseCache({
+            'get': CachePolicy(10, exceptions=['InvalidArgument']),
+        })
+        self.client = Client(self.server.address, response_cache=self.cache)
+
+    def _get(self, key):
+        self.calls.append(key)
+        if key < 0:
+            raise InvalidArgumentError('negative key')
+        return key * 2
+
+    def tearDown(self):
+        self.client._reset_conn()
+        stop_server(self.server, self.thread)
+
+    def test_call(self):
+        """Client._call(..) answers calls from the cache
+        """
+
+        for _ in range(3):
+            response = self.client._call('get', packer.pack([1]))
+            self.assertEqual(response.result, 2)
+            response = self.client._call('get', packer.pack([-1]))
+            self.assertIsInstance(response, ExceptionMessage)
+
+        self.assertEqual(self.calls, [1, -1])
+        self.assertEqual((self.cache.hits, self.cache.misses), (4, 2))
+
+    def test_balanced_call(self):
+        """BalancedClient._call(..) answers calls from the cache
+        """
+
+        client = BalancedClient([self.server.address],
+                                response_cache=self.cache)
+        try:
+            for _ in range(3):
+                response = client._call('get', packer.pack([1]))
+                self.assertEqual(response.result, 2)
+        finally:
+            client.close()
+
+        self.assertEqual(self.calls, [1])
+        self.assertIsNone(client._backends[0].client._response_cache)
+
+    def test_hedged_call(self):
+        """HedgedClient._call(..) answers calls from the cache
+        """
+
+        breaker = CircuitBreaker()
+        client = HedgedClient(self.server.address,
+                              self.server.address,
+                              circuit_breaker=breaker,
+                              response_cache=self.cache)
+        try:
+            for _ in range(3):
+                response = client._call('get', packer.pack([1]), hedge=True)
+                self.assertEqual(response.result, 2)
+        finally:
+            client._reset_conn()
+            client._hedge._reset_conn()
+
+        self.assertEqual(self.calls, [1])
+        self.assertIs(client.circuit_breaker, breaker)
+        self.assertIs(client._hedge.circuit_breaker,
+                      circuit_breakers.get(self.server.address))
+        self.assertIsNone(client._hedge._response_cache)
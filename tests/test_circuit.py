@@ -0,0 +1,89 @@
+import time
+from unittest import TestCase
+from entangle.circuit import (
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    CircuitState,
+)
+
+
+class CircuitBreakerTestCase(TestCase):
+    """Test case for :class:`CircuitBreaker`.
+    """
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+        self.changes = []
+        self.breaker.add_listener(
+            lambda breaker, old, new: self.changes.append((old, new))
+        )
+
+    def test_open(self):
+        """CircuitBreaker opens after too many failures
+        """
+
+        self.assertTrue(self.breaker.allow())
+        self.breaker.failed()
+        self.assertIs(self.breaker.state, CircuitState.closed)
+
+        # Successes reset the failure count.
+        self.breaker.succeeded()
+        self.breaker.failed()
+        self.assertIs(self.breaker.state, CircuitState.closed)
+
+        self.breaker.failed()
+        self.assertIs(self.breaker.state, CircuitState.open)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.changes,
+                         [(CircuitState.closed, CircuitState.open)])
+
+    def test_half_open(self):
+        """CircuitBreaker lets a single trial through after the reset timeout
+        """
+
+        self.breaker.failed()
+        self.breaker.failed()
+
+        time.sleep(0.15)
+        self.assertTrue(self.breaker.allow())
+        self.assertIs(self.breaker.state, CircuitState.half_open)
+        self.assertFalse(self.breaker.allow())
+
+        # A failed trial opens the breaker again.
+        self.breaker.failed()
+        self.assertIs(self.breaker.state, CircuitState.open)
+        self.assertFalse(self.breaker.allow())
+
+        time.sleep(0.15)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.succeeded()
+        self.assertIs(self.breaker.state, CircuitState.closed)
+        self.assertTrue(self.breaker.allow())
+
+        self.assertEqual(self.changes, [
+            (CircuitState.closed, CircuitState.open),
+            (CircuitState.open, CircuitState.half_open),
+            (CircuitState.half_open, CircuitState.open),
+            (CircuitState.open, CircuitState.half_open),
+            (CircuitState.half_open, CircuitState.closed),
+        ])
+
+
+class CircuitBreakerRegistryTestCase(TestCase):
+    """Test case for :class:`CircuitBreakerRegistry`.
+    """
+
+    def test_get(self):
+        """CircuitBreakerRegistry.get(..)
+        """
+
+        registry = CircuitBreakerRegistry()
+        breaker = registry.get(('127.0.0.1', 1))
+        self.assertIs(registry.get(('127.0.0.1', 1)), breaker)
+        self.assertIsNot(registry.get(('127.0.0.1', 2)), breaker)
+
+        # Addresses given as lists share the breaker of the tuple.
+        self.assertIs(registry.get(['127.0.0.1', 1]), breaker)
+
+        registry.clear()
+        self.assertIsNot(registry.get(('127.0.0.1', 1)), breaker)
@@ -0,0 +1,197 @@
+import msgpack
+import socket
+import time
+from unittest import TestCase
+from entangle.balancing import BalancedClient
+from entangle.circuit import CircuitBreaker, CircuitState
+from entangle.client import Client
+from entangle.connection import Connection
+from entangle.constants import MAX_UINT32
+from entangle.exceptions import CircuitOpenError, UnexpectedMessageError
+from entangle.message import ExceptionMessage, ResponseMessage
+from entangle.opcode import Opcode
+from .helpers import unused_address
+
+
+packer = msgpack.Packer()
+
+
+class ClientTestCase(TestCase):
+    """Test case for :class:`Client`.
+    """
+
+    def setUp(self):
+        self.client_sock, self.server_sock = socket.socketpair()
+        self.client = Client(None)
+        self.client._conn = Connection(self.client_sock)
+        self.unpacker = msgpack.Unpacker()
+
+    def tearDown(self):
+        self.client_sock.close()
+        self.server_sock.close()
+
+    def _receive_requests(self, count):
+        requests = []
+
+        while len(requests) < count:
+            self.unpacker.feed(self.server_sock.recv(4096))
+            requests.extend(self.unpacker)
+
+        return requests
+
+    def _send_response(self, message_id, result):
+        self.server_sock.sendall(packer.pack(
+            [Opcode.response.value, message_id, result, None]
+        ))
+
+    def test_pipelined_calls(self):
+        """Client._begin_call(..) and Client._end_call(..)
+        """
+
+        message_ids = [
+            self.client._begin_call('method', packer.pack([i]))
+            for i in range(3)
+        ]
+
+        requests = self._receive_requests(3)
+        self.assertEqual([r[1] for r in requests], message_ids)
+        self.assertEqual([r[3] for r in requests], [[0], [1], [2]])
+
+        # Respond out of order.
+        for message_id in reversed(message_ids):
+            self._send_response(message_id, message_id * 10)
+
+        for message_id in message_ids:
+            response = self.client._end_call(message_id)
+            self.assertIsInstance(response, ResponseMessage)
+            self.assertEqual(response.message_id, message_id)
+            self.assertEqual(response.result, message_id * 10)
+
+        with self.assertRaises(UnexpectedMessageError):
+            self.client._end_call(message_ids[0])
+
+    def test_exception_response(self):
+        """Client._call(..) with an exception response
+        """
+
+        self.server_sock.sendall(packer.pack(
+            [Opcode.exception.value, 1, 'entangle', 'BadMessage', 'Bad',
+             None]
+        ))
+        response = self.client._call('method', packer.pack([]))
+        self.assertIsInstance(response, ExceptionMessage)
+        self.assertEqual(response.name, 'BadMessage')
+
+    def test_next_message_id_skips_in_flight(self):
+        """Client._next_message_id() skips message IDs in flight
+        """
+
+        self.client._message_id = MAX_UINT32 - 1
+        self.client._in_flight.update([MAX_UINT32, 0, 1])
+        self.assertEqual(self.client._next_message_id(), 2)
+
+    def test_call_many(self):
+        """Client._call_many(..)
+        """
+
+        for message_id in [3, 1, 2]:
+            self._send_response(message_id, message_id * 10)
+
+        responses = self.client._call_many([
+            ('method', packer.pack([i])) for i in range(3)
+        ])
+
+        self.assertEqual([r.message_id for r in responses], [1, 2, 3])
+        self.assertEqual([r.result for r in responses], [10, 20, 30])
+
+        requests = self._receive_requests(3)
+        self.assertEqual([r[3] for r in requests], [[0], [1], [2]])
+        self.assertEqual(self.client._in_flight, set())
+
+
+class ClientConnectTestCase(TestCase):
+    """Test case for :meth:`Client._connect`.
+    """
+
+    def setUp(self):
+        self.address = unused_address()
+
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        self.client = Client(self.address,
+                             reconnect_limit=2,
+                             backoff=0.02,
+                             circuit_breaker=self.breaker)
+
+    def test_backoff(self):
+        """Client._connect(..) backs off between retries
+        """
+
+        delays = []
+        self.client._backoff_delay = \
+            lambda retry: delays.append(retry) or 0
+
+        with self.assertRaises(socket.error):
+            self.client._connect()
+        self.assertEqual(delays, [0, 1])
+
+        client = Client(self.address, backoff=0.1, max_backoff=0.3)
+        for retry in range(5):
+            delay = client._backoff_delay(retry)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(0.1 * 2 ** retry, 0.3))
+
+    def test_circuit_breaker(self):
+        """Client._connect(..) fails fast while the circuit breaker is open
+        """
+
+        for _ in range(2):
+            with self.assertRaises(socket.error):
+                self.client._call('method', packer.pack([]))
+        self.assertIs(self.client.circuit_breaker.state, CircuitState.open)
+
+        start = time.time()
+        with self.assertRaises(CircuitOpenError):
+            self.client._call('method', packer.pack([]))
+        self.assertLess(time.time() - start, 0.01)
+
+        # The trial connect fails, opening the breaker again.
+        time.sleep(0.25)
+        with self.assertRaises(socket.error):
+            self.client._call('method', packer.pack([]))
+        with self.assertRaises(CircuitOpenError):
+            self.client._call('method', packer.pack([]))
+
+        # Clients share the breaker of an address by default.
+        self.assertIs(Client(self.address).circuit_breaker,
+                      Client(self.address).circuit_breaker)
+        self.assertIsNot(Client(self.address).circuit_breaker, self.breaker)
+
+        # Addresses may be given as lists.
+        self.assertIs(Client(list(self.address)).circuit_breaker,
+                      Client(self.address).circuit_breaker)
+        client = BalancedClient([list(self.address)])
+        self.assertIs(client._backends[0].client.circuit_breaker,
+                      Client(self.address).circuit_breaker)
+
+    def test_circuit_breaker_trial(self):
+        """Client._connect(..) ends a trial connect failing unexpectedly
+        """
+
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(8)
+
+        try:
+            # Setting up the connection fails on an unknown option.
+            breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+            client = Client(sock.getsockname(),
+                            circuit_breaker=breaker,
+                            unknown_option=True)
+
+            for _ in range(2):
+                with self.assertRaises(TypeError):
+                    client._connect()
+                self.assertIs(breaker.state, CircuitState.open)
+                time.sleep(0.1)
+        finally:
+            sock.close()
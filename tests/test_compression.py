@@ -0,0 +1,87 @@
+import os
+from unittest import TestCase
+from entangle.compression import AdaptiveCompression, codecs
+from entangle.compression_method import CompressionMethod
+from entangle.exceptions import BadMessageError
+
+
+class CodecTestCase(TestCase):
+    """Test case for the registered codecs.
+    """
+
+    def test_round_trip(self):
+        """Codec.compress(..) and Codec.decompress(..)
+        """
+
+        data = b'entangle' * 1000
+
+        for method, codec in codecs.items():
+            compressed = codec.compress(data)
+            self.assertLess(len(compressed), len(data))
+            self.assertEqual(codec.decompress(compressed), data)
+
+    def test_invalid_data(self):
+        """Codec.decompress(..) with invalid data
+        """
+
+        for method, codec in codecs.items():
+            with self.assertRaises(codec.errors):
+                codec.decompress(b'\xff' * 64)
+
+    def test_max_size(self):
+        """Codec.decompress(..) with a maximum size
+        """
+
+        data = b'entangle' * 1000
+
+        for method, codec in codecs.items():
+            compressed = codec.compress(data)
+            self.assertEqual(codec.decompress(compressed, len(data)), data)
+            with self.assertRaises(BadMessageError):
+                codec.decompress(compressed, len(data) - 1)
+
+
+class AdaptiveCompressionTestCase(TestCase):
+    """Test case for :class:`AdaptiveCompression`.
+    """
+
+    def test_samples_all_candidates(self):
+        """AdaptiveCompression.select(..) samples every candidate first
+        """
+
+        adaptive = AdaptiveCompression(methods=[CompressionMethod.snappy,
+                                                CompressionMethod.zlib])
+        selected = []
+
+        for _ in range(3):
+            method, _ = adaptive.compress('method', b'entangle' * 1000)
+            selected.append(method)
+
+        self.assertEqual(selected, [None,
+                                    CompressionMethod.snappy,
+                                    CompressionMethod.zlib])
+
+    def test_incompressible(self):
+        """AdaptiveCompression.select(..) with incompressible data
+        """
+
+        adaptive = AdaptiveCompression(sample_interval=1000)
+        data = os.urandom(65536)
+
+        for _ in range(10):
+            adaptive.compress('method', data)
+
+        self.assertIsNone(adaptive.select('method'))
+
+    def test_compressible(self):
+        """AdaptiveCompression.select(..) with compressible data
+        """
+
+        adaptive = AdaptiveCompression(bandwidth=1000000,
+                                       sample_interval=1000)
+        data = b'entangle' * 10000
+
+        for _ in range(10):
+            adaptive.compress('method', data)
+
+        self.assertIsNotNone(adaptive.select('method'))
@@ -0,0 +1,387 @@
+import msgpack
+import snappy
+import socket
+import threading
+from unittest import TestCase
+from entangle import connection
+from entangle.compression_method import CompressionMethod
+from entangle.compression import codecs
+from entangle.connection import (
+    Connection,
+    MIN_RECEIVE_BUFFER_SIZE,
+    OVERSIZE_MESSAGE_SIZE,
+)
+from entangle.exceptions import BadMessageError, ConnectionLostError
+from entangle.headers import pack_message_id, pack_prefix
+from entangle.message import RequestMessage, NotificationMessage
+from entangle.opcode import Opcode
+
+
+packer = msgpack.Packer()
+
+
+class ConnectionTestCase(TestCase):
+    """Test case for :class:`Connection`.
+    """
+
+    def setUp(self):
+        self.sock, self.peer_sock = socket.socketpair()
+
+    def tearDown(self):
+        self.sock.close()
+        self.peer_sock.close()
+
+    def _receive_raw(self):
+        unpacker = msgpack.Unpacker()
+
+        while True:
+            unpacker.feed(self.peer_sock.recv(65536))
+            try:
+                return unpacker.unpack()
+            except msgpack.OutOfData:
+                pass
+
+    def test_compression(self):
+        """Connection.send_request(..) with compression
+        """
+
+        conn = Connection(self.sock, compression_threshold=1024)
+        peer = Connection(self.peer_sock)
+        arguments = ['x' * 4096]
+
+        conn.send_request(1, 'method', packer.pack(arguments))
+        message = peer.receive()
+        self.assertIsInstance(message, RequestMessage)
+        self.assertEqual(message.message_id, 1)
+        self.assertEqual(message.method, 'method')
+        self.assertEqual(message.arguments, arguments)
+
+        stats = conn.compression_statistics
+        self.assertEqual(stats.messages, 1)
+        self.assertEqual(stats.compressed_messages, 1)
+        self.assertGreater(stats.bytes_saved, 3000)
+
+        conn.send_notification(2, 'method', packer.pack(arguments))
+        message = peer.receive()
+        self.assertIsInstance(message, NotificationMessage)
+        self.assertEqual(message.arguments, arguments)
+
+    def test_compression_envelope(self):
+        """Connection.send_request(..) compressed message envelope
+        """
+
+        conn = Connection(self.sock, compression_threshold=1024)
+        conn.send_request(1, 'method', packer.pack(['x' * 4096]))
+
+        ser = self._receive_raw()
+        self.assertEqual(ser[:3], [Opcode.compressed_message.value,
+                                   1,
+                                   CompressionMethod.snappy.value])
+        self.assertEqual(
+            msgpack.unpackb(snappy.uncompress(ser[3])),
+            [Opcode.request.value, 1, 'method', ['x' * 4096], False]
+        )
+
+    def test_compression_threshold(self):
+        """Connection.send_request(..) below the compression threshold
+        """
+
+        conn = Connection(self.sock, compression_threshold=1024)
+        conn.send_request(1, 'method', packer.pack(['x' * 100]))
+
+        self.assertEqual(self._receive_raw()[0], Opcode.request.value)
+        self.assertEqual(conn.compression_statistics.messages, 0)
+
+    def test_compression_methods(self):
+        """Connection.send_request(..) with every compression method
+        """
+
+        peer = Connection(self.peer_sock)
+        arguments = ['x' * 4096]
+
+        for message_id, method in enumerate(CompressionMethod):
+            conn = Connection(self.sock,
+                              compression_threshold=1024,
+                              compression_method=method)
+            conn.send_request(message_id, 'method', packer.pack(arguments))
+
+            message = peer.receive()
+            self.assertEqual(message.message_id, message_id)
+            self.assertEqual(message.arguments, arguments)
+            self.assertEqual(conn.compression_statistics.compressed_messages,
+                             1)
+
+    def test_bad_compressed_message(self):
+        """Connection.receive() with a bad compressed message
+        """
+
+        peer = Connection(self.peer_sock)
+
+        for ser in [
+                [Opcode.compressed_message.value, 1, 0x7f, b'data'],
+                [Opcode.compressed_message.value, 1,
+                 CompressionMethod.zlib.value, b'data'],
+        ]:
+            self.sock.sendall(packer.pack(ser))
+            with self.assertRaises(BadMessageError):
+                peer.receive()
+
+    def test_max_message_size(self):
+        """Connection.receive() with a maximum message size
+        """
+
+        conn = Connection(self.sock)
+        peer = Connection(self.peer_sock, max_message_size=1024)
+
+        conn.send_request(1, 'method', packer.pack(['x' * 100]))
+        self.assertEqual(peer.receive().arguments, ['x' * 100])
+
+        thread = threading.Thread(target=lambda: conn.send_request(
+            2, 'method', packer.pack(['x' * 100000])
+        ))
+        thread.start()
+        try:
+            with self.assertRaises(BadMessageError):
+                peer.receive()
+        finally:
+            self.peer_sock.close()
+            thread.join()
+
+    def test_max_message_size_pipelined(self):
+        """Connection.receive_available() with a maximum message size
+        """
+
+        for lazy in (False, True, ):
+            sock, peer_sock = socket.socketpair()
+            conn = Connection(sock)
+            peer = Connection(peer_sock, max_message_size=4096, lazy=lazy)
+
+            try:
+                # Far more than the maximum message size at once, in messages
+                # within it.
+                conn.send_requests([
+                    (i, 'method', packer.pack(['x' * 50]), False)
+                    for i in range(200)
+                ])
+
+                messages = []
+                while len(messages) < 200:
+                    messages.extend(peer.receive_available())
+
+                self.assertEqual([m.message_id for m in messages],
+                                 list(range(200)))
+                self.assertEqual(messages[-1].arguments, ['x' * 50])
+
+                conn.send_request(200, 'method', packer.pack(['x' * 5000]))
+                with self.assertRaises(BadMessageError):
+                    while not peer.receive_available():
+                        pass
+            finally:
+                sock.close()
+                peer_sock.close()
+
+    def test_max_decompressed_size(self):
+        """Connection.receive() with a maximum decompressed size
+        """
+
+        for method in codecs:
+            sock, peer_sock = socket.socketpair()
+            conn = Connection(sock,
+                              compression_threshold=0,
+                              compression_method=method)
+            peer = Connection(peer_sock, max_decompressed_size=1024)
+
+            try:
+                conn.send_request(1, 'method', packer.pack(['x' * 1000]))
+                self.assertEqual(peer.receive().arguments, ['x' * 1000])
+
+                conn.send_request(2, 'method', packer.pack(['x' * 10000]))
+                with self.assertRaises(BadMessageError):
+                    peer.receive()
+            finally:
+                sock.close()
+                peer_sock.close()
+
+    def test_oversize_message(self):
+        """Connection.receive() replaces the unpacker after oversize messages
+        """
+
+        conn = Connection(self.sock)
+        peer = Connection(self.peer_sock)
+        unpacker = peer._unpacker
+        arguments = [b'x' * OVERSIZE_MESSAGE_SIZE]
+
+        thread = threading.Thread(target=lambda: conn.send_requests([
+            (1, 'method', packer.pack(arguments), False),
+            (2, 'method', packer.pack([]), False),
+        ]))
+        thread.start()
+        self.assertEqual(peer.receive().arguments, arguments)
+        thread.join()
+
+        self.assertIsNot(peer._unpacker, unpacker)
+        self.assertEqual(peer.receive().message_id, 2)
+
+    def test_send_partial_writes(self):
+        """Connection.send_request(..) with partial writes
+        """
+
+        class PartialSocket(object):
+            def __init__(self):
+                self.data = b''
+
+            def send(self, data):
+                sent = min(len(data), 1000)
+                self.data += bytes(data[:sent])
+                return sent
+
+        sock = PartialSocket()
+        conn = Connection(sock)
+        arguments = [b'x' * 10000, b'y' * 5000]
+
+        conn.send_request(1, 'method', packer.pack(arguments))
+        conn.send_notification(2, 'method', packer.pack(arguments))
+
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(sock.data)
+        self.assertEqual(list(unpacker), [
+            [Opcode.request.value, 1, 'method', arguments, False],
+            [Opcode.notification.value, 2, 'method', arguments],
+        ])
+
+    def test_send_large_request(self):
+        """Connection.send_request(..) with a large request
+        """
+
+        conn = Connection(self.sock)
+        peer = Connection(self.peer_sock)
+        arguments = [b'x' * (8 << 20)]
+        received = []
+
+        thread = threading.Thread(target=lambda: received.append(
+            peer.receive()
+        ))
+        thread.start()
+        conn.send_request(1, 'method', packer.pack(arguments))
+        thread.join()
+
+        self.assertEqual(received[0].arguments, arguments)
+
+    def test_receive_buffer(self):
+        """Connection.receive() receive buffer sizing
+        """
+
+        conn = Connection(self.sock)
+        peer = Connection(self.peer_sock)
+        arguments = [b'x' * (10 << 20)]
+        received = []
+
+        thread = threading.Thread(target=lambda: received.append(
+            peer.receive()
+        ))
+        thread.start()
+        conn.send_request(1, 'method', packer.pack(arguments))
+        thread.join()
+
+        self.assertEqual(received[0].arguments, arguments)
+
+        stats = peer.receive_statistics
+        self.assertEqual(stats.messages, 1)
+        self.assertEqual(stats.bytes, len(b''.join([
+            pack_prefix(Opcode.request),
+            pack_message_id(1),
+            packer.pack('method'),
+            packer.pack(arguments),
+            packer.pack(False),
+        ])))
+        self.assertLess(stats.syscalls, 500)
+        self.assertGreater(stats.buffer_size, MIN_RECEIVE_BUFFER_SIZE)
+
+        # Small messages shrink the buffer again.
+        for message_id in range(60):
+            conn.send_request(message_id, 'method', packer.pack([]))
+            peer.receive()
+
+        self.assertEqual(stats.buffer_size, MIN_RECEIVE_BUFFER_SIZE)
+
+    def test_receive_many(self):
+        """Connection.receive_many()
+        """
+
+        conn = Connection(self.sock)
+        peer = Connection(self.peer_sock)
+
+        conn.send_requests([(i, 'method', packer.pack([i]), False)
+                            for i in range(10)])
+
+        messages = []
+        while len(messages) < 10:
+            messages.extend(peer.receive_many())
+
+        self.assertEqual([m.message_id for m in messages], list(range(10)))
+        self.assertLessEqual(peer.receive_statistics.syscalls, 2)
+
+    def test_receive_available(self):
+        """Connection.receive_available()
+        """
+
+        conn = Connection(self.sock)
+        peer = Connection(self.peer_sock)
+
+        self.assertEqual(peer.receive_available(), [])
+
+        for i in range(5):
+            conn.send_notification(i, 'method', packer.pack([i]))
+
+        messages = peer.receive_available()
+        self.assertEqual([m.message_id for m in messages], list(range(5)))
+        self.assertIsNone(self.peer_sock.gettimeout())
+
+        # Messages received before the connection was lost are returned.
+        conn.send_notification(5, 'method', packer.pack([5]))
+        self.sock.close()
+        messages = peer.receive_available()
+        self.assertEqual([m.message_id for m in messages], [5])
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionLostError):
+                peer.receive_available()
+
+    def test_receive_available_limit(self):
+        """Connection.receive_available() leaves a flood for the next call
+        """
+
+        conn = Connection(self.sock)
+        peer = Connection(self.peer_sock)
+
+        for i in range(20):
+            conn.send_notification(i, 'method', packer.pack([b'x' * 1000]))
+
+        limit = connection.MAX_RECEIVE_AVAILABLE_SIZE
+        connection.MAX_RECEIVE_AVAILABLE_SIZE = MIN_RECEIVE_BUFFER_SIZE
+        try:
+            messages = peer.receive_available()
+            self.assertLess(len(messages), 20)
+
+            while len(messages) < 20:
+                received = peer.receive_available()
+                self.assertTrue(received)
+                messages.extend(received)
+        finally:
+            connection.MAX_RECEIVE_AVAILABLE_SIZE = limit
+
+        self.assertEqual([m.message_id for m in messages], list(range(20)))
+
+    def test_iter_messages(self):
+        """Connection.iter_messages()
+        """
+
+        conn = Connection(self.sock)
+        peer = Connection(self.peer_sock)
+
+        for i in range(3):
+            conn.send_notification(i, 'method', packer.pack([i]))
+
+        messages = peer.iter_messages()
+        self.assertEqual([next(messages).message_id for _ in range(3)],
+                         [0, 1, 2])
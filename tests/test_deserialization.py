@@ -17,6 +17,9 @@ from entangle.deserialization import (
     deserialize_bool,
     deserialize_float32,
     deserialize_float64,
+    deserialize_int16_list,
+    deserialize_uint32_list,
+    deserialize_float64_list,
 )
 from entangle.exceptions import DeserializationError
 
@@ -349,3 +352,50 @@ class DeserializeFloat64TestCase(TestCase):
         ]:
             with self.assertRaises(DeserializationError):
                 deserialize_float64(ser)
+
+
+class DeserializeIntegerListTestCase(TestCase):
+    """Test case for the integer list deserializers.
+    """
+
+    def test_deserialize_integer_list(self):
+        """deserialize_int*_list(..) and deserialize_uint*_list(..)
+        """
+
+        for deserialize, ser, expected in [
+                (deserialize_int16_list, [], []),
+                (deserialize_int16_list, [MIN_INT16, MAX_INT16],
+                 [MIN_INT16, MAX_INT16]),
+                (deserialize_uint32_list, (0, MAX_UINT32), [0, MAX_UINT32]),
+        ]:
+            actual = deserialize(ser)
+            self.assertEqual(actual, expected)
+
+        for deserialize, ser in [
+                (deserialize_int16_list, None),
+                (deserialize_int16_list, [MAX_INT16 + 1]),
+                (deserialize_int16_list, ['1']),
+                (deserialize_uint32_list, [-1]),
+                (deserialize_uint32_list, [1, MAX_UINT32 + 1]),
+        ]:
+            with self.assertRaises(DeserializationError):
+                deserialize(ser)
+
+
+class DeserializeFloatListTestCase(TestCase):
+    """Test case for the floating point number list deserializers.
+    """
+
+    def test_deserialize_float_list(self):
+        """deserialize_float64_list(..)
+        """
+
+        self.assertEqual(deserialize_float64_list([0.5, 1.5]), [0.5, 1.5])
+
+        for ser in [
+                None,
+                [0.5, 1],
+                [None],
+        ]:
+            with self.assertRaises(DeserializationError):
+                deserialize_float64_list(ser)
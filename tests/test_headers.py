@@ -0,0 +1,52 @@
+import msgpack
+from unittest import TestCase
+from entangle.headers import HeaderCache, pack_message_id, pack_prefix
+from entangle.opcode import Opcode
+
+
+class HeadersTestCase(TestCase):
+    """Test case for pre-encoded message headers.
+    """
+
+    def test_pack_message_id(self):
+        """pack_message_id(..)
+        """
+
+        for message_id in [0, 1, 127, 1 << 16, 0xffffffff]:
+            packed = pack_message_id(message_id)
+            self.assertEqual(len(packed), 5)
+            self.assertEqual(msgpack.unpackb(packed), message_id)
+
+        self.assertEqual(msgpack.unpackb(pack_message_id(1 << 40)), 1 << 40)
+
+    def test_pack_prefix(self):
+        """pack_prefix(..)
+        """
+
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(pack_prefix(Opcode.request))
+        self.assertEqual(unpacker.read_array_header(), 5)
+        self.assertEqual(unpacker.unpack(), Opcode.request.value)
+
+    def test_header_cache(self):
+        """HeaderCache.get(..)
+        """
+
+        cache = HeaderCache(max_size=2)
+
+        prefix, packed_method = cache.get(Opcode.request, 'a')
+        self.assertEqual(prefix, pack_prefix(Opcode.request))
+        self.assertEqual(packed_method, msgpack.packb('a'))
+        self.assertIs(cache.get(Opcode.request, 'a')[1], packed_method)
+
+        cache.get(Opcode.notification, 'a')
+        self.assertEqual(len(cache), 2)
+
+        # Least recently used headers are evicted first.
+        cache.get(Opcode.request, 'a')
+        cache.get(Opcode.request, 'b')
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get(Opcode.request, 'a')[1], packed_method)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
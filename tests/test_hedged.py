@@ -0,0 +1,67 @@
+import msgpack
+import time
+from unittest import TestCase
+from entangle.exceptions import DeadlineExceededError
+from entangle.hedged import HedgedClient
+from entangle.message import ResponseMessage
+from .helpers import DelayedServersMixin
+
+
+packer = msgpack.Packer()
+
+
+class HedgedClientTestCase(DelayedServersMixin, TestCase):
+    """Test case for :class:`HedgedClient`.
+    """
+
+    def setUp(self):
+        self._start_servers()
+        self.client = HedgedClient(self.servers[0].address,
+                                   self.servers[1].address,
+                                   min_samples=5)
+
+    def tearDown(self):
+        self.client._reset_conn()
+        self.client._hedge._reset_conn()
+        self._stop_servers()
+
+    def test_hedge(self):
+        """HedgedClient._call(..) hedges slow calls
+        """
+
+        for _ in range(5):
+            response = self.client._call('get', packer.pack([]), hedge=True)
+            self.assertEqual(response.result, 0)
+        self.assertEqual(self.client.hedged_calls, 0)
+
+        self.delays[0]['delay'] = 0.5
+
+        start = time.time()
+        response = self.client._call('get', packer.pack([]), hedge=True)
+        self.assertLess(time.time() - start, 0.4)
+        self.assertIsInstance(response, ResponseMessage)
+        self.assertEqual(response.result, 1)
+        self.assertEqual(self.client.hedged_calls, 1)
+        self.assertEqual(self.client.hedge_wins, 1)
+
+        # The late response of the slow server is discarded.
+        self.delays[0]['delay'] = 0
+        time.sleep(0.5)
+        response = self.client._call('get', packer.pack([]))
+        self.assertEqual(response.result, 0)
+
+    def test_deadline(self):
+        """HedgedClient._call(..) with a timeout
+        """
+
+        for _ in range(5):
+            self.client._call('get', packer.pack([]))
+
+        self.delays[0]['delay'] = 0.3
+        self.delays[1]['delay'] = 0.3
+
+        with self.assertRaises(DeadlineExceededError):
+            self.client._call('get',
+                              packer.pack([]),
+                              timeout=0.1,
+                              hedge=True)
@@ -0,0 +1,160 @@
+import msgpack
+import socket
+import threading
+from unittest import TestCase
+from entangle.connection import Connection
+from entangle.exceptions import BadMessageError
+from entangle.lazy import LazyValue
+from entangle.message import ResponseMessage
+from entangle.opcode import Opcode
+
+
+packer = msgpack.Packer()
+
+
+class LazyValueTestCase(TestCase):
+    """Test case for :class:`LazyValue`.
+    """
+
+    def test_value(self):
+        """LazyValue.value
+        """
+
+        value = LazyValue(packer.pack([1, 'two', {'three': 3}]))
+        self.assertFalse(value.decoded)
+        self.assertEqual(value.value, [1, 'two', {'three': 3}])
+        self.assertTrue(value.decoded)
+        self.assertEqual(value, [1, 'two', {'three': 3}])
+        self.assertEqual(list(value), [1, 'two', {'three': 3}])
+        self.assertEqual(value[1], 'two')
+
+
+class LazyConnectionTestCase(TestCase):
+    """Test case for :class:`Connection` decoding lazily.
+    """
+
+    def setUp(self):
+        self.sock, self.peer_sock = socket.socketpair()
+        self.conn = Connection(self.sock)
+        self.peer = Connection(self.peer_sock, lazy=True)
+
+    def tearDown(self):
+        self.sock.close()
+        self.peer_sock.close()
+
+    def test_request(self):
+        """Connection.receive() with lazy requests
+        """
+
+        packed_arguments = packer.pack([1, {'a': [b'x' * 100]}])
+        self.conn.send_request(1, 'method', packed_arguments)
+        self.conn.send_notification(2, 'method', packer.pack([]))
+
+        request = self.peer.receive()
+        self.assertEqual(request.method, 'method')
+        self.assertIsInstance(request.arguments, LazyValue)
+        self.assertEqual(request.arguments.raw, packed_arguments)
+        self.assertFalse(request.arguments.decoded)
+        self.assertEqual(request.arguments, [1, {'a': [b'x' * 100]}])
+
+        notification = self.peer.receive()
+        self.assertEqual(notification.message_id, 2)
+        self.assertEqual(list(notification.arguments), [])
+
+        # Arguments must still be an array.
+        self.conn.send_request(3, 'method', packer.pack({}))
+        with self.assertRaises(BadMessageError):
+            self.peer.receive()
+
+    def test_response(self):
+        """Connection.receive_response(..) with lazy results
+        """
+
+        packed_result = packer.pack({'rows': list(range(100))})
+        self.conn.send_response(1, packed_result)
+
+        response = self.peer.receive_response(1)
+        self.assertIsInstance(response, ResponseMessage)
+        self.assertEqual(response.result.raw, packed_result)
+
+        # The packed result is passed on without being decoded.
+        self.peer.send_response(2, response.result.raw)
+        self.assertEqual(self.conn.receive_response(2).result,
+                         {'rows': list(range(100))})
+        self.assertFalse(response.result.decoded)
+
+    def test_compressed(self):
+        """Connection.receive() with lazy compressed requests
+        """
+
+        conn = Connection(self.sock, compression_threshold=0)
+        packed_arguments = packer.pack(['x' * 1000])
+        conn.send_request(1, 'method', packed_arguments)
+
+        request = self.peer.receive()
+        self.assertEqual(request.arguments.raw, packed_arguments)
+
+    def test_split(self):
+        """Connection.receive() with lazy messages received in pieces
+        """
+
+        data = packer.pack([Opcode.response.value, 1, ['x' * 10000], None])
+
+        for i in range(0, len(data), 1000):
+            self.sock.sendall(data[i:i + 1000])
+
+        self.assertEqual(self.peer.receive().result.raw,
+                         packer.pack(['x' * 10000]))
+
+    def test_pieces(self):
+        """Connection.receive() with lazy messages received byte by byte
+        """
+
+        packed_arguments = packer.pack([b'x' * 300, list(range(10))])
+        data = b''.join(
+            packer.pack([Opcode.request.value,
+                         i,
+                         'method',
+                         msgpack.unpackb(packed_arguments),
+                         False])
+            for i in range(3)
+        )
+
+        messages = []
+        for i in range(len(data)):
+            self.peer._feed(data[i:i + 1])
+            messages.extend(self.peer._unpack_buffered())
+
+        self.assertEqual([m.message_id for m in messages], [0, 1, 2])
+        for message in messages:
+            self.assertEqual(message.arguments.raw, packed_arguments)
+        self.assertEqual(len(self.peer._raw), 0)
+
+    def test_single_pass(self):
+        """Connection.receive() slices lazy values out in a single pass
+        """
+
+        # No further unpacker decodes the message again.
+        def create_unpacker(max_size=None):
+            raise AssertionError('message decoded twice')
+
+        self.peer._create_unpacker = create_unpacker
+
+        packed_result = packer.pack([b'x' * 100000])
+
+        def send():
+            for i in range(50):
+                self.conn.send_response(i, packed_result)
+
+        thread = threading.Thread(target=send)
+        thread.start()
+        self.addCleanup(thread.join)
+
+        for i in range(50):
+            response = self.peer.receive()
+            self.assertEqual(response.message_id, i)
+            self.assertEqual(response.result.raw, packed_result)
+
+            # Received data is kept only up to twice what is left unpacked.
+            self.assertLessEqual(len(self.peer._raw),
+                                 2 * self.peer._buffered_size())
@@ -0,0 +1,93 @@
+import msgpack
+import socket
+from unittest import TestCase, skipIf
+from entangle.connection import Connection
+from entangle.deserialization import deserialize_int32_list
+from entangle.exceptions import DeserializationError, PackingError
+from entangle.ndarray import ext_hook, numpy, pack_ndarray
+from entangle.packing import pack_float32_list, pack_int32_list
+
+
+packer = msgpack.Packer()
+
+
+@skipIf(numpy is None, 'NumPy is not available')
+class NdarrayTestCase(TestCase):
+    """Test case for NumPy array support.
+    """
+
+    def _unpack(self, data):
+        return msgpack.unpackb(data, ext_hook=ext_hook)
+
+    def test_round_trip(self):
+        """pack_ndarray(..) and ext_hook(..)
+        """
+
+        for x in [
+                numpy.arange(12, dtype='int32').reshape(3, 4),
+                numpy.arange(100000, dtype='<f8'),
+                numpy.arange(10, dtype='>u2')[::2],
+                numpy.zeros((0, 3), dtype='float32'),
+        ]:
+            actual = self._unpack(pack_ndarray(x))
+            self.assertEqual(actual.dtype, x.dtype)
+            self.assertEqual(actual.shape, x.shape)
+            self.assertTrue((actual == x).all())
+            self.assertFalse(actual.flags.writeable)
+
+        for dtype in ['object',
+                      'datetime64[s]',
+                      'timedelta64[s]',
+                      'U3',
+                      'V4',
+                      [('a', 'int32'), ('b', 'float64')]]:
+            with self.assertRaises(PackingError):
+                pack_ndarray(numpy.zeros(3, dtype=dtype))
+
+    def test_list_packers(self):
+        """pack_*_list(..) with NumPy arrays
+        """
+
+        x = numpy.arange(10, dtype='int32')
+        self.assertEqual(pack_int32_list(x), pack_ndarray(x))
+
+        actual = self._unpack(pack_int32_list(numpy.arange(10)))
+        self.assertEqual(actual.dtype, numpy.dtype('int32'))
+
+        for pack, x in [
+                (pack_int32_list, numpy.array([1 << 40])),
+                (pack_int32_list, numpy.array([1.0])),
+                (pack_float32_list, numpy.array([1])),
+        ]:
+            with self.assertRaises(PackingError):
+                pack(x)
+
+    def test_list_deserializers(self):
+        """deserialize_*_list(..) with NumPy arrays
+        """
+
+        x = numpy.arange(10, dtype='int32')
+        self.assertIs(deserialize_int32_list(x), x)
+
+        with self.assertRaises(DeserializationError):
+            deserialize_int32_list(numpy.array([1.0]))
+
+    def test_connection(self):
+        """Connection.receive() with NumPy array arguments
+        """
+
+        sock, peer_sock = socket.socketpair()
+        x = numpy.arange(1000, dtype='float64').reshape(10, 100)
+
+        try:
+            Connection(sock).send_request(
+                1,
+                'method',
+                packer.pack_array_header(1) + pack_ndarray(x)
+            )
+            message = Connection(peer_sock).receive()
+        finally:
+            sock.close()
+            peer_sock.close()
+
+        self.assertTrue((message.arguments[0] == x).all())
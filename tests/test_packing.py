@@ -1,4 +1,5 @@
 import msgpack
+from array import array
 from unittest import TestCase
 from entangle.constants import (
     MAX_INT8, MIN_INT8, MAX_INT16, MIN_INT16, MAX_INT32, MIN_INT32, MAX_INT64,
@@ -18,6 +19,11 @@ from entangle.packing import (
     pack_bool,
     pack_float32,
     pack_float64,
+    pack_int8_list,
+    pack_int32_list,
+    pack_uint64_list,
+    pack_float32_list,
+    pack_float64_list,
 )
 from entangle.exceptions import PackingError
 
@@ -354,3 +360,61 @@ class PackFloat64TestCase(TestCase):
         ]:
             with self.assertRaises(PackingError):
                 pack_float64(ser)
+
+
+class PackIntegerListTestCase(TestCase):
+    """Test case for the integer list packers.
+    """
+
+    def test_pack_integer_list(self):
+        """pack_int*_list(..) and pack_uint*_list(..)
+        """
+
+        for pack, ser, expected in [
+                (pack_int8_list, [], []),
+                (pack_int8_list, [MIN_INT8, 0, MAX_INT8],
+                 [MIN_INT8, 0, MAX_INT8]),
+                (pack_int32_list, (MIN_INT32, MAX_INT32),
+                 [MIN_INT32, MAX_INT32]),
+                (pack_int32_list, array('i', [1, 2]), [1, 2]),
+                (pack_uint64_list, [0, MAX_UINT64], [0, MAX_UINT64]),
+        ]:
+            actual = pack(ser)
+            self.assertEqual(actual, packer.pack(expected))
+
+        for pack, ser in [
+                (pack_int8_list, None),
+                (pack_int8_list, 1),
+                (pack_int8_list, [MAX_INT8 + 1]),
+                (pack_int8_list, [0, MIN_INT8 - 1]),
+                (pack_int32_list, [1, '1']),
+                (pack_int32_list, [1, 1.0]),
+                (pack_int32_list, [None]),
+                (pack_uint64_list, [-1]),
+                (pack_uint64_list, [MAX_UINT64 + 1]),
+        ]:
+            with self.assertRaises(PackingError):
+                pack(ser)
+
+
+class PackFloatListTestCase(TestCase):
+    """Test case for the floating point number list packers.
+    """
+
+    def test_pack_float_list(self):
+        """pack_float32_list(..) and pack_float64_list(..)
+        """
+
+        self.assertEqual(pack_float32_list([0.5, 1.5]),
+                         float_packer.pack([0.5, 1.5]))
+        self.assertEqual(pack_float64_list([0.1, 1.5]),
+                         packer.pack([0.1, 1.5]))
+
+        for pack in [pack_float32_list, pack_float64_list]:
+            for ser in [
+                    None,
+                    [0.5, 1],
+                    [0.5, '1'],
+            ]:
+                with self.assertRaises(PackingError):
+                    pack(ser)
@@ -0,0 +1,218 @@
+import msgpack
+import threading
+import time
+from unittest import TestCase
+from entangle.exceptions import (
+    DeadlineExceededError,
+    PoolExhaustedError,
+    PoolTimeoutError,
+    UnexpectedMessageError,
+)
+from entangle.pool import ConnectionPool, PooledClient
+from .helpers import start_server, stop_server
+
+
+packer = msgpack.Packer()
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(TestCase):
+    """Test case for :class:`ConnectionPool`.
+    """
+
+    def test_prewarm(self):
+        """ConnectionPool.prewarm()
+        """
+
+        pool = ConnectionPool(FakeConnection, min_size=3, max_size=5)
+        pool.prewarm()
+        self.assertEqual(pool.size, 3)
+        self.assertEqual(pool.idle, 3)
+
+    def test_reuse(self):
+        """ConnectionPool.acquire() reuses released connections
+        """
+
+        pool = ConnectionPool(FakeConnection, max_size=2)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(pool.size, 1)
+
+    def test_discard(self):
+        """ConnectionPool.discard(..)
+        """
+
+        pool = ConnectionPool(FakeConnection, max_size=1)
+        conn = pool.acquire()
+        pool.discard(conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.size, 0)
+        self.assertIsNot(pool.acquire(), conn)
+
+    def test_wait_timeout(self):
+        """ConnectionPool.acquire() times out when the pool is exhausted
+        """
+
+        pool = ConnectionPool(FakeConnection, max_size=1, wait_timeout=0.01)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+
+    def test_max_waiters(self):
+        """ConnectionPool.acquire() limits the number of waiters
+        """
+
+        pool = ConnectionPool(FakeConnection, max_size=1, max_waiters=1)
+        conn = pool.acquire()
+        acquired = []
+
+        waiter = threading.Thread(target=lambda: acquired.append(
+            pool.acquire()
+        ))
+        waiter.start()
+
+        while pool._waiters == 0:
+            time.sleep(0.001)
+
+        with self.assertRaises(PoolExhaustedError):
+            pool.acquire()
+
+        pool.release(conn)
+        waiter.join()
+        self.assertEqual(acquired, [conn])
+
+    def test_idle_eviction(self):
+        """ConnectionPool.acquire() evicts idle connections
+        """
+
+        pool = ConnectionPool(FakeConnection,
+                              min_size=1,
+                              max_size=3,
+                              idle_timeout=0.01)
+        conns = [pool.acquire() for _ in range(3)]
+        for conn in conns:
+            pool.release(conn)
+
+        time.sleep(0.02)
+
+        conn = pool.acquire()
+        self.assertEqual(pool.size, 1)
+        self.assertIs(conn, conns[2])
+        self.assertTrue(conns[0].closed)
+        self.assertTrue(conns[1].closed)
+
+
+class PooledClientTestCase(TestCase):
+    """Test case for :class:`PooledClient`.
+    """
+
+    def setUp(self):
+        self.server, self.thread = start_server()
+
+        @self.server.method('echo')
+        def echo(x):
+            return x
+
+        @self.server.method('sleep')
+        def sleep(t):
+            time.sleep(t)
+
+        @self.server.method('count', stream=True)
+        def count(n):
+            return iter(range(n))
+
+        self.client = PooledClient(self.server.address, max_size=4)
+
+    def tearDown(self):
+        self.client.close()
+        stop_server(self.server, self.thread)
+
+    def test_pipelined_calls(self):
+        """PooledClient._begin_call(..) and PooledClient._end_call(..)
+        """
+
+        # Calls pipelined by a thread share a pooled connection.
+        message_ids = [self.client._begin_call('echo', packer.pack([i]))
+                       for i in range(10)]
+        self.assertEqual(self.client._pool.size, 1)
+
+        # Other threads pipeline on connections of their own.
+        results = []
+
+        def call():
+            message_id = self.client._begin_call('echo', packer.pack([-1]))
+            results.append(self.client._end_call(message_id).result)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        thread.join()
+        self.assertEqual(results, [-1])
+        self.assertEqual(self.client._pool.size, 2)
+
+        for i, message_id in reversed(list(enumerate(message_ids))):
+            self.assertEqual(self.client._pool.idle, 1)
+            self.assertEqual(self.client._end_call(message_id).result, i)
+        self.assertEqual(self.client._pool.idle, 2)
+
+        with self.assertRaises(UnexpectedMessageError):
+            self.client._end_call(message_ids[0])
+
+        message_id = self.client._begin_call('echo',
+                                             packer.pack([1]),
+                                             timeout=1)
+        self.assertEqual(self.client._end_call(message_id).result, 1)
+
+        # The connection of an expired call is discarded once the thread's
+        # calls have all been ended.
+        slow = self.client._begin_call('sleep', packer.pack([0.2]),
+                                       timeout=0.05)
+        message_id = self.client._begin_call('echo', packer.pack([2]))
+        with self.assertRaises(DeadlineExceededError):
+            self.client._end_call(slow)
+        self.assertEqual(self.client._pool.size, 2)
+        self.assertEqual(self.client._end_call(message_id).result, 2)
+        self.assertEqual(self.client._pool.size, 1)
+
+    def test_call_stream(self):
+        """PooledClient._call_stream(..) from many threads
+        """
+
+        results = []
+
+        def call_stream(n):
+            results.append([response.chunk for response in
+                            self.client._call_stream('count',
+                                                     packer.pack([n]),
+                                                     window=4)])
+
+        threads = [threading.Thread(target=call_stream, args=(100 + i, ))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results, key=len),
+                         [list(range(100 + i)) for i in range(8)])
+        self.assertEqual(self.client._pool.idle, self.client._pool.size)
+
+        # Closing a stream early cancels it, returning the connection.
+        stream = self.client._call_stream('count', packer.pack([1000]))
+        self.assertEqual(next(stream).chunk, 0)
+        stream.close()
+        self.assertEqual(self.client._pool.idle, self.client._pool.size)
+
+        self.assertEqual(
+            [response.chunk for response in
+             self.client._call_stream('count', packer.pack([3]))],
+            [0, 1, 2]
+        )
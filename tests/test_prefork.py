@@ -0,0 +1,135 @@
+import msgpack
+import os
+import signal
+import threading
+import time
+from unittest import TestCase
+from entangle.client import Client
+from entangle.prefork import PreforkServer
+
+
+packer = msgpack.Packer()
+
+
+def _retrying(connect):
+    def retrying_connect():
+        deadline = time.time() + 5
+        while True:
+            try:
+                return connect()
+            except ConnectionRefusedError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.01)
+
+    return retrying_connect
+
+
+class PreforkServerTestCase(TestCase):
+    """Test case for :class:`PreforkServer`.
+    """
+
+    def setUp(self):
+        self.server = PreforkServer(('127.0.0.1', 0),
+                                    processes=2,
+                                    drain_timeout=5.0,
+                                    stats_interval=0.05)
+        self.server.register('pid', os.getpid)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={'install_signal_handlers': False, 'poll_interval': 0.05}
+        )
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.close()
+
+    def _call_pid(self):
+        # Workers may still be starting up.
+        client = Client(self.server.address)
+        client._connect = _retrying(client._connect)
+        try:
+            return client._call('pid', packer.pack([])).result
+        finally:
+            client._reset_conn()
+
+    def _wait_for(self, condition):
+        deadline = time.time() + 5
+        while not condition():
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+
+    def test_serve(self):
+        """PreforkServer serving from worker processes
+        """
+
+        pids = set(self._call_pid() for _ in range(20))
+        self.assertTrue(pids)
+        self.assertNotIn(os.getpid(), pids)
+        self.assertTrue(pids <= set(self.server._workers))
+
+        self._wait_for(lambda: self.server.statistics().requests == 20)
+
+    def test_restart(self):
+        """PreforkServer restarts workers
+        """
+
+        pid = self._call_pid()
+        os.kill(pid, signal.SIGKILL)
+
+        self._wait_for(lambda: len(self.server._workers) == 2 and
+                       pid not in self.server._workers)
+        self.assertNotEqual(self._call_pid(), pid)
+
+
+class _FailingPreforkServer(PreforkServer):
+    """Pre-fork server whose workers fail at startup.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_FailingPreforkServer, self).__init__(*args, **kwargs)
+        self.spawned = []
+
+    def _spawn(self, index):
+        self.spawned.append(time.time())
+        super(_FailingPreforkServer, self)._spawn(index)
+
+    def _run_worker(self, stats_fd):
+        raise RuntimeError('startup failed')
+
+
+class PreforkServerRestartTestCase(TestCase):
+    """Test case for :class:`PreforkServer` restarting failing workers.
+    """
+
+    def test_restart_backoff(self):
+        """PreforkServer backs off restarting workers failing at startup
+        """
+
+        server = _FailingPreforkServer(('127.0.0.1', 0),
+                                       processes=1,
+                                       drain_timeout=5.0,
+                                       restart_backoff=0.1,
+                                       max_restart_backoff=0.4)
+        thread = threading.Thread(
+            target=server.serve_forever,
+            kwargs={'install_signal_handlers': False, 'poll_interval': 0.01}
+        )
+        thread.start()
+
+        try:
+            time.sleep(1.0)
+        finally:
+            server.shutdown()
+            thread.join()
+            server.close()
+
+        # Restarts are 0.1, 0.2, 0.4 and 0.4 seconds apart at most.
+        spawned = server.spawned
+        self.assertGreaterEqual(len(spawned), 2)
+        self.assertLessEqual(len(spawned), 5)
+        delays = [b - a for a, b in zip(spawned, spawned[1:])]
+        self.assertGreaterEqual(delays[0], 0.1)
+        self.assertGreaterEqual(delays[-1], 0.2)
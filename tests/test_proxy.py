@@ -0,0 +1,156 @@
+import asyncio
+import msgpack
+from unittest import IsolatedAsyncioTestCase
+from entangle.async_client import AsyncClient
+from entangle.async_server import AsyncServer
+from entangle.circuit import CircuitState
+from entangle.client import Client
+from entangle.message import ExceptionMessage, ResponseMessage
+from entangle.proxy import Proxy
+from .helpers import start_server, stop_server, unused_address
+
+
+packer = msgpack.Packer()
+
+
+class ProxyTestCase(IsolatedAsyncioTestCase):
+    """Test case for :class:`Proxy`.
+    """
+
+    async def asyncSetUp(self):
+        self.backend, self.backend_thread = start_server()
+
+        @self.backend.method('echo')
+        def echo(x):
+            return x
+
+        @self.backend.method('count', stream=True)
+        def count(n):
+            return iter(range(n))
+
+        self.unavailable_address = unused_address()
+
+        self.proxy = Proxy({
+            'echo': self.backend.address,
+            'count': self.backend.address,
+            'unavailable': self.unavailable_address,
+        })
+        await self.proxy.start(('127.0.0.1', 0))
+        self.address = self.proxy.sockets[0].getsockname()[:2]
+        self.client = AsyncClient(self.address)
+
+    async def asyncTearDown(self):
+        self.client.close()
+        self.proxy.close()
+        await self.proxy.wait_closed()
+        stop_server(self.backend, self.backend_thread)
+
+    async def test_call(self):
+        """Proxy request forwarding
+        """
+
+        responses = await asyncio.gather(*[
+            self.client._call('echo', packer.pack([[i, b'x' * i]]))
+            for i in range(100)
+        ])
+
+        for i, response in enumerate(responses):
+            self.assertIsInstance(response, ResponseMessage)
+            self.assertEqual(response.result, [i, b'x' * i])
+
+        for method, name in [
+                ('unknown', 'UnknownMethod'),
+                ('unavailable', 'BackendUnavailable'),
+        ]:
+            response = await self.client._call(method, packer.pack([]))
+            self.assertIsInstance(response, ExceptionMessage)
+            self.assertEqual(response.name, name)
+
+        # Calls to a backend failing to connect fail fast once its circuit
+        # breaker opens.
+        backend = self.proxy._backends[self.unavailable_address]
+        backend._backoff = 0
+        for _ in range(5):
+            response = await self.client._call('unavailable', packer.pack([]))
+            self.assertEqual(response.name, 'BackendUnavailable')
+        self.assertIs(backend._breaker.state, CircuitState.open)
+        self.assertIn('circuit breaker', response.description)
+
+    async def test_stream(self):
+        """Proxy stream relaying
+        """
+
+        def call_stream():
+            client = Client(self.address)
+            try:
+                return [response.chunk for response in
+                        client._call_stream('count',
+                                            packer.pack([100]),
+                                            window=4)]
+            finally:
+                client._reset_conn()
+
+        chunks = await asyncio.get_event_loop().run_in_executor(None,
+                                                                call_stream)
+        self.assertEqual(chunks, list(range(100)))
+
+
+class AsyncBackendProxyTestCase(IsolatedAsyncioTestCase):
+    """Test case for :class:`Proxy` with an :class:`AsyncServer` backend.
+    """
+
+    async def asyncSetUp(self):
+        self.backend = AsyncServer()
+
+        @self.backend.method('echo')
+        def echo(x):
+            return x
+
+        @self.backend.method('sleep')
+        async def sleep(seconds):
+            await asyncio.sleep(seconds)
+            return seconds
+
+        await self.backend.start(('127.0.0.1', 0))
+        backend_address = self.backend.sockets[0].getsockname()[:2]
+
+        self.proxy = Proxy({
+            'echo': backend_address,
+            'sleep': backend_address,
+        })
+        await self.proxy.start(('127.0.0.1', 0))
+        self.address = self.proxy.sockets[0].getsockname()[:2]
+
+    async def asyncTearDown(self):
+        self.proxy.close()
+        await self.proxy.wait_closed()
+        self.backend.close()
+        await self.backend.wait_closed()
+
+    async def test_client_disconnect(self):
+        """Proxy with a client disconnecting with a request in flight
+        """
+
+        client = AsyncClient(self.address)
+        other_client = AsyncClient(self.address)
+
+        try:
+            response = await other_client._call('echo', packer.pack([1]))
+            self.assertEqual(response.result, 1)
+
+            call = asyncio.ensure_future(
+                client._call('sleep', packer.pack([0.2]))
+            )
+            await asyncio.sleep(0.05)
+            client.close()
+            with self.assertRaises(Exception):
+                await call
+
+            # The connection to the backend shared with the other client
+            # survives.
+            response = await other_client._call('sleep', packer.pack([0.3]))
+            self.assertIsInstance(response, ResponseMessage)
+            self.assertEqual(response.result, 0.3)
+        finally:
+            client.close()
+            other_client.close()
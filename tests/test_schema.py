@@ -0,0 +1,127 @@
+import msgpack
+from unittest import TestCase
+from entangle.constants import MAX_INT32, MAX_UINT8
+from entangle.exceptions import DeserializationError, PackingError
+from entangle.schema import compile_schema
+from entangle.types import Enum
+
+
+packer = msgpack.Packer()
+float_packer = msgpack.Packer(use_single_float=True)
+
+
+class Color(Enum):
+    red = 1
+    green = 2
+
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __eq__(self, other):
+        return (self.x, self.y) == (other.x, other.y)
+
+
+class Record(object):
+    def __init__(self, id, name, color, point, ratio):
+        self.id = id
+        self.name = name
+        self.color = color
+        self.point = point
+        self.ratio = ratio
+
+    def __eq__(self, other):
+        return self.__dict__ == other.__dict__
+
+
+point_schema = compile_schema([('x', 'float32'), ('y', 'float32')], Point)
+record_schema = compile_schema([
+    ('id', 'int32'),
+    ('name', 'string'),
+    ('color', Color),
+    ('point', point_schema),
+    ('ratio', 'float64'),
+], Record)
+
+
+class SchemaTestCase(TestCase):
+    """Test case for :class:`Schema`.
+    """
+
+    def test_cache(self):
+        """compile_schema(..) caches compiled schemas
+        """
+
+        self.assertIs(compile_schema([('x', 'float32'), ('y', 'float32')],
+                                     Point),
+                      point_schema)
+
+    def test_pack(self):
+        """Schema.pack(..)
+        """
+
+        self.assertEqual(point_schema.pack(Point(1.5, 2.5)),
+                         float_packer.pack([1.5, 2.5]))
+
+        record = Record(MAX_INT32, 'name', Color.green, Point(1.5, 2.5), 0.1)
+        self.assertEqual(record_schema.pack(record), b''.join([
+            packer.pack_array_header(5),
+            packer.pack(MAX_INT32),
+            packer.pack('name'),
+            packer.pack(2),
+            float_packer.pack([1.5, 2.5]),
+            packer.pack(0.1),
+        ]))
+
+        for attribute, value in [
+                ('id', MAX_INT32 + 1),
+                ('id', '1'),
+                ('name', 1),
+                ('color', 2),
+                ('point', Point(1, 2.5)),
+                ('ratio', None),
+        ]:
+            record = Record(1, 'name', Color.red, Point(1.5, 2.5), 0.1)
+            setattr(record, attribute, value)
+
+            with self.assertRaises(PackingError):
+                record_schema.pack(record)
+
+    def test_deserialize(self):
+        """Schema.deserialize(..)
+        """
+
+        record = Record(1, 'name', Color.green, Point(1.5, 2.5), 0.1)
+        self.assertEqual(
+            record_schema.deserialize(
+                msgpack.unpackb(record_schema.pack(record))
+            ),
+            record
+        )
+
+        for ser in [
+                None,
+                [1, 'name', 2, [1.5, 2.5]],
+                [MAX_INT32 + 1, 'name', 2, [1.5, 2.5], 0.1],
+                [1, 1, 2, [1.5, 2.5], 0.1],
+                [1, 'name', 3, [1.5, 2.5], 0.1],
+                [1, 'name', 2, [1, 2.5], 0.1],
+        ]:
+            with self.assertRaises(DeserializationError):
+                record_schema.deserialize(ser)
+
+    def test_invalid_schema(self):
+        """compile_schema(..) with invalid fields
+        """
+
+        for fields in [
+                [('x', 'int128')],
+                [('x; y', 'int8')],
+        ]:
+            with self.assertRaises(ValueError):
+                compile_schema(fields, Point)
+
+        schema = compile_schema([('x', 'uint8')], lambda x: x)
+        self.assertEqual(schema.deserialize([MAX_UINT8]), MAX_UINT8)
@@ -0,0 +1,177 @@
+import msgpack
+import socket
+import threading
+import time
+from unittest import TestCase
+from entangle.client import Client
+from entangle.exceptions import DeadlineExceededError, InvalidArgumentError
+from entangle.message import ExceptionMessage, ResponseMessage
+from .helpers import start_server, stop_server
+
+
+packer = msgpack.Packer()
+
+
+class ServerTestCase(TestCase):
+    """Test case for :class:`Server`.
+    """
+
+    def _start(self, **kwargs):
+        self.server, self.thread = start_server(**kwargs)
+        self.client = Client(self.server.address)
+
+    def tearDown(self):
+        self.client._reset_conn()
+        stop_server(self.server, self.thread)
+
+    def test_call(self):
+        """Server request handling
+        """
+
+        self._start()
+
+        @self.server.method('add')
+        def add(a, b):
+            return a + b
+
+        @self.server.method('invalid')
+        def invalid():
+            raise InvalidArgumentError('invalid')
+
+        @self.server.method('fail')
+        def fail():
+            raise ValueError('fail')
+
+        response = self.client._call('add', packer.pack([1, 2]))
+        self.assertIsInstance(response, ResponseMessage)
+        self.assertEqual(response.result, 3)
+
+        for method, name in [
+                ('unknown', 'UnknownMethod'),
+                ('invalid', 'InvalidArgument'),
+                ('fail', 'InternalServerError'),
+        ]:
+            response = self.client._call(method, packer.pack([]))
+            self.assertIsInstance(response, ExceptionMessage)
+            self.assertEqual(response.definition, 'entangle')
+            self.assertEqual(response.name, name)
+
+    def test_notification(self):
+        """Server notification handling
+        """
+
+        self._start()
+        notified = threading.Event()
+        self.server.register('notify', lambda: notified.set())
+
+        self.client._call('notify', packer.pack([]), notify=True)
+        self.assertTrue(notified.wait(1))
+
+    def test_bad_message(self):
+        """Server logs bad messages and drops the connection
+        """
+
+        self._start()
+        sock = socket.create_connection(self.server.address)
+
+        with self.assertLogs('entangle.server', 'ERROR'):
+            sock.sendall(packer.pack([42, 1]))
+            self.assertEqual(sock.recv(1), b'')
+
+        sock.close()
+
+    def test_overload(self):
+        """Server rejects requests when overloaded
+        """
+
+        self._start(workers=1, max_queue_size=1, queue_timeout=0.01)
+        self.server.register('sleep', lambda: time.sleep(0.1))
+
+        responses = self.client._call_many([
+            ('sleep', packer.pack([])) for _ in range(5)
+        ])
+
+        names = [getattr(response, 'name', None) for response in responses]
+        self.assertEqual(names[0], None)
+        self.assertIn('ServerOverloaded', names)
+
+    def test_stream(self):
+        """Server streamed results
+        """
+
+        self._start()
+        produced = []
+
+        @self.server.method('count', stream=True)
+        def count(n):
+            for i in range(n):
+                produced.append(i)
+                yield i
+
+        @self.server.method('fail', stream=True)
+        def fail():
+            yield 1
+            raise ValueError('fail')
+
+        chunks = [response.chunk for response in
+                  self.client._call_stream('count', packer.pack([100]))]
+        self.assertEqual(chunks, list(range(100)))
+
+        responses = list(self.client._call_stream('fail', packer.pack([])))
+        self.assertEqual(responses[0].chunk, 1)
+        self.assertIsInstance(responses[1], ExceptionMessage)
+        self.assertEqual(responses[1].name, 'InternalServerError')
+
+        # The server produces no more than the window ahead of the client.
+        del produced[:]
+        stream = self.client._call_stream('count',
+                                          packer.pack([1000]),
+                                          window=4)
+        self.assertEqual(next(stream).chunk, 0)
+        time.sleep(0.1)
+        self.assertLessEqual(len(produced), 5)
+
+        # Streams of handlers failing to produce any chunks are closed.
+        @self.server.method('broken', stream=True)
+        def broken():
+            raise ValueError('broken')
+
+        responses = list(self.client._call_stream('broken', packer.pack([])))
+        self.assertEqual(len(responses), 1)
+        self.assertEqual(responses[0].name, 'InternalServerError')
+        for server_conn in self.server._connections:
+            self.assertNotIn(responses[0].message_id, server_conn._streams)
+
+        # Closing the stream cancels it, leaving the connection usable.
+        stream.close()
+        self.assertLess(len(produced), 1000)
+        self.assertEqual(self.client._call('add', packer.pack([1, 2])).name,
+                         'UnknownMethod')
+
+    def test_deadline(self):
+        """Server skips requests past their deadline
+        """
+
+        self._start(workers=1)
+        handled = []
+        self.server.register('sleep', lambda t: time.sleep(t))
+        self.server.register('handle', lambda: handled.append(True))
+
+        # The worker is busy until the deadline of the second call expires.
+        other = Client(self.server.address)
+        thread = threading.Thread(
+            target=lambda: other._call('sleep', packer.pack([0.2]))
+        )
+        thread.start()
+        time.sleep(0.05)
+
+        with self.assertRaises(DeadlineExceededError):
+            self.client._call('handle', packer.pack([]), timeout=0.05)
+
+        thread.join()
+        other._reset_conn()
+
+        # The expired request is skipped and its late response discarded.
+        response = self.client._call('sleep', packer.pack([0]), timeout=1)
+        self.assertIsInstance(response, ResponseMessage)
+        self.assertEqual(handled, [])
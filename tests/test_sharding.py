@@ -0,0 +1,133 @@
+import msgpack
+from unittest import TestCase
+from entangle.sharding import HashRing, ShardedClient
+from .helpers import start_server, stop_server
+
+
+packer = msgpack.Packer()
+
+
+class HashRingTestCase(TestCase):
+    """Test case for :class:`HashRing`.
+    """
+
+    def test_get(self):
+        """HashRing.get(..)
+        """
+
+        ring = HashRing(['a', 'b', 'c'])
+        self.assertEqual(len(ring), 3)
+
+        nodes = [ring.get(key) for key in range(3000)]
+        for node in ['a', 'b', 'c']:
+            self.assertGreater(nodes.count(node), 700)
+
+        # Keys are hashed in their packed form.
+        self.assertEqual(HashRing(['a', 'b', 'c']).get(u'key'),
+                         ring.get(u'key'))
+
+        with self.assertRaises(ValueError):
+            HashRing().get('key')
+
+    def test_rebalance(self):
+        """HashRing.add(..) and HashRing.remove(..) only move keys of a node
+        """
+
+        ring = HashRing(['a', 'b', 'c'])
+        before = [ring.get(key) for key in range(3000)]
+
+        ring.add('d')
+        after = [ring.get(key) for key in range(3000)]
+        for old, new in zip(before, after):
+            self.assertIn(new, (old, 'd', ))
+        self.assertGreater(after.count('d'), 500)
+
+        ring.remove('d')
+        self.assertNotIn('d', ring)
+        self.assertEqual([ring.get(key) for key in range(3000)], before)
+
+
+class ShardedClientTestCase(TestCase):
+    """Test case for :class:`ShardedClient`.
+    """
+
+    def setUp(self):
+        self.servers = []
+        self.threads = []
+
+        for i in range(3):
+            server, thread = start_server()
+            server.register('get', self._get(i))
+            server.register('get_many', self._get_many(i))
+            self.servers.append(server)
+            self.threads.append(thread)
+
+        self.addresses = [server.address for server in self.servers]
+        self.client = ShardedClient(self.addresses,
+                                    shard_arguments={'get': 0})
+
+    def _get(self, index):
+        def get(key):
+            return index
+
+        return get
+
+    def _get_many(self, index):
+        def get_many(keys):
+            return [index for _ in keys]
+
+        return get_many
+
+    def tearDown(self):
+        self.client.close()
+        for server, thread in zip(self.servers, self.threads):
+            stop_server(server, thread)
+
+    def test_call(self):
+        """ShardedClient._call(..) routes calls by key
+        """
+
+        for key in range(30):
+            shard = self.addresses.index(self.client._shard(key))
+            response = self.client._call('get', packer.pack([key]))
+            self.assertEqual(response.result, shard)
+
+            response = self.client._call('get',
+                                         packer.pack([None]),
+                                         key=key)
+            self.assertEqual(response.result, shard)
+
+        with self.assertRaises(ValueError):
+            self.client._call('get_many', packer.pack([[1]]))
+
+    def test_call_keys(self):
+        """ShardedClient._call_keys(..) fans out calls by shard
+        """
+
+        keys = list(range(30))
+        results = self.client._call_keys(
+            'get_many',
+            keys,
+            lambda shard_keys: packer.pack([shard_keys])
+        )
+        self.assertEqual(len(results), 3)
+
+        seen = []
+        for shard_keys, response in results:
+            shards = set(self.client._shard(key) for key in shard_keys)
+            self.assertEqual(len(shards), 1)
+            self.assertEqual(response.result,
+                             [self.addresses.index(shards.pop())] *
+                             len(shard_keys))
+            seen.extend(shard_keys)
+        self.assertEqual(sorted(seen), keys)
+
+    def test_remove_shard(self):
+        """ShardedClient.remove_shard(..)
+        """
+
+        self.client.remove_shard(self.addresses[0])
+
+        for key in range(30):
+            response = self.client._call('get', packer.pack([key]))
+            self.assertNotEqual(response.result, 0)